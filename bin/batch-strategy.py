@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+# coding: utf8
+import argparse
+import os
+
+from fundstrategy import daos
+from fundstrategy import setups
+from fundstrategy.core import batches
+from fundstrategy.core import sweeps
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument('--out', default='out/batch.csv', help='result csv file')
+    parser.add_argument('--processes', type=int, help='worker processes, default cpu count')
+    parser.add_argument('--chunk', default=100, type=int, help='funds per nav query')
+
+    group = parser.add_argument_group('basic')
+    group.add_argument('--codes', default=[], nargs='*', help='fund codes, default all funds in fund_nav')
+    group.add_argument('--start', help='start date')
+    group.add_argument('--end', help='end date')
+    group.add_argument('--init', default=0, type=float, help='amount to init position')
+    group.add_argument('--interval', default='w1',
+                       help='regular interval: w<weekday> for weekly, d<k> for every k days'
+                            ', m<day> for monthly or t<n> for n-th trading day of month'
+                            ' (skipping the first month if navs start after its first weekday)')
+    group.add_argument('--delta', default=1_000, type=float, help='delta amount of regular')
+    group.add_argument('--decrease', help='decrease config of regular amount: `<rate_grid>:<decrease_amount>`')
+    group.add_argument('--strategy', default=[], nargs='*', help='strategy conf, like `name:arg1,arg2`')
+
+    return parser, parser.parse_args()
+
+
+def main():
+    parser, args = parse_args()
+
+    sql = setups.setup_sql()
+    funds = daos.FundDao(sql).list_funds(args.codes)
+    if len(funds) == 0:
+        parser.error('no fund found, check --codes')
+    fund_map = {f.code: f for f in funds}
+    nav_iter = daos.NavDao(sql).iter_navs_by_codes(list(fund_map), start=args.start, end=args.end,
+                                                    chunk_size=args.chunk)
+
+    config = sweeps.SweepConfig(init_amount=args.init,
+                                interval=args.interval,
+                                delta_amount=args.delta,
+                                decrease=args.decrease,
+                                strategies=args.strategy,
+                                )
+    config.create_invest()  # 提前校验参数
+    done = batches.run_batch(config,
+                             ((fund_map[code], navs) for code, navs in nav_iter),
+                             out_csv=args.out,
+                             processes=args.processes,
+                             )
+    print(f'> {config.describe()}: {done}/{len(funds)} funds')
+    print(f'* file: {os.path.abspath(args.out)}')
+
+
+if __name__ == '__main__':
+    setups.setup_logging()
+    main()
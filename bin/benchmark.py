@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+# coding: utf8
+import argparse
+import fnmatch
+import json
+import os
+
+from fundstrategy import benchmarks
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+        description='offline benchmarks on synthetic navs',
+    )
+    parser.add_argument('--sizes', default=list(benchmarks.DEFAULT_SIZES), nargs='+', type=int,
+                        help='nav days of each scenario')
+    parser.add_argument('--filter', nargs='+', help='scenario name patterns, like `backtest.*`')
+    parser.add_argument('--repeat', default=3, type=int, help='min runs of each scenario, best one is reported')
+    parser.add_argument('--min-time', default=0.5, type=float, help='min total seconds of each scenario')
+    parser.add_argument('--list', action='store_true', help='list scenarios and exit')
+    parser.add_argument('--out', help='output json')
+    parser.add_argument('--compare', help='baseline json of a previous run')
+    return parser, parser.parse_args()
+
+
+def main():
+    parser, args = parse_args()
+    baseline = None
+    if args.compare:
+        if not os.path.exists(args.compare):
+            parser.error(f'no baseline found: {args.compare}')
+        baseline = benchmarks.load_results(args.compare)
+
+    scenarios = benchmarks.scenarios(args.sizes)
+    if args.filter:
+        scenarios = [s for s in scenarios if any(fnmatch.fnmatch(s.name, p) for p in args.filter)]
+    if args.list:
+        for s in scenarios:
+            print(s.id)
+        return
+    if len(scenarios) == 0:
+        parser.error('no scenario matched, check --filter')
+
+    tformat = '{:<40} | {:>7} | {:>14} | {:>10}'
+    print(tformat.format('scenario', 'size', 'ops/sec', 'peak KB'))
+    print('-' * 80)
+    results = []
+    for s in scenarios:
+        r = benchmarks.measure(s, repeat=args.repeat, min_time=args.min_time)
+        results.append(r)
+        print(tformat.format(r['name'], r['size'], f'{r["ops_per_sec"]:,.0f} {r["unit"]}', r['peak_kb']))
+    print('-' * 80)
+
+    current = dict(meta=benchmarks.environment(), results=results)
+    if args.out:
+        os.makedirs(os.path.dirname(args.out) or '.', exist_ok=True)
+        with open(args.out, 'w') as outf:
+            json.dump(current, outf, indent=2)
+        print(f'results wrote to: {args.out}')
+
+    if baseline is not None:
+        print(f'> compare with {args.compare} (commit: {baseline["meta"].get("commit")})')
+        tformat = '{:<40} | {:>7} | {:>8} | {:>16}'
+        print(tformat.format('scenario', 'size', 'speedup', 'peak KB'))
+        print('-' * 80)
+        for row in benchmarks.compare(baseline, current):
+            print(tformat.format(row['name'], row['size'], f'{row["speedup"]:.2f}x',
+                                 f'{row["base_peak_kb"]} -> {row["peak_kb"]}'))
+        print('-' * 80)
+
+
+if __name__ == '__main__':
+    main()
@@ -6,15 +6,21 @@ import logging
 from fundstrategy import daos
 from fundstrategy import fund_apis
 from fundstrategy import setups
+from fundstrategy import syncs
 
 
 def parse_args():
     parser = argparse.ArgumentParser(
         formatter_class=argparse.ArgumentDefaultsHelpFormatter,
     )
-    parser.add_argument('code', help='fund code')
+    parser.add_argument('codes', nargs='+', help='fund codes')
     parser.add_argument('--start', help='start date')
     parser.add_argument('--end', help='end date')
+    parser.add_argument('--batch', default=500, type=int, help='rows per insert statement')
+    parser.add_argument('--incremental', action='store_true', help='only fetch and insert navs after sync watermark')
+    parser.add_argument('--workers', default=8, type=int, help='concurrent fetch threads')
+    parser.add_argument('--cache', help='http response cache dir, disabled if not set')
+    parser.add_argument('--cache-ttl', default=3600, type=float, help='seconds before cached responses revalidate')
 
     return parser.parse_args()
 
@@ -22,20 +28,29 @@ def parse_args():
 def main():
     args = parse_args()
 
-    # api = fund_apis.DoctorXiong()
-    api = fund_apis.EastMoney()
-    nav_list = api.get_nav_list(args.code, args.start, args.end)
-    info = nav_list.info
-    if len(nav_list.nav_list) == 0:
-        logging.info(f'{info}: no data')
-        return
-
+    cache = fund_apis.HttpCache(args.cache, ttl=args.cache_ttl) if args.cache else None
+    client = fund_apis.HttpClient(cache=cache)
+    # api = fund_apis.DoctorXiong(client)
+    api = fund_apis.EastMoney(client)
     sql = setups.setup_sql()
-    nav_dao = daos.NavDao(sql)
-    for nav in nav_list.nav_list:
-        nav_dao.insert_ignore(info, nav)
-    beg, end = nav_list.nav_list[0], nav_list.nav_list[-1]
-    logging.info(f'{info}: {beg.date} ~ {end.date}, {len(nav_list)} items')
+    syncer = syncs.NavSyncer(api, daos.NavDao(sql), daos.SyncDao(sql), batch_size=args.batch)
+    failed = []
+    for code, nav_list in syncer.sync_many(args.codes, args.start, args.end,
+                                           incremental=args.incremental, max_workers=args.workers):
+        if isinstance(nav_list, Exception):
+            failed.append(code)
+            continue
+        info = nav_list.info
+        if len(nav_list.nav_list) == 0:
+            logging.info(f'{info}: no data')
+            continue
+        beg, end = nav_list.nav_list[0], nav_list.nav_list[-1]
+        logging.info(f'{info}: {beg.date} ~ {end.date}, {len(nav_list)} items')
+    if failed:
+        logging.warning(f'{len(failed)}/{len(args.codes)} failed: {" ".join(failed)}')
+    if cache is not None:
+        logging.info(f'{cache}')
+    sql.metrics.log_summary(logging.getLogger('sql'))
 
 
 if __name__ == '__main__':
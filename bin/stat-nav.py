@@ -10,6 +10,7 @@ import numpy as np
 from fundstrategy import daos
 from fundstrategy import setups
 from fundstrategy.core import decimals
+from fundstrategy.core import nav_store
 
 
 def parse_args():
@@ -20,14 +21,18 @@ def parse_args():
     parser.add_argument('--start', help='start date')
     parser.add_argument('--end', help='end date')
     parser.add_argument('--out', default='out/', help='outdir')
+    parser.add_argument('--store', help='local nav store dir built by sync-store, instead of mysql')
     parser.add_argument('--show', action='store_true', help='auto show?')
+    parser.add_argument('--aggregate', action='store_true',
+                        help='aggregate in database with group by instead of loading all navs'
+                             ', also reports yearly stats and writes weekly stats csv, not for --store')
 
     return parser, parser.parse_args()
 
 
 def main():
     def figure_increase_hist():
-        increases = np.array([i.increase for i in navs])
+        increases = navs.increases[~np.isnan(navs.increases)]
         i_min = np.floor(np.min(increases))
         i_max = np.ceil(np.max(increases))
         bins = np.arange(i_min, i_max + 1, 0.5)
@@ -48,8 +53,9 @@ def main():
 
     def avg_weekday_value():
         avg_values = np.full(5, fill_value=np.inf)
+        weekdays = navs.weekdays
         for d in range(1, 6):
-            values = [i.value for i in navs if i.weekday == d]
+            values = navs.values[weekdays == d]
             if len(values) > 0:
                 avg_values[d - 1] = decimals.value(float(np.mean(values)))
         min_idx = np.argmin(avg_values)
@@ -65,11 +71,23 @@ def main():
             logging.info(tformat.format(weekday, value, f'{delta:.2%}'))
 
     parser, args = parse_args()
-    sql = setups.setup_sql()
-    fund = daos.FundDao(sql).get_fund(args.code)
-    if fund is None:
-        parser.error('no fund found, check --code')
-    navs = daos.NavDao(sql).list_navs(args.code, start=args.start, end=args.end)
+    if args.aggregate:
+        if args.store:
+            parser.error('--aggregate conflicts with --store')
+        aggregate_stats(parser, args)
+        return
+    if args.store:
+        store = nav_store.NavStore(args.store)
+        fund = store.get_info(args.code)
+        if fund is None:
+            parser.error('no fund found in store, check --code or sync-store first')
+        navs = store.list_series(args.code, start=args.start, end=args.end)
+    else:
+        sql = setups.setup_sql()
+        fund = daos.FundDao(sql).get_fund(args.code)
+        if fund is None:
+            parser.error('no fund found, check --code')
+        navs = daos.NavDao(sql).list_series(args.code, start=args.start, end=args.end)
     if len(navs) == 0:
         parser.error('no nav found, check --start/--end or list-nav first')
     beg, end = navs[0], navs[-1]
@@ -79,6 +97,70 @@ def main():
     figure_increase_hist()
 
 
+def aggregate_stats(parser, args):
+    """统计在数据库内聚合完成，只传输聚合结果"""
+    sql = setups.setup_sql()
+    fund = daos.FundDao(sql).get_fund(args.code)
+    if fund is None:
+        parser.error('no fund found, check --code')
+    nav_dao = daos.NavDao(sql)
+    years = nav_dao.period_stats(args.code, start=args.start, end=args.end, period='year')
+    if len(years) == 0:
+        parser.error('no nav found, check --start/--end or list-nav first')
+    count = sum(y['count'] for y in years)
+    logging.info(f'{fund.name}[{fund.code}]: {years[0]["first_date"]} ~ {years[-1]["last_date"]}, {count} items')
+
+    weekdays = [w for w in nav_dao.weekday_stats(args.code, start=args.start, end=args.end) if 1 <= w['weekday'] <= 5]
+    avg_values = np.full(5, fill_value=np.inf)
+    for w in weekdays:
+        avg_values[w['weekday'] - 1] = decimals.value(w['avg_value'])
+    min_idx = np.argmin(avg_values)
+    tformat = '{:>10} | {:>10} | {:>10} | {:>8} | {:>10} | {:>10}'
+    logging.info(tformat.format('weekday', 'avg_value', 'delta', 'count', 'min_value', 'max_value'))
+    logging.info('-' * 72)
+    for w in weekdays:
+        i = w['weekday'] - 1
+        delta = decimals.rate(avg_values[i] / avg_values[min_idx] - 1)
+        weekday = f'*  {i + 1}' if i == min_idx else i + 1
+        logging.info(tformat.format(weekday, avg_values[i], f'{delta:.2%}', w['count'], w['min_value'], w['max_value']))
+
+    tformat = '{:>6} | {:>6} | {:>10} | {:>10} | {:>10} | {:>10} | {:>10}'
+    logging.info(tformat.format('year', 'count', 'first', 'last', 'return', 'min_value', 'max_value'))
+    logging.info('-' * 82)
+    # 收益以上一年的收盘净值为基数，首年以当年首个净值为基数
+    base = years[0]['first_value']
+    for y in years:
+        rate = decimals.rate(y['last_value'] / base - 1)
+        base = y['last_value']
+        logging.info(tformat.format(y['period'], y['count'], y['first_value'], y['last_value'], f'{rate:.2%}',
+                                    y['min_value'], y['max_value']))
+
+    os.makedirs(args.out, exist_ok=True)
+    week_csv = os.path.join(args.out, f'{fund.code}.{fund.name}.week.csv')
+    with open(week_csv, 'w') as outf:
+        outf.write('year_week,count,first_date,last_date,first_value,last_value,min_value,max_value'
+                   ',avg_increase,min_increase,max_increase\n')
+        for w in nav_dao.period_stats(args.code, start=args.start, end=args.end, period='week'):
+            outf.write(f'{w["period"]},{w["count"]},{w["first_date"]},{w["last_date"]}'
+                       f',{w["first_value"]},{w["last_value"]},{w["min_value"]},{w["max_value"]}'
+                       f',{w["avg_increase"]:.4f},{w["min_increase"]},{w["max_increase"]}\n')
+    logging.info(f'weekly stats: {week_csv}')
+
+    bin_width = 0.5
+    histogram = nav_dao.increase_histogram(args.code, start=args.start, end=args.end, bin_width=bin_width)
+    lows = np.array([h[0] for h in histogram])
+    counts = np.array([h[1] for h in histogram])
+    plt.title(f'{fund.name}[{fund.code}]')
+    plt.rcParams['font.sans-serif'] = ['SimHei']
+    plt.rcParams['axes.unicode_minus'] = False
+    plt.bar(lows, counts, width=bin_width, align='edge')
+    outfile = os.path.join(args.out, f'{fund.code}.{fund.name}.png')
+    plt.savefig(outfile)
+    logging.info(f'increase histogram image: {outfile}')
+    if args.show:
+        plt.show()
+
+
 if __name__ == '__main__':
     setups.setup_logging()
     main()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+# coding: utf8
+import argparse
+import os
+
+from fundstrategy import daos
+from fundstrategy import setups
+from fundstrategy.core import profiling
+from fundstrategy.core import result_cache
+from fundstrategy.core import sweeps
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument('--out', default='out/', help='outdir')
+    parser.add_argument('--processes', type=int, help='worker processes, default cpu count')
+    parser.add_argument('--sort', default='total', choices=['total', 'position'], help='rank by profit rate')
+    parser.add_argument('--top', default=20, type=int, help='rows to print, 0 for all')
+    parser.add_argument('--cache', help='result cache dir, skip configs evaluated on the same navs')
+    parser.add_argument('--profile', nargs='?', const='-',
+                        help='profile strategies, regular and settle over all configs'
+                             ', print report or write json to the given path')
+    parser.add_argument('--cache-mb', default=256, type=int, help='max size of result cache in MB')
+
+    group = parser.add_argument_group('grid')
+    group.add_argument('--code', required=True, help='fund code')
+    group.add_argument('--start', help='start date')
+    group.add_argument('--end', help='end date')
+    group.add_argument('--init', default=[0], nargs='+', type=float, help='amounts to init position')
+    group.add_argument('--interval', default=['w1'], nargs='+',
+                       help='regular intervals: w<weekday> for weekly, d<k> for every k days'
+                            ', m<day> for monthly or t<n> for n-th trading day of month'
+                            ' (skipping the first month if navs start after its first weekday)')
+    group.add_argument('--delta', default=[1_000], nargs='+', type=float, help='delta amounts of regular')
+    group.add_argument('--decrease', default=['-'], nargs='+',
+                       help='decrease configs of regular amount: `<rate_grid>:<decrease_amount>`, `-` for none')
+    group.add_argument('--strategy', default=['-'], nargs='+',
+                       help='strategy groups, strategies joined by `+`, like `name:arg1,arg2+name2:arg`,'
+                            ' `-` for none')
+
+    return parser, parser.parse_args()
+
+
+def main():
+    parser, args = parse_args()
+
+    sql = setups.setup_sql()
+    fund = daos.FundDao(sql).get_fund(args.code)
+    if fund is None:
+        parser.error('no fund found, check --code')
+    nav_dao = daos.NavDao(sql)
+    navs = nav_dao.list_navs(args.code, start=args.start, end=args.end)
+    if len(navs) == 0:
+        parser.error('no nav found, check --start/--end or list-nav first')
+
+    decreases = [None if d == '-' else d for d in args.decrease]
+    strategy_groups = [[] if g == '-' else g.split('+') for g in args.strategy]
+    configs = sweeps.expand_grid(args.init, args.interval, args.delta, decreases, strategy_groups)
+    sort_key = f'{args.sort}_profit_rate'
+    cache, nav_id = None, None
+    if args.cache:
+        cache = result_cache.ResultCache(args.cache, max_bytes=args.cache_mb * 1024 * 1024)
+        nav_id = args.code, args.start, args.end, nav_dao.get_version(args.code, start=args.start, end=args.end)
+    profiler = profiling.Profiler() if args.profile else None
+    results = sweeps.sweep(navs, configs, processes=args.processes, sort_key=sort_key, cache=cache, nav_id=nav_id,
+                           profiler=profiler)
+
+    beg, end = navs[0], navs[-1]
+    print(f'> {fund.name}[{fund.code}]: {beg.date}~{end.date}, {len(configs)} configs')
+    tformat = '{:>5} | {:>8} | {:>10} | {:>10} | {:>12} | {:<}'
+    print('-' * 90)
+    print(tformat.format('rank', '总收益率', '持仓收益率', '总收益', '总成本', '配置'))
+    print('+' * 90)
+    top = results[:args.top] if args.top > 0 else results
+    for i, (config, summary) in enumerate(top):
+        print(tformat.format(i + 1,
+                             f'{summary["total_profit_rate"]:.2%}',
+                             f'{summary["position_profit_rate"]:.2%}',
+                             f'{summary["total_profit"]:.2f}',
+                             f'{summary["total_cost"]:.2f}',
+                             config.describe()))
+    print('-' * 90)
+
+    os.makedirs(args.out, exist_ok=True)
+    out_csv = os.path.join(args.out, f'{fund.code}.{fund.name}.sweep.csv')
+    with open(out_csv, 'w') as outf:
+        outf.write('rank,init,interval,delta,decrease,strategy,total_profit_rate,position_profit_rate'
+                   ',total_profit,total_cost\n')
+        for i, (config, summary) in enumerate(results):
+            outf.write(f'{i + 1},{config.init_amount},{config.interval},{config.delta_amount}'
+                       f',{config.decrease or ""},{"+".join(config.strategies)}'
+                       f',{summary["total_profit_rate"]:.4f},{summary["position_profit_rate"]:.4f}'
+                       f',{summary["total_profit"]:.2f},{summary["total_cost"]:.2f}\n')
+    print(f'* file: {out_csv}')
+    if profiler is not None:
+        profiler.print_report()
+        if args.profile != '-':
+            profiler.write_report(args.profile)
+            print(f'* profile: {args.profile}')
+
+
+if __name__ == '__main__':
+    setups.setup_logging()
+    main()
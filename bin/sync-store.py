@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+# coding: utf8
+import argparse
+import logging
+
+from fundstrategy import daos
+from fundstrategy import setups
+from fundstrategy.core import nav_store
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument('--store', default='store/', help='local nav store dir')
+    parser.add_argument('--codes', default=[], nargs='*', help='fund codes, default all funds in fund_nav')
+    parser.add_argument('--chunk', default=100, type=int, help='funds per nav query')
+
+    return parser, parser.parse_args()
+
+
+def main():
+    parser, args = parse_args()
+
+    sql = setups.setup_sql()
+    funds = daos.FundDao(sql).list_funds(args.codes)
+    if len(funds) == 0:
+        parser.error('no fund found, check --codes')
+    with nav_store.NavStore(args.store) as store:
+        count = daos.NavDao(sql).sync_store(store, funds, chunk_size=args.chunk)
+        logging.info(f'{store}: synced {count}/{len(funds)} funds')
+
+
+if __name__ == '__main__':
+    setups.setup_logging()
+    main()
@@ -1,12 +1,21 @@
 #!/usr/bin/env python3
 # coding: utf8
 import argparse
+import itertools
 import os
+import typing
 
 from fundstrategy import daos
 from fundstrategy import setups
 from fundstrategy import strategies
+from fundstrategy.core import checkpoints
 from fundstrategy.core import decimals
+from fundstrategy.core import nav_store
+from fundstrategy.core import profiling
+from fundstrategy.core import profits
+from fundstrategy.core import result_cache
+from fundstrategy.core import sweeps
+from fundstrategy.core import vectorized
 from fundstrategy.core.regular import RegularInvest
 
 
@@ -15,6 +24,22 @@ def parse_args():
         formatter_class=argparse.ArgumentDefaultsHelpFormatter,
     )
     parser.add_argument('--out', default='out/', help='outdir')
+    parser.add_argument('--store', help='local nav store dir built by sync-store, instead of mysql')
+    parser.add_argument('--engine', default='decimal', choices=['decimal', 'numpy', 'check'],
+                        help='backtest engine, `check` runs both and reports differences')
+    parser.add_argument('--stream', action='store_true',
+                        help='stream navs and positions without keeping history, only for decimal engine')
+    parser.add_argument('--checkpoint',
+                        help='checkpoint file, resume from it with only newer navs if exists and save after backtest'
+                             ', only for decimal engine')
+    parser.add_argument('--cache', help='result cache dir, reuse results until navs of the fund change'
+                                        ', only for decimal engine')
+    parser.add_argument('--cache-mb', default=256, type=int, help='max size of result cache in MB')
+    parser.add_argument('--profile', nargs='?', const='-',
+                        help='profile strategies, regular and settle, print report or write json to the given path'
+                             ', only for decimal engine, not with --cache')
+    parser.add_argument('--numeric', default='decimal', choices=sorted(decimals.NUMERICS),
+                        help='numeric backend of decimal engine, `fixed` uses scaled integers with same results')
 
     group = parser.add_argument_group('basic')
     group.add_argument('--code', required=True, help='fund code')
@@ -22,10 +47,13 @@ def parse_args():
     group.add_argument('--end', help='end date')
     group.add_argument('--init', default=0, type=float, help='amount to init position')
     group.add_argument('--interval', default='w1',
-                       help='regular interval: w<weekday> for weekly or d<k> for every k days')
+                       help='regular interval: w<weekday> for weekly, d<k> for every k days'
+                            ', m<day> for monthly or t<n> for n-th trading day of month'
+                            ' (skipping the first month if navs start after its first weekday)')
     group.add_argument('--delta', default=1_000, type=float, help='delta amount of regular')
     group.add_argument('--decrease', help='decrease config of regular amount: `<rate_grid>:<decrease_amount>`')
-    group.add_argument('--strategy', default=[], nargs='*', help='strategy conf, like `name:arg1,arg2`')
+    group.add_argument('--strategy', default=[], nargs='*',
+                       help=f'strategy conf, like `name:arg1,arg2`, name in: {", ".join(strategies.STRATEGIES)}')
 
     return parser, parser.parse_args()
 
@@ -33,13 +61,24 @@ def parse_args():
 def main():
     parser, args = parse_args()
 
-    sql = setups.setup_sql()
-    fund = daos.FundDao(sql).get_fund(args.code)
-    if fund is None:
-        parser.error('no fund found, check --code')
-    navs = daos.NavDao(sql).list_navs(args.code, start=args.start, end=args.end)
-    if len(navs) == 0:
-        parser.error('no nav found, check --start/--end or list-nav first')
+    if (args.stream or args.checkpoint or args.cache or args.profile) and args.engine != 'decimal':
+        parser.error('--stream/--checkpoint/--cache/--profile only supports decimal engine')
+    if args.cache and (args.stream or args.checkpoint or args.profile):
+        parser.error('--cache conflicts with --stream/--checkpoint/--profile')
+    if args.strategy and args.engine != 'decimal':
+        parser.error('--engine numpy/check does not support --strategy')
+    if args.store:
+        store = nav_store.NavStore(args.store)
+        fund = store.get_info(args.code)
+        if fund is None:
+            parser.error('no fund found in store, check --code or sync-store first')
+        nav_source = store
+    else:
+        sql = setups.setup_sql()
+        fund = daos.FundDao(sql).get_fund(args.code)
+        if fund is None:
+            parser.error('no fund found, check --code')
+        nav_source = daos.NavDao(sql)
     os.makedirs(args.out, exist_ok=True)
     outname = os.path.join(args.out, f'{fund.code}.{fund.name}')
 
@@ -53,11 +92,69 @@ def main():
                            delta_amount=args.delta,
                            decrease=args.decrease,
                            strategies=strategy_list,
+                           numeric=args.numeric,
+                           profiler=profiling.Profiler() if args.profile else None,
                            )
-    record = invest.backtest(navs)
+    if args.stream or args.checkpoint:
+        stream_backtest(parser, args, fund, invest, nav_source, outname)
+        report_profile(invest.profiler, args.profile)
+        return
+
+    cache, cache_key = None, None
+    if args.cache:
+        cache = result_cache.ResultCache(args.cache, max_bytes=args.cache_mb * 1024 * 1024)
+        nav_version = nav_source.get_version(args.code, start=args.start, end=args.end)
+        cache_key = result_cache.result_key(args.code, args.start, args.end, nav_version, invest)
+        cached = cache.get(cache_key)
+        # 参数扫描只缓存摘要，需要完整记录时重新回测
+        if cached is not None and cached.record is not None:
+            print(cached.summary['title'])
+            print(f'* cached: {cache_key[:12]}')
+            report(cached.record, outname)
+            return
+
+    navs = nav_source.list_series(args.code, start=args.start, end=args.end)
+    if len(navs) == 0:
+        parser.error('no nav found, check --start/--end or list-nav first')
     beg, end = navs[0], navs[-1]
     value_rate = decimals.rate(end.value / beg.value - 1)
-    print(f'> {fund.name}[{fund.code}]: {beg.date}~{end.date}, {value_rate:.2%}')
+    title = f'> {fund.name}[{fund.code}]: {beg.date}~{end.date}, {value_rate:.2%}'
+    print(title)
+    if args.engine == 'check':
+        diffs = vectorized.check_equivalence(invest, navs)
+        for d in diffs:
+            print(f'! {d}')
+        print(f'* engines diff: {len(diffs)}')
+        return
+    if args.engine == 'numpy':
+        record = vectorized.backtest(invest, vectorized.NavArrays.from_navs(navs))
+        print(f'* 持仓收益: {record.position_amount} - {record.position_cost} = {record.position_profit}'
+              f', {record.position_profit_rate:.2%}')
+        print(f'* 历史收益: {record.total_amount} - {record.total_cost} = {record.total_profit}'
+              f', {record.total_profit_rate:.2%}')
+        position_csv = f'{outname}.position.csv'
+        record.write_positions(position_csv)
+        print(f'* files:\n. {"position":<10} : {position_csv}')
+        return
+
+    record = invest.backtest(navs)
+    if cache is not None:
+        cache.put(cache_key, dict(sweeps.summarize(record), title=title), record)
+    report(record, outname)
+    report_profile(invest.profiler, args.profile)
+
+
+def report_profile(profiler: typing.Optional[profiling.Profiler], out: typing.Optional[str]):
+    """打印剖析报告，out 不为 `-` 时写入 json"""
+    if profiler is None:
+        return
+    profiler.print_report()
+    if out != '-':
+        profiler.write_report(out)
+        print(f'. {"profile":<10} : {out}')
+
+
+def report(record: profits.ProfitRecord, outname: str):
     print(f'* 持仓收益: {record.position_amount} - {record.position_cost} = {record.position_profit}'
           f', {record.position_profit_rate:.2%}')
     print(f'* 历史收益: {record.total_amount} - {record.total_cost} = {record.total_profit}'
@@ -81,6 +178,57 @@ def main():
         print(tformat.format(name, csv_file))
 
 
+def stream_backtest(parser, args, fund, invest: RegularInvest, nav_source, outname: str):
+    """
+    边读净值边回测，--stream 时持仓逐日写出、不保留历史；
+    指定检查点且存在时从检查点继续，只读取最近结算日期之后的净值
+    """
+    record = profits.ProfitRecord(invest.numeric, keep_history=not args.stream)
+    resumed = False
+    if args.checkpoint:
+        try:
+            record, resumed = checkpoints.load_or_create(args.checkpoint, invest, keep_history=not args.stream,
+                                                         code=args.code, start=args.start)
+        except ValueError as e:
+            parser.error(f'{e}, check --code/--start/--stream and the other params of the checkpoint')
+    start = record.last_position.date if record.last_position is not None else args.start
+    navs = iter(nav_source.iter_navs(args.code, start=start, end=args.end))
+    # 先取首个净值，没有可回测的净值时不打开、不截断持仓文件
+    first = next(navs, None)
+    if first is None and record.last_position is None:
+        parser.error('no nav found, check --start/--end or list-nav first')
+    if first is not None:
+        navs = itertools.chain([first], navs)
+
+    position_csv = f'{outname}.position.csv'
+    files = [('position', position_csv)]
+    if record.histories is None:
+        with profits.PositionCsvSink(position_csv, append=resumed) as sink:
+            invest.resume(record, navs, sink=sink)
+    else:
+        invest.resume(record, navs)
+    if args.checkpoint:
+        checkpoints.save(args.checkpoint, invest, record, code=args.code, start=args.start)
+        files.append(('checkpoint', args.checkpoint))
+    if record.histories is not None:
+        record.write_positions(position_csv)
+        for name, acc in [('buy', record.acc_buy), ('sell', record.acc_sell)]:
+            csv_file = f'{outname}.{name}.csv'
+            acc.write_history(csv_file)
+            files.append((name, csv_file))
+
+    beg, end = record.first_position, record.last_position
+    print(f'> {fund.name}[{fund.code}]: {beg.date}~{end.date}')
+    print(f'* 持仓收益: {record.position_amount} - {record.position_cost} = {record.position_profit}'
+          f', {record.position_profit_rate:.2%}')
+    print(f'* 历史收益: {record.total_amount} - {record.total_cost} = {record.total_profit}'
+          f', {record.total_profit_rate:.2%}')
+    record.print_total()
+    print('* files:')
+    for name, csv_file in files:
+        print(f'. {name:<10} : {csv_file}')
+
+
 if __name__ == '__main__':
     setups.setup_logging()
     main()
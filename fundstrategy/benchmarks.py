@@ -0,0 +1,273 @@
+# coding: utf8
+import gc
+import json
+import os
+import platform
+import shutil
+import subprocess
+import tempfile
+import time
+import tracemalloc
+import typing
+
+import numpy as np
+
+from fundstrategy import daos
+from fundstrategy import setups
+from fundstrategy import strategies
+from fundstrategy.core import decimals
+from fundstrategy.core import models
+from fundstrategy.core import profits
+from fundstrategy.core import regular
+from fundstrategy.core import synthetic
+from fundstrategy.core import vectorized
+
+DEFAULT_SIZES = (1_000, 10_000, 100_000)
+
+# 组合策略场景使用的策略配置
+COMBINED_STRATEGIES = ['AddByValueDrawback:20,-0.05,5000', 'StopByValueDrawback:60,-0.1', 'TakeDeltaProfit:0.2']
+
+
+class Scenario:
+    """基准场景：setup 准备数据，不计时；run 执行被测操作，返回处理的数量"""
+
+    def __init__(self, name: str, size: int,
+                 setup: typing.Callable[[], typing.Any],
+                 run: typing.Callable[[typing.Any], int],
+                 teardown: typing.Callable[[typing.Any], None] = None,
+                 unit: str = 'days'):
+        """
+        :param size: 净值天数
+        :param unit: run 返回数量的单位，ops/sec 即每秒处理的该单位数量
+        """
+        self.name = name
+        self.size = size
+        self.setup = setup
+        self.run = run
+        self.teardown = teardown
+        self.unit = unit
+
+    def __repr__(self):
+        return f'<{self.__class__.__name__}: {self.id}>'
+
+    @property
+    def id(self) -> str:
+        return f'{self.name}@{self.size}'
+
+
+def measure(scenario: Scenario, repeat: int = 3, min_time: float = 0.5) -> dict:
+    """
+    至少执行 repeat 次且累计不少于 min_time 秒，取最快一次计算 ops/sec；
+    峰值内存为单独一次执行中 tracemalloc 记录的 Python 分配峰值，不含 setup
+    """
+    times, ops = [], 0
+    while len(times) < repeat or sum(times) < min_time:
+        state = scenario.setup()
+        gc.collect()
+        beg = time.perf_counter()
+        ops = scenario.run(state)
+        times.append(time.perf_counter() - beg)
+        if scenario.teardown is not None:
+            scenario.teardown(state)
+
+    state = scenario.setup()
+    gc.collect()
+    tracemalloc.start()
+    try:
+        scenario.run(state)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+        if scenario.teardown is not None:
+            scenario.teardown(state)
+
+    best = min(times)
+    return dict(name=scenario.name,
+                size=scenario.size,
+                unit=scenario.unit,
+                ops=ops,
+                runs=len(times),
+                best_seconds=best,
+                mean_seconds=sum(times) / len(times),
+                ops_per_sec=ops / best if best > 0 else float('inf'),
+                peak_kb=peak // 1024,
+                )
+
+
+def _lazy(factory: typing.Callable[[], typing.Any]) -> typing.Callable[[], typing.Any]:
+    """首次调用时才生成数据并缓存，构造场景列表时不生成，--filter 未选中的场景没有开销"""
+    cache = []
+
+    def get():
+        if not cache:
+            cache.append(factory())
+        return cache[0]
+
+    return get
+
+
+def _navs_setup(size: int) -> typing.Callable[[], typing.List[models.FundNav]]:
+    return _lazy(lambda: synthetic.random_navs(size, seed=size))
+
+
+def _backtest_run(strategy_confs: typing.Sequence[str], numeric: str = 'decimal'):
+    def run(navs: typing.List[models.FundNav]) -> int:
+        invest = regular.RegularInvest(init_amount=10_000, interval='w1', delta_amount=1_000,
+                                       strategies=[strategies.parse_strategy(s) for s in strategy_confs],
+                                       numeric=numeric)
+        invest.backtest(navs)
+        return len(navs)
+
+    return run
+
+
+def _vectorized_run(arrays: vectorized.NavArrays) -> int:
+    invest = regular.RegularInvest(init_amount=10_000, interval='w1', delta_amount=1_000)
+    vectorized.backtest(invest, arrays)
+    return len(arrays)
+
+
+def _decimals_run(values: np.ndarray) -> int:
+    for v in values.tolist():
+        decimals.amount(v)
+        decimals.equity(v)
+        decimals.value(v)
+        decimals.rate(v)
+    return len(values)
+
+
+def _fixed_run(values: np.ndarray) -> int:
+    numeric = decimals.FIXED
+    for v in values.tolist():
+        numeric.amount(v)
+        numeric.equity(v)
+        numeric.value(v)
+        numeric.rate(v)
+    return len(values)
+
+
+def _write_positions_setup(size: int):
+    record = _lazy(lambda: regular.RegularInvest(init_amount=10_000, interval='w1', delta_amount=1_000)
+                   .backtest(synthetic.random_navs(size, seed=size)))
+
+    def setup():
+        return record(), tempfile.mkdtemp(prefix='bench-csv-')
+
+    return setup
+
+
+def _write_positions_run(state) -> int:
+    record, tmpdir = state
+    record.write_positions(os.path.join(tmpdir, 'position.csv'))
+    return len(record.histories)
+
+
+def _stream_setup(size: int):
+    navs = _navs_setup(size)
+
+    def setup():
+        return navs(), tempfile.mkdtemp(prefix='bench-csv-')
+
+    return setup
+
+
+def _stream_run(state) -> int:
+    navs, tmpdir = state
+    invest = regular.RegularInvest(init_amount=10_000, interval='w1', delta_amount=1_000)
+    with profits.PositionCsvSink(os.path.join(tmpdir, 'position.csv')) as sink:
+        invest.backtest(navs, sink=sink, keep_history=False)
+    return len(navs)
+
+
+def _insert_setup(size: int):
+    navs = _navs_setup(size)
+
+    def setup():
+        tmpdir = tempfile.mkdtemp(prefix='bench-sqlite-')
+        sql = setups.setup_sql(f'sqlite:///{os.path.join(tmpdir, "fund.db")}', pool_size=1)
+        return sql, tmpdir, navs()
+
+    return setup
+
+
+def _insert_run(state) -> int:
+    sql, _, navs = state
+    daos.NavDao(sql).insert_ignore_many(models.FundInfo('000000', 'bench'), navs)
+    return len(navs)
+
+
+def _insert_teardown(state):
+    state[0].pool.close()
+    _remove_tmpdir(state)
+
+
+def _remove_tmpdir(state):
+    shutil.rmtree(state[1], ignore_errors=True)
+
+
+def strategy_confs() -> typing.List[str]:
+    """strategies 包中的全部策略，使用默认参数"""
+    return sorted(strategies.STRATEGIES)
+
+
+def scenarios(sizes: typing.Sequence[int] = DEFAULT_SIZES) -> typing.List[Scenario]:
+    """全部基准场景"""
+    items = []
+    for size in sizes:
+        navs_setup = _navs_setup(size)
+        items.append(Scenario('backtest.regular', size, navs_setup, _backtest_run([])))
+        items.append(Scenario('backtest.regular.fixed', size, navs_setup, _backtest_run([], numeric='fixed')))
+        for conf in strategy_confs():
+            items.append(Scenario(f'backtest.{conf}', size, navs_setup, _backtest_run([conf])))
+        items.append(Scenario('backtest.combined', size, navs_setup, _backtest_run(COMBINED_STRATEGIES)))
+        items.append(Scenario('backtest.combined.fixed', size, navs_setup,
+                              _backtest_run(COMBINED_STRATEGIES, numeric='fixed')))
+        arrays = _lazy(lambda s=size: synthetic.random_walk(s, seed=s))
+        items.append(Scenario('backtest.vectorized', size, arrays, _vectorized_run))
+        values = _lazy(lambda a=arrays: a().values * 1000)
+        items.append(Scenario('decimals.quantize', size, values, _decimals_run, unit='values'))
+        items.append(Scenario('decimals.fixed', size, values, _fixed_run, unit='values'))
+        items.append(Scenario('export.write_positions', size, _write_positions_setup(size),
+                              _write_positions_run, teardown=_remove_tmpdir, unit='rows'))
+        items.append(Scenario('export.stream_positions', size, _stream_setup(size), _stream_run,
+                              teardown=_remove_tmpdir))
+        items.append(Scenario('sqlite.insert_many', size, _insert_setup(size), _insert_run,
+                              teardown=_insert_teardown, unit='rows'))
+    return items
+
+
+def environment() -> dict:
+    """运行环境，便于跨提交对比时确认可比性"""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return dict(commit=commit,
+                python=platform.python_version(),
+                numpy=np.__version__,
+                machine=platform.machine(),
+                processor=platform.processor(),
+                time=time.strftime('%Y-%m-%d %H:%M:%S'),
+                )
+
+
+def compare(base: dict, current: dict) -> typing.List[dict]:
+    """按场景对比两次结果，ratio > 1 表示变快、峰值内存变大"""
+    base_results = {(r['name'], r['size']): r for r in base['results']}
+    rows = []
+    for r in current['results']:
+        b = base_results.get((r['name'], r['size']))
+        if b is None:
+            continue
+        rows.append(dict(name=r['name'], size=r['size'],
+                         base_ops_per_sec=b['ops_per_sec'], ops_per_sec=r['ops_per_sec'],
+                         speedup=r['ops_per_sec'] / b['ops_per_sec'] if b['ops_per_sec'] else float('inf'),
+                         base_peak_kb=b['peak_kb'], peak_kb=r['peak_kb'],
+                         ))
+    return rows
+
+
+def load_results(path: str) -> dict:
+    with open(path) as f:
+        return json.load(f)
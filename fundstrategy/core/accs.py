@@ -4,17 +4,21 @@ import os
 import typing
 from decimal import Decimal
 
+import numpy as np
+
 from fundstrategy.core import decimals
 
 
 class Delta:
-    """累加变动"""
+    """累加变动，数值按 numeric 后端表示，属性统一返回 Decimal"""
 
-    def __init__(self, date: str, amount: Decimal, equity: Decimal, net_value: Decimal):
+    def __init__(self, date: str, amount, equity, net_value,
+                 numeric: decimals.Numeric = decimals.DECIMAL):
         self.date = date
-        self.amount = amount
-        self.equity = equity
-        self.net_value = net_value
+        self.numeric = numeric
+        self._amount = amount
+        self._equity = equity
+        self._net_value = net_value
 
     def __repr__(self):
         return f'<{self.__class__.__name__}: {self.date},' \
@@ -22,31 +26,98 @@ class Delta:
                f' equity={self.equity},' \
                f' net_value={self.net_value}>'
 
+    @property
+    def amount(self) -> Decimal:
+        return self.numeric.to_amount(self._amount)
+
+    @property
+    def equity(self) -> Decimal:
+        return self.numeric.to_equity(self._equity)
+
+    @property
+    def net_value(self) -> Decimal:
+        return self.numeric.to_value(self._net_value)
+
 
 class Accumulation:
     """累加器"""
 
-    def __init__(self, amount: Decimal = decimals.amount(0), equity: Decimal = decimals.equity(0)):
-        self.amount = amount
-        self.equity = equity
-        self.histories: typing.List[Delta] = []
+    def __init__(self, amount=decimals.amount(0), equity=decimals.equity(0),
+                 numeric: decimals.Numeric = decimals.DECIMAL, keep_history: bool = True):
+        """
+        :param amount: 初始金额，按 numeric 后端表示
+        :param equity: 初始份额，按 numeric 后端表示
+        :param numeric: 数值后端，累加的 Delta 须使用同一后端
+        :param keep_history: 是否保留每次累加的 Delta，不保留时 histories 为 None
+        """
+        self.numeric = numeric
+        self._amount = amount
+        self._equity = equity
+        # 累加次数，不保留历史时也计数
+        self.count = 0
+        self.histories: typing.Optional[typing.List[Delta]] = [] if keep_history else None
+
+    @property
+    def amount(self) -> Decimal:
+        return self.numeric.to_amount(self._amount)
+
+    @property
+    def equity(self) -> Decimal:
+        return self.numeric.to_equity(self._equity)
 
     def acc(self, delta: Delta):
         """累加"""
-        self.amount = self.amount + delta.amount
-        self.equity = self.equity + delta.equity
-        self.histories.append(delta)
+        assert delta.numeric is self.numeric
+        self._amount = self._amount + delta._amount
+        self._equity = self._equity + delta._equity
+        self.count += 1
+        if self.histories is not None:
+            self.histories.append(delta)
 
     @property
     def average_value(self) -> Decimal:
         """平均净值"""
-        if self.equity == 0:
-            value = 0.0
-        else:
-            value = self.amount / self.equity
-        return decimals.value(value)
+        return self.numeric.to_value(self.numeric.value_of(self._amount, self._equity))
+
+    def get_state(self) -> typing.Tuple[dict, typing.Dict[str, np.ndarray]]:
+        """检查点状态：(合计, 流水列数组)，金额、份额、净值为定点整数"""
+        numeric = self.numeric
+        deltas = self.histories or []
+        state = dict(amount=numeric.scaled(self._amount, decimals.AMOUNT_SCALE),
+                     equity=numeric.scaled(self._equity, decimals.EQUITY_SCALE),
+                     count=self.count,
+                     keep_history=self.histories is not None)
+        arrays = dict(
+            dates=np.array([d.date for d in deltas], dtype=str),
+            amounts=np.array([numeric.scaled(d._amount, decimals.AMOUNT_SCALE) for d in deltas], dtype=np.int64),
+            equities=np.array([numeric.scaled(d._equity, decimals.EQUITY_SCALE) for d in deltas], dtype=np.int64),
+            values=np.array([numeric.scaled(d._net_value, decimals.VALUE_SCALE) for d in deltas], dtype=np.int64),
+        )
+        return state, arrays
+
+    @staticmethod
+    def from_state(state: dict, arrays: typing.Dict[str, np.ndarray],
+                   numeric: decimals.Numeric = decimals.DECIMAL) -> 'Accumulation':
+        """从 `get_state` 的结果恢复"""
+        acc = Accumulation(numeric.from_scaled(state['amount'], decimals.AMOUNT_SCALE),
+                           numeric.from_scaled(state['equity'], decimals.EQUITY_SCALE),
+                           numeric=numeric,
+                           keep_history=state['keep_history'])
+        if acc.histories is not None:
+            for date, amount, equity, value in zip(arrays['dates'], arrays['amounts'],
+                                                   arrays['equities'], arrays['values']):
+                acc.histories.append(Delta(str(date),
+                                           amount=numeric.from_scaled(amount, decimals.AMOUNT_SCALE),
+                                           equity=numeric.from_scaled(equity, decimals.EQUITY_SCALE),
+                                           net_value=numeric.from_scaled(value, decimals.VALUE_SCALE),
+                                           numeric=numeric))
+        # 早期检查点没有计数
+        acc.count = state.get('count', len(acc.histories or []))
+        return acc
 
     def write_history(self, out_csv):
+        if self.histories is None:
+            raise ValueError('history not kept')
         os.makedirs(os.path.dirname(out_csv), exist_ok=True)
         with open(out_csv, 'w') as outf:
             outf.write('date,amount,equity\n')
@@ -0,0 +1,80 @@
+# coding: utf8
+import concurrent.futures
+import logging
+import os
+import typing
+
+from fundstrategy.core import models
+from fundstrategy.core import sweeps
+from fundstrategy.core import vectorized
+
+_COLUMNS = ['code', 'name', 'begin', 'end', 'days', 'value_rate',
+            'position_amount', 'position_cost', 'position_profit', 'position_profit_rate',
+            'total_amount', 'total_cost', 'total_profit', 'total_profit_rate']
+
+
+def _run_fund(config: sweeps.SweepConfig, info: models.FundInfo, arrays: vectorized.NavArrays) -> dict:
+    summary = sweeps.run_config(config, arrays)
+    summary.update(code=info.code,
+                   name=info.name,
+                   begin=str(arrays.dates[0]),
+                   end=str(arrays.dates[-1]),
+                   days=len(arrays),
+                   value_rate=float(arrays.values[-1] / arrays.values[0] - 1),
+                   )
+    return summary
+
+
+def run_batch(config: sweeps.SweepConfig,
+              funds: typing.Iterable[typing.Tuple[models.FundInfo, typing.Sequence[models.FundNav]]],
+              out_csv: str,
+              processes: int = None,
+              max_pending: int = None) -> int:
+    """
+    同一组定投参数批量回测多个基金，按完成顺序逐行写入结果文件
+
+    :param funds: (基金, 净值列表)，可以是按需加载的迭代器
+    :param processes: 进程数，默认 cpu 核数
+    :param max_pending: 同时在途的基金数上限，限制已加载未回测的净值占用的内存
+    :return: 完成回测的基金数
+    """
+    logger = logging.getLogger('batch')
+    processes = processes or os.cpu_count()
+    max_pending = max_pending or processes * 4
+    os.makedirs(os.path.dirname(out_csv) or '.', exist_ok=True)
+    done = 0
+    with open(out_csv, 'w') as outf, \
+            concurrent.futures.ProcessPoolExecutor(processes) as executor:
+        outf.write(','.join(_COLUMNS) + '\n')
+
+        def drain(futures, return_when):
+            nonlocal done
+            finished, pending = concurrent.futures.wait(futures, return_when=return_when)
+            for future in finished:
+                try:
+                    summary = future.result()
+                except Exception as e:
+                    logger.warning(f'{futures[future]}: backtest failed, {e!r}')
+                    continue
+                outf.write(','.join(_format(summary[c]) for c in _COLUMNS) + '\n')
+                outf.flush()
+                done += 1
+            return {f: futures[f] for f in pending}
+
+        futures = {}
+        for info, navs in funds:
+            if len(navs) == 0:
+                continue
+            future = executor.submit(_run_fund, config, info, vectorized.NavArrays.from_navs(navs))
+            futures[future] = info
+            if len(futures) >= max_pending:
+                futures = drain(futures, concurrent.futures.FIRST_COMPLETED)
+        drain(futures, concurrent.futures.ALL_COMPLETED)
+    logger.info(f'{config.describe()}: {done} funds -> {out_csv}')
+    return done
+
+
+def _format(v):
+    if isinstance(v, float):
+        return f'{v:.4f}'
+    return str(v)
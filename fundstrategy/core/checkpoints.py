@@ -0,0 +1,106 @@
+# coding: utf8
+import json
+import os
+import typing
+
+import numpy as np
+
+from fundstrategy.core import profits
+from fundstrategy.core import regular
+
+# 检查点格式版本，不兼容的修改时递增
+VERSION = 1
+
+
+def save(path: str, invest: regular.RegularInvest, record: profits.ProfitRecord,
+         code: str = None, start: str = None):
+    """
+    保存回测检查点：基金代码、净值开始日期、定投参数、策略和定投日程的状态、收益记录；
+    持仓历史和买卖流水为压缩的定点整数列，其余为 json。先写临时文件再替换，中断不会损坏已有检查点
+
+    :param code: 回测的基金代码
+    :param start: 回测净值的开始日期
+    """
+    record_state, arrays = record.get_state()
+    meta = dict(version=VERSION,
+                code=code,
+                start=start,
+                params=invest.params(),
+                strategies=[s.get_state() for s in invest.strategies],
+                schedule=invest.schedule.get_state(),
+                record=record_state,
+                )
+    write_state(path, meta, arrays)
+
+
+def load(path: str, invest: regular.RegularInvest, code: str = None, start: str = None) -> profits.ProfitRecord:
+    """
+    读取检查点，恢复 invest 中各策略和定投日程的状态，返回收益记录，之后用 `RegularInvest.resume` 继续回测
+
+    :param code: 回测的基金代码，须与保存时一致
+    :param start: 回测净值的开始日期，须与保存时一致
+    :raise ValueError: 检查点版本、基金代码、开始日期或参数与 invest 不一致
+    """
+    meta, arrays = read_state(path)
+    if meta['version'] != VERSION:
+        raise ValueError(f'checkpoint version mismatch: {meta["version"]}, expect {VERSION}')
+    # 早期检查点没有记录基金代码和开始日期，按 None 比较
+    if meta.get('code') != code:
+        raise ValueError(f'checkpoint code mismatch: {meta.get("code")}, expect {code}')
+    if meta.get('start') != start:
+        raise ValueError(f'checkpoint start mismatch: {meta.get("start")}, expect {start}')
+    params = _normalize(invest.params())
+    if meta['params'] != params:
+        raise ValueError(f'checkpoint params mismatch: {meta["params"]}, expect {params}')
+    for s, state in zip(invest.strategies, meta['strategies']):
+        s.set_state(state)
+    # 早期检查点只有按日、按周的无状态日程
+    invest.schedule.set_state(meta.get('schedule'))
+    return profits.ProfitRecord.from_state(meta['record'], arrays)
+
+
+def load_or_create(path: str, invest: regular.RegularInvest, keep_history: bool = True,
+                   code: str = None, start: str = None) -> typing.Tuple[profits.ProfitRecord, bool]:
+    """
+    检查点存在时读取，否则新建收益记录；检查点是否保留历史、基金代码和开始日期须与参数一致
+
+    :return: (收益记录, 是否从检查点恢复)
+    :raise ValueError: 同 `load`，或 keep_history 不一致
+    """
+    if os.path.exists(path):
+        record = load(path, invest, code=code, start=start)
+        if (record.histories is not None) != keep_history:
+            raise ValueError(f'checkpoint keep_history mismatch: {record.histories is not None}'
+                             f', expect {keep_history}')
+        return record, True
+    return profits.ProfitRecord(invest.numeric, keep_history=keep_history), False
+
+
+def write_state(path: str, meta: dict, arrays: typing.Dict[str, np.ndarray]) -> int:
+    """
+    写入压缩的 npz：meta 为 json，其余为数组，不使用 pickle；先写临时文件再替换
+
+    :return: 文件大小
+    """
+    dirname = os.path.dirname(path)
+    if dirname:
+        os.makedirs(dirname, exist_ok=True)
+    tmp = f'{path}.{os.getpid()}.tmp'
+    with open(tmp, 'wb') as f:
+        np.savez_compressed(f, meta=np.array(json.dumps(meta, ensure_ascii=False)), **arrays)
+        size = f.tell()
+    os.replace(tmp, path)
+    return size
+
+
+def read_state(path: str) -> typing.Tuple[dict, typing.Dict[str, np.ndarray]]:
+    """读取 `write_state` 写入的文件"""
+    with np.load(path, allow_pickle=False) as data:
+        meta = json.loads(str(data['meta']))
+        arrays = {k: data[k] for k in data.files if k != 'meta'}
+    return meta, arrays
+
+
+def _normalize(data):
+    """与 json 往返后一致，如 tuple 转为 list"""
+    return json.loads(json.dumps(data, ensure_ascii=False))
@@ -1,4 +1,5 @@
 # coding: utf8
+import math
 import typing
 from decimal import Decimal
 
@@ -21,3 +22,185 @@ def amount(v: typing.Union[float, Decimal]) -> Decimal:
 def rate(v: typing.Union[float, Decimal]) -> Decimal:
     v = float(v)
     return Decimal.from_float(v).quantize(Decimal('.0001'))
+
+
+# 定点整数表示的缩放倍数：份额 1e-3，净值 1e-4，金额 1e-2，比例 1e-4
+EQUITY_SCALE = 1_000
+VALUE_SCALE = 10_000
+AMOUNT_SCALE = 100
+RATE_SCALE = 10_000
+
+
+def to_scaled(v: Decimal, scale: int) -> int:
+    """已 quantize 的 Decimal 转为定点整数"""
+    return int(v * scale)
+
+
+def from_scaled(n: int, scale: int) -> Decimal:
+    """定点整数转回 Decimal，与对应 quantize 结果的值和精度一致"""
+    return Decimal(int(n)).scaleb(-(len(str(scale)) - 1))
+
+
+def scaled_amount_of(equity: int, value: int) -> int:
+    """
+    定点份额 * 定点净值 -> 定点金额，结果同 amount(equity * value)：
+    Decimal 乘积先转 float 再对 float 的精确值四舍六入五成双
+    """
+    p = equity * value
+    unit = EQUITY_SCALE * VALUE_SCALE // AMOUNT_SCALE
+    q, r = divmod(p, unit)
+    if r * 2 != unit:
+        return q + (r * 2 > unit)
+    # 恰好半分：由 float 误差决定进位方向
+    return to_scaled(amount(p / (EQUITY_SCALE * VALUE_SCALE)), AMOUNT_SCALE)
+
+
+class Numeric:
+    """
+    数值后端：决定份额、净值、金额、比例在对象内部的表示和运算方式。
+    对外统一经 to_* 转为 Decimal，值和精度与后端无关。
+
+    默认后端即 Decimal：每次取整都是 float -> Decimal.from_float -> quantize，
+    即对 float 的二进制精确值四舍六入五成双
+    """
+
+    name = 'decimal'
+
+    def __repr__(self):
+        return f'<{self.__class__.__name__}: {self.name}>'
+
+    def __reduce__(self):
+        # 跨进程传递时仍为同一实例
+        return get_numeric, (self.name,)
+
+    def equity(self, v: typing.Union[float, Decimal]):
+        return equity(v)
+
+    def value(self, v: typing.Union[float, Decimal]):
+        return value(v)
+
+    def amount(self, v: typing.Union[float, Decimal]):
+        return amount(v)
+
+    def rate(self, v: typing.Union[float, Decimal]):
+        return rate(v)
+
+    def amount_of(self, equity, value):
+        """份额 * 净值 -> 金额"""
+        return amount(equity * value)
+
+    def value_of(self, amount, equity):
+        """金额 / 份额 -> 净值，份额为 0 时为 0"""
+        if equity == 0:
+            return value(0)
+        return value(amount / equity)
+
+    def rate_of(self, num, den):
+        """同精度的两个数之比，分母为 0 时为 0"""
+        if den == 0:
+            return rate(0)
+        return rate(num / den)
+
+    def scaled(self, v, scale: int) -> int:
+        """转为定点整数"""
+        return to_scaled(v, scale)
+
+    def from_scaled(self, n: int, scale: int):
+        """定点整数转为本后端的表示"""
+        return from_scaled(n, scale)
+
+    def to_equity(self, v) -> Decimal:
+        return v
+
+    def to_value(self, v) -> Decimal:
+        return v
+
+    def to_amount(self, v) -> Decimal:
+        return v
+
+    def to_rate(self, v) -> Decimal:
+        return v
+
+
+class FixedNumeric(Numeric):
+    """
+    定点整数后端：份额、净值、金额、比例分别为 *_SCALE 倍的 int，结果与 Decimal 后端逐位一致。取整规则：
+
+    - float 输入：按 float 的二进制精确值四舍六入五成双，同 Decimal.from_float(v).quantize；
+      先用 v * scale 快速取整，离五入边界太近或数值过大时退回 round(v, digits) 精确取整
+    - 加减：整数精确运算，同 Decimal（28 位有效数字内无舍入）
+    - 份额 * 净值：精确整数乘积按分取整，恰好半分时同 Decimal 路径先转 float 再取整，见 `scaled_amount_of`
+    - 除法：整数精确比值转为最近的 float 再取整；Decimal 路径先按 28 位有效数字相除再转 float，
+      在金额、份额不超过 1e11 的范围内两者得到同一个 float
+    - 比例为 0 而原值为负时返回 -0.0，转为 Decimal 后同样是 -0.0000；份额、净值、金额没有负零
+    """
+
+    name = 'fixed'
+
+    def equity(self, v: typing.Union[float, Decimal]) -> int:
+        return _quantize(float(v), 3, EQUITY_SCALE)
+
+    def value(self, v: typing.Union[float, Decimal]) -> int:
+        return _quantize(float(v), 4, VALUE_SCALE)
+
+    def amount(self, v: typing.Union[float, Decimal]) -> int:
+        return _quantize(float(v), 2, AMOUNT_SCALE)
+
+    def rate(self, v: typing.Union[float, Decimal]) -> typing.Union[int, float]:
+        v = float(v)
+        n = _quantize(v, 4, RATE_SCALE)
+        if n == 0 and math.copysign(1.0, v) < 0:
+            return -0.0
+        return n
+
+    def amount_of(self, equity: int, value: int) -> int:
+        return scaled_amount_of(equity, value)
+
+    def value_of(self, amount: int, equity: int) -> int:
+        if equity == 0:
+            return 0
+        return self.value(amount * EQUITY_SCALE / (equity * AMOUNT_SCALE))
+
+    def rate_of(self, num: int, den: int) -> typing.Union[int, float]:
+        if den == 0:
+            return 0
+        return self.rate(num / den)
+
+    def scaled(self, v: int, scale: int) -> int:
+        return v
+
+    def from_scaled(self, n: int, scale: int) -> int:
+        return int(n)
+
+    def to_equity(self, v: int) -> Decimal:
+        return Decimal(v).scaleb(-3)
+
+    def to_value(self, v: int) -> Decimal:
+        return Decimal(v).scaleb(-4)
+
+    def to_amount(self, v: int) -> Decimal:
+        return Decimal(v).scaleb(-2)
+
+    def to_rate(self, v: typing.Union[int, float]) -> Decimal:
+        return Decimal(v).scaleb(-4)
+
+
+DECIMAL = Numeric()
+FIXED = FixedNumeric()
+NUMERICS = {i.name: i for i in [DECIMAL, FIXED]}
+
+
+def get_numeric(name: str) -> Numeric:
+    if name not in NUMERICS:
+        raise ValueError(f'unknown numeric: {name}, choices: {sorted(NUMERICS)}')
+    return NUMERICS[name]
+
+
+def _quantize(v: float, digits: int, scale: int) -> int:
+    """float 的精确值四舍六入五成双到 digits 位小数，返回定点整数"""
+    s = v * scale
+    n = round(s)
+    # 乘法误差不超过 1e-7，离五入边界足够远时快速取整的结果不受误差影响
+    if 0.5 - abs(s - n) > 1e-6 and -1e9 < s < 1e9:
+        return n
+    return round(round(v, digits) * scale)
@@ -0,0 +1,75 @@
+# coding: utf8
+import re
+import typing
+
+
+class Dialect:
+    """SQL 方言，DAO 按 MySQL 语法编写，由方言翻译为目标数据库的语句"""
+
+    name = 'mysql'
+    # 单条语句允许的最大参数个数
+    max_params = 65535
+
+    def translate(self, query: str) -> str:
+        return query
+
+    def split_script(self, script: str) -> typing.List[str]:
+        """按分号拆分 sql 脚本，忽略注释；BEGIN ... END 块内的分号不拆分"""
+        lines = [line for line in script.splitlines() if not line.strip().startswith('--')]
+        statements, current, depth = [], [], 0
+        for line in lines:
+            current.append(line)
+            word = line.strip().rstrip(';').upper()
+            if word == 'BEGIN':
+                depth += 1
+            elif word == 'END' and depth > 0:
+                depth -= 1
+            if depth == 0 and line.rstrip().endswith(';'):
+                statements.append('\n'.join(current).strip().rstrip(';'))
+                current = []
+        rest = '\n'.join(current).strip()
+        if rest:
+            statements.append(rest)
+        return statements
+
+
+class MysqlDialect(Dialect):
+    pass
+
+
+class SqliteDialect(Dialect):
+    """
+    - 占位符 %s -> ?，转义 %% -> %，引号内的字符串字面量不替换占位符
+    - insert ignore -> insert or ignore
+    - weekday()/yearweek()/floor() 等 MySQL 函数由连接注册为同名函数
+    """
+
+    name = 'sqlite'
+    max_params = 32766
+
+    # 字符串字面量、引号标识符、占位符及 % 转义，字面量按 MySQL 允许 '' 与反斜杠转义
+    _TOKENS = re.compile(r"""'(?:[^'\\]|\\.|'')*'|"(?:[^"\\]|\\.|"")*"|`[^`]*`|%s|%%""", re.DOTALL)
+    _REPLACES = [
+        (re.compile(r'^\s*insert\s+ignore\s+into\b', re.IGNORECASE), 'insert or ignore into'),
+    ]
+
+    def __init__(self):
+        self._cache: typing.Dict[str, str] = {}
+
+    def translate(self, query: str) -> str:
+        translated = self._cache.get(query)
+        if translated is None:
+            translated = self._TOKENS.sub(self._token, query)
+            for pattern, repl in self._REPLACES:
+                translated = pattern.sub(repl, translated)
+            if len(self._cache) < 1024:
+                self._cache[query] = translated
+        return translated
+
+    @staticmethod
+    def _token(match: typing.Match) -> str:
+        """pymysql 按 `query % args` 格式化，字面量中的 %% 同样转为 %"""
+        token = match.group()
+        if token == '%s':
+            return '?'
+        return token.replace('%%', '%')
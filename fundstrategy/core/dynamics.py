@@ -2,27 +2,60 @@
 import json
 import typing
 
+try:
+    # 可选依赖，安装后用于解析 json，解析结果与标准库一致
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def loads(json_str: typing.Union[str, bytes]):
+    """解析 json，安装了 orjson 时使用 orjson"""
+    if orjson is not None:
+        try:
+            return orjson.loads(json_str)
+        except orjson.JSONDecodeError:
+            # orjson 不支持 NaN、超过 64 位的整数等标准库可解析的内容，交给标准库
+            pass
+    return json.loads(json_str)
+
 
 class DynamicObject:
+    __slots__ = ('_data_', '_strict_', '_children_')
+
     def __init__(self, data: dict, strict=False):
         self._data_ = data
         self._strict_ = strict
+        # 已包装的子对象，key -> DynamicObject，首次访问时创建
+        self._children_: typing.Optional[typing.Dict[str, DynamicObject]] = None
 
     def unwrap(self) -> dict:
         return self._data_
 
     def __getattr__(self, item):
+        if item in DynamicObject.__slots__:
+            # 未经 __init__ 创建的实例（如 copy、pickle）访问槽位，避免递归
+            raise AttributeError(item)
         if item not in self._data_:
             if self._strict_:
                 raise AttributeError(f'unknown attribute: {item}')
             return None
         value = self._data_[item]
         if isinstance(value, dict):
-            value = DynamicObject(value, strict=self._strict_)
+            children = self._children_
+            if children is None:
+                children = self._children_ = {}
+            child = children.get(item)
+            # 底层 dict 被直接替换时重新包装
+            if child is None or child._data_ is not value:
+                child = children[item] = DynamicObject(value, strict=self._strict_)
+            value = child
         return value
 
     def __setitem__(self, key, value):
         self._data_[key] = value
+        if self._children_ is not None:
+            self._children_.pop(key, None)
 
     def __len__(self):
         return len(self._data_)
@@ -31,8 +64,8 @@ class DynamicObject:
         return self._data_.__repr__()
 
     @staticmethod
-    def parse_json(json_str: str, strict=False):
-        d = json.loads(json_str)
+    def parse_json(json_str: typing.Union[str, bytes], strict=False):
+        d = loads(json_str)
         return DynamicObject(d, strict=strict)
 
     def as_json(self, indent: typing.Union[int, None] = 2):
@@ -0,0 +1,55 @@
+# coding: utf8
+import typing
+
+# 每个 2 的幂区间再分的桶数，分位数相对误差不超过 1/_SUB_BUCKETS
+_SUB_BUCKETS = 8
+_SUB_BITS = 3
+
+
+class LatencyHistogram:
+    """对数分桶的耗时直方图，内存与样本数无关，可跨进程合并"""
+
+    def __init__(self):
+        # 桶序号 -> 样本数
+        self.buckets: typing.Dict[int, int] = {}
+        self.count = 0
+        self.max_ns = 0
+
+    def __repr__(self):
+        return f'<{self.__class__.__name__}: count={self.count}, p50={self.percentile(50)}ns>'
+
+    def add(self, ns: int):
+        if ns < _SUB_BUCKETS * 2:
+            index = ns
+        else:
+            shift = ns.bit_length() - _SUB_BITS - 1
+            index = shift * _SUB_BUCKETS + (ns >> shift)
+        self.buckets[index] = self.buckets.get(index, 0) + 1
+        self.count += 1
+        if ns > self.max_ns:
+            self.max_ns = ns
+
+    def merge(self, other: 'LatencyHistogram'):
+        for index, n in other.buckets.items():
+            self.buckets[index] = self.buckets.get(index, 0) + n
+        self.count += other.count
+        self.max_ns = max(self.max_ns, other.max_ns)
+
+    def percentile(self, q: float) -> int:
+        """q 分位的耗时（纳秒），取所在桶的上界，不超过最大值"""
+        if self.count == 0:
+            return 0
+        rank = max(1, int(self.count * q / 100 + 0.5))
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen >= rank:
+                return min(_bucket_upper(index), self.max_ns)
+        return self.max_ns
+
+
+def _bucket_upper(index: int) -> int:
+    if index < _SUB_BUCKETS * 2:
+        return index
+    shift = index // _SUB_BUCKETS - 1
+    return ((index - shift * _SUB_BUCKETS + 1) << shift) - 1
@@ -0,0 +1,168 @@
+# coding: utf8
+import abc
+import collections
+import typing
+from decimal import Decimal
+
+from fundstrategy.core import decimals
+
+
+class RollingIndicator(abc.ABC):
+    """滚动窗口指标，每次结算增量更新，O(1) 读取"""
+
+    def __init__(self, days: int):
+        """
+        :param days: 窗口天数，0 为不限天数，即全部历史
+        """
+        assert days >= 0
+        self.days = int(days)
+        self._count = 0
+
+    def __repr__(self):
+        return f'<{self.__class__.__name__}: days={self.days}, value={self.value}>'
+
+    @property
+    def key(self) -> typing.Tuple[str, int]:
+        """同类同窗口的指标只注册一次"""
+        return self.__class__.__name__, self.days
+
+    def update(self, value: Decimal):
+        """追加一天的净值"""
+        self._count += 1
+        self.do_update(value)
+
+    @abc.abstractmethod
+    def do_update(self, value: Decimal):
+        raise NotImplementedError
+
+    @property
+    @abc.abstractmethod
+    def value(self) -> Decimal:
+        """当前窗口内的指标值，窗口为空时为 0"""
+        raise NotImplementedError
+
+    def get_state(self) -> dict:
+        """检查点状态，可 json 序列化，净值为定点整数"""
+        return dict(count=self._count)
+
+    def set_state(self, state: dict):
+        self._count = state['count']
+
+
+class _MonotonicIndicator(RollingIndicator):
+    """单调队列实现的滚动最值"""
+
+    def __init__(self, days: int):
+        super().__init__(days)
+        # (序号, 净值)，按净值单调
+        self._window: typing.Deque[typing.Tuple[int, Decimal]] = collections.deque()
+
+    @abc.abstractmethod
+    def _dominates(self, new: Decimal, old: Decimal) -> bool:
+        raise NotImplementedError
+
+    def do_update(self, value: Decimal):
+        window = self._window
+        while window and self._dominates(value, window[-1][1]):
+            window.pop()
+        window.append((self._count, value))
+        while self.days and window[0][0] <= self._count - self.days:
+            window.popleft()
+
+    @property
+    def value(self) -> Decimal:
+        if not self._window:
+            return decimals.value(0)
+        return self._window[0][1]
+
+    def get_state(self) -> dict:
+        state = super().get_state()
+        state['window'] = [[i, decimals.to_scaled(v, decimals.VALUE_SCALE)] for i, v in self._window]
+        return state
+
+    def set_state(self, state: dict):
+        super().set_state(state)
+        self._window = collections.deque((i, decimals.from_scaled(v, decimals.VALUE_SCALE))
+                                         for i, v in state['window'])
+
+
+class RollingMax(_MonotonicIndicator):
+    """最近N天最大净值"""
+
+    def _dominates(self, new: Decimal, old: Decimal) -> bool:
+        return new >= old
+
+
+class RollingMin(_MonotonicIndicator):
+    """最近N天最小净值"""
+
+    def _dominates(self, new: Decimal, old: Decimal) -> bool:
+        return new <= old
+
+
+class RollingMean(RollingIndicator):
+    """最近N天平均净值"""
+
+    def __init__(self, days: int):
+        super().__init__(days)
+        self._window: typing.Deque[Decimal] = collections.deque()
+        self._sum = Decimal(0)
+
+    def do_update(self, value: Decimal):
+        self._window.append(value)
+        self._sum += value
+        if self.days and len(self._window) > self.days:
+            self._sum -= self._window.popleft()
+
+    @property
+    def value(self) -> Decimal:
+        if not self._window:
+            return decimals.value(0)
+        return decimals.value(self._sum / len(self._window))
+
+    def get_state(self) -> dict:
+        state = super().get_state()
+        state['window'] = [decimals.to_scaled(v, decimals.VALUE_SCALE) for v in self._window]
+        return state
+
+    def set_state(self, state: dict):
+        super().set_state(state)
+        self._window = collections.deque(decimals.from_scaled(v, decimals.VALUE_SCALE) for v in state['window'])
+        self._sum = sum(self._window, Decimal(0))
+
+
+class RollingDrawback(RollingIndicator):
+    """最新净值相对于最近N天最大净值的回撤比例"""
+
+    def __init__(self, days: int):
+        super().__init__(days)
+        self._max = RollingMax(days)
+        self._last = decimals.value(0)
+
+    def do_update(self, value: Decimal):
+        self._max.update(value)
+        self._last = value
+
+    @property
+    def value(self) -> Decimal:
+        return drawback_rate(self._max.value, self._last)
+
+    def get_state(self) -> dict:
+        state = super().get_state()
+        state['max'] = self._max.get_state()
+        state['last'] = decimals.to_scaled(self._last, decimals.VALUE_SCALE)
+        return state
+
+    def set_state(self, state: dict):
+        super().set_state(state)
+        self._max.set_state(state['max'])
+        self._last = decimals.from_scaled(state['last'], decimals.VALUE_SCALE)
+
+
+def drawback_rate(max_value: Decimal, curr_value: Decimal) -> Decimal:
+    """相对于最大净值的变动比例"""
+    if max_value == 0:
+        rate = 0
+    else:
+        rate = (max_value - curr_value) / max_value
+    return decimals.rate(rate)
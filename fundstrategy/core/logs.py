@@ -0,0 +1,26 @@
+# coding: utf8
+
+
+class Truncated:
+    """日志参数，输出时才格式化并截断；bytes 只解码前 limit 个字节"""
+
+    __slots__ = ('value', 'limit')
+
+    def __init__(self, value, limit: int):
+        self.value = value
+        self.limit = limit
+
+    def __str__(self):
+        value = self.value
+        if isinstance(value, (bytes, bytearray)):
+            text = value[:self.limit].decode('utf8', errors='ignore')
+            size = len(value)
+            unit = 'bytes'
+        else:
+            text = str(value)
+            size = len(text)
+            unit = 'chars'
+            text = text[:self.limit]
+        if size > self.limit:
+            return f'{text}...({size} {unit})'
+        return text
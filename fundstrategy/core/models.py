@@ -1,7 +1,10 @@
 # coding: utf8
+import datetime
 import time
 import typing
 
+import numpy as np
+
 
 class FundInfo:
     def __init__(self, code, name):
@@ -13,15 +16,20 @@ class FundInfo:
 
 
 class FundNav:
-    def __init__(self, date: str, value: float, increase: float):
+    def __init__(self, date: str, value: float, increase: float, weekday: int = None):
         """
         :param date: yyyy-MM-dd
         :param value: 净值
         :param increase: 日增长率的百分点，0.1 -> 0.1%
+        :param weekday: 周几，1 为周一，如已存储的 day_of_week，为空时按日期计算
         """
         self.date = date
         self.value = value
         self.increase = increase
+        # 日期的序数，同 datetime.date.toordinal()，构造时解析一次
+        self.ordinal = datetime.date.fromisoformat(date[:10]).toordinal()
+        # 0001-01-01 为周一
+        self.weekday = weekday or (self.ordinal - 1) % 7 + 1
 
     def __repr__(self):
         return f'<{self.__class__.__name__}: {self.date}, {self.value}, {self.increase}>'
@@ -30,16 +38,147 @@ class FundNav:
     def rate(self):
         return self.increase / 100
 
+    @staticmethod
+    def of_ordinal(ordinal: int, value: float, increase: typing.Optional[float]) -> 'FundNav':
+        """由日期序数构造，跳过日期字符串的解析"""
+        nav = FundNav.__new__(FundNav)
+        nav.date = datetime.date.fromordinal(ordinal).isoformat()
+        nav.value = value
+        nav.increase = increase
+        nav.ordinal = ordinal
+        nav.weekday = (ordinal - 1) % 7 + 1
+        return nav
+
+
+# 1970-01-01 的日期序数，距 1970-01-01 的天数 + _EPOCH_ORDINAL 即日期序数
+_EPOCH_ORDINAL = 719163
+
+
+class NavSeries:
+    """
+    列式净值序列：int32 日期（距 1970-01-01 天数，同 `nav_store` 的日期列）、float64 净值、
+    float64 增长率（缺失为 nan），日期升序。
+    按下标或迭代取出时才构造 `FundNav`，可直接传给按 FundNav 迭代的回测与策略；
+    切片和按日期范围截取返回共享底层数组的视图，已是对应类型的数组构造时不复制
+    """
+
+    def __init__(self, days: np.ndarray, values: np.ndarray, increases: np.ndarray):
+        """
+        :param days: 距 1970-01-01 的天数
+        :param values: 净值
+        :param increases: 日增长率的百分点，缺失为 nan
+        """
+        assert len(days) == len(values) == len(increases)
+        self.days = np.asarray(days, dtype=np.int32)
+        self.values = np.asarray(values, dtype=np.float64)
+        self.increases = np.asarray(increases, dtype=np.float64)
+
+    def __repr__(self):
+        if len(self) == 0:
+            return f'<{self.__class__.__name__}: empty>'
+        return f'<{self.__class__.__name__}: {self[0].date} ~ {self[-1].date}, {len(self)} navs>'
+
+    def __len__(self):
+        return len(self.days)
+
+    def __getitem__(self, item) -> typing.Union[FundNav, 'NavSeries']:
+        if isinstance(item, slice):
+            return NavSeries(self.days[item], self.values[item], self.increases[item])
+        increase = float(self.increases[item])
+        return FundNav.of_ordinal(int(self.days[item]) + _EPOCH_ORDINAL, float(self.values[item]),
+                                  None if increase != increase else increase)
+
+    def __iter__(self) -> typing.Iterator[FundNav]:
+        of_ordinal = FundNav.of_ordinal
+        for d, v, i in zip(self.days.tolist(), self.values.tolist(), self.increases.tolist()):
+            yield of_ordinal(d + _EPOCH_ORDINAL, v, None if i != i else i)
+
+    def slice(self, start: str = None, end: str = None) -> 'NavSeries':
+        """日期在 [start, end] 内的视图，二分查找定位"""
+        beg = np.searchsorted(self.days, _day(start), side='left') if start else 0
+        stop = np.searchsorted(self.days, _day(end), side='right') if end else len(self)
+        return self[beg:stop]
+
+    @property
+    def ordinals(self) -> np.ndarray:
+        """日期序数，同 `FundNav.ordinal`"""
+        return self.days + _EPOCH_ORDINAL
+
+    @property
+    def dates(self) -> np.ndarray:
+        """datetime64[D] 日期"""
+        return self.days.astype('datetime64[D]')
+
     @property
-    def weekday(self):
-        t = time.strptime(self.date, DATE_FORMAT)
-        return t.tm_wday + 1
+    def rates(self) -> np.ndarray:
+        """日增长率，0.001 -> 0.1%"""
+        return self.increases / 100
+
+    @property
+    def weekdays(self) -> np.ndarray:
+        """周几，1~7；1970-01-01 为周四"""
+        return (self.days + 3) % 7 + 1
+
+    @staticmethod
+    def empty() -> 'NavSeries':
+        return NavSeries(np.zeros(0, dtype=np.int32), np.zeros(0), np.zeros(0))
+
+    @staticmethod
+    def from_dates(dates: np.ndarray, values: np.ndarray, increases: np.ndarray) -> 'NavSeries':
+        """
+        :param dates: datetime64 日期，或距 1970-01-01 的整数天数
+        """
+        days = np.asarray(dates)
+        if days.dtype.kind == 'M':
+            days = days.astype('datetime64[D]').astype(np.int64)
+        return NavSeries(days, values, increases)
+
+    @staticmethod
+    def from_columns(dates: typing.Sequence[str],
+                     values: typing.Sequence[float],
+                     increases: typing.Sequence[typing.Optional[float]]) -> 'NavSeries':
+        """由 yyyy-MM-dd 日期、净值、增长率（可为 None）各列构造"""
+        days = np.array([d[:10] for d in dates], dtype='datetime64[D]')
+        return NavSeries.from_dates(days,
+                                    np.array(values, dtype=np.float64),
+                                    np.array(increases, dtype=np.float64))
+
+    @staticmethod
+    def from_navs(navs: typing.Iterable[FundNav]) -> 'NavSeries':
+        if isinstance(navs, NavSeries):
+            return navs
+        navs = list(navs)
+        return NavSeries(np.array([i.ordinal - _EPOCH_ORDINAL for i in navs], dtype=np.int32),
+                         np.array([i.value for i in navs], dtype=np.float64),
+                         np.array([i.increase for i in navs], dtype=np.float64))
+
+    def to_navs(self) -> typing.List[FundNav]:
+        return list(self)
+
+    @staticmethod
+    def concat(items: typing.Sequence['NavSeries']) -> 'NavSeries':
+        if len(items) == 0:
+            return NavSeries.empty()
+        return NavSeries(np.concatenate([i.days for i in items]),
+                         np.concatenate([i.values for i in items]),
+                         np.concatenate([i.increases for i in items]))
+
+
+def _day(date: str) -> int:
+    """距 1970-01-01 的天数"""
+    return datetime.date.fromisoformat(date[:10]).toordinal() - _EPOCH_ORDINAL
 
 
 class FundNavList:
-    def __init__(self, fund_info: FundInfo, nav_list: typing.List[FundNav] = None):
+    def __init__(self, fund_info: FundInfo,
+                 nav_list: typing.Union[NavSeries, typing.Sequence[FundNav]] = None):
+        """
+        :param nav_list: 净值序列，FundNav 列表会转为 NavSeries
+        """
         self.info = fund_info
-        self.nav_list = nav_list or []
+        self._series = NavSeries.from_navs(nav_list) if nav_list is not None else NavSeries.empty()
+        # append 的净值先缓存，访问 nav_list 时一次合并
+        self._appended: typing.List[FundNav] = []
 
     def __repr__(self):
         info = self.info.__repr__()
@@ -49,10 +188,23 @@ class FundNavList:
         return f'{info}\nnavs:\n{navs}'
 
     def __len__(self):
-        return len(self.nav_list)
+        return len(self._series) + len(self._appended)
+
+    @property
+    def nav_list(self) -> NavSeries:
+        if self._appended:
+            self._series = NavSeries.concat([self._series, NavSeries.from_navs(self._appended)])
+            self._appended = []
+        return self._series
+
+    @nav_list.setter
+    def nav_list(self, nav_list: typing.Union[NavSeries, typing.Sequence[FundNav]]):
+        self._series = NavSeries.from_navs(nav_list)
+        self._appended = []
 
     def append(self, date: str, value: float, increase: float):
-        self.nav_list.append(FundNav(date, value, increase))
+        """追加一个净值，先缓存，访问 nav_list 时才合并入序列"""
+        self._appended.append(FundNav(date, value, increase))
 
 
 DATE_FORMAT = '%Y-%m-%d'
@@ -0,0 +1,182 @@
+# coding: utf8
+import contextlib
+import fcntl
+import json
+import logging
+import mmap
+import os
+import time
+import typing
+
+import numpy as np
+
+from fundstrategy.core import models
+from fundstrategy.core import vectorized
+
+_INDEX_FILE = 'index.json'
+
+
+class NavStore:
+    """
+    本地净值存储，供回测跳过数据库。目录结构：
+
+    - index.json: 基金索引，code -> {name, count, begin, end, synced_at}
+    - <code>.nav: 固定宽度二进制列，依次为 int32 日期（距 1970-01-01 天数）、float64 净值、float64 增长率，
+      各列按 8 字节对齐，通过 mmap 只读打开后零拷贝切片
+
+    `write` 只更新内存中的索引，`flush`（`close` 时自动调用）才写入 index.json，
+    写入时在文件锁内与磁盘上的索引合并，多个进程同时写入不同基金不会互相覆盖
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        self.logger = logging.getLogger(self.__class__.__name__)
+        os.makedirs(root, exist_ok=True)
+        self._index = self._load_index()
+        # 未写入 index.json 的索引项
+        self._pending: typing.Dict[str, dict] = {}
+        self._maps: typing.Dict[str, typing.Tuple[mmap.mmap, models.NavSeries]] = {}
+
+    def __repr__(self):
+        return f'<{self.__class__.__name__}: {self.root}, {len(self._index)} funds>'
+
+    def __contains__(self, code: str):
+        return code in self._index
+
+    def codes(self) -> typing.List[str]:
+        return sorted(self._index)
+
+    def get_info(self, code: str) -> typing.Optional[models.FundInfo]:
+        item = self._index.get(code)
+        if item is None:
+            return None
+        return models.FundInfo(code, item['name'])
+
+    def get_version(self, code: str, start: str = None, end: str = None) -> typing.Optional[str]:
+        """同 `NavDao.get_version`，按整个基金的条数、最新日期和写入时间，不区分日期范围"""
+        item = self._index.get(code)
+        if item is None:
+            return None
+        return f'{item["count"]}:{item["end"]}:{item["synced_at"]}'
+
+    def write(self, info: models.FundInfo, navs: typing.Sequence[models.FundNav]):
+        """整体覆盖写入一个基金的净值，navs 需按日期升序"""
+        series = models.NavSeries.from_navs(navs)
+        days = series.days
+        assert np.all(np.diff(days) > 0), f'{info}: navs must be sorted by date without duplicates'
+        self._unmap(info.code)
+        path = self._fund_file(info.code)
+        tmp = f'{path}.tmp'
+        with open(tmp, 'wb') as f:
+            for (name, offset, dtype), data in zip(_layout(len(navs)), [days, series.values, series.increases]):
+                f.write(b'\0' * (offset - f.tell()))
+                f.write(np.ascontiguousarray(data, dtype=dtype).tobytes())
+        os.replace(tmp, path)
+        self._index[info.code] = self._pending[info.code] = dict(name=info.name,
+                                                                 count=len(navs),
+                                                                 begin=navs[0].date if navs else None,
+                                                                 end=navs[-1].date if navs else None,
+                                                                 synced_at=int(time.time()),
+                                                                 )
+
+    def flush(self):
+        """把 `write` 之后的索引项合并写入 index.json"""
+        if not self._pending:
+            return
+        with self._index_lock():
+            index = self._load_index()
+            index.update(self._pending)
+            path = os.path.join(self.root, _INDEX_FILE)
+            with open(f'{path}.tmp', 'w') as f:
+                json.dump(index, f, ensure_ascii=False, indent=1, sort_keys=True)
+            os.replace(f'{path}.tmp', path)
+        self._index = index
+        self._pending = {}
+
+    def read(self, code: str, start: str = None, end: str = None) -> vectorized.NavArrays:
+        """
+        读取日期在 [start, end] 内的净值，日期列按二分查找定位；净值、增长率为 mmap 上的只读视图，
+        日期转为 datetime64[D]
+        """
+        series = self.list_series(code, start, end)
+        return vectorized.NavArrays(series.dates, series.values, series.increases)
+
+    def list_navs(self, code: str, start: str = None, end: str = None) -> typing.List[models.FundNav]:
+        """同 `NavDao.list_navs`"""
+        return self.list_series(code, start, end).to_navs()
+
+    def list_series(self, code: str, start: str = None, end: str = None) -> models.NavSeries:
+        """同 `NavDao.list_series`，各列均为 mmap 上的只读视图，不复制"""
+        return self._map(code).slice(start, end)
+
+    def iter_navs(self, code: str, start: str = None, end: str = None,
+                  chunk_size: int = 1000) -> typing.Iterator[models.FundNav]:
+        """同 `NavDao.iter_navs`，每次只把 chunk_size 个净值转为 FundNav"""
+        series = self.list_series(code, start, end)
+        for i in range(0, len(series), chunk_size):
+            yield from series[i:i + chunk_size]
+
+    def close(self):
+        self.flush()
+        for code in list(self._maps):
+            self._unmap(code)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _map(self, code: str) -> models.NavSeries:
+        """按列映射"""
+        if code not in self._maps:
+            count = self._index[code]['count'] if code in self._index else 0
+            if count == 0:
+                return models.NavSeries.empty()
+            with open(self._fund_file(code), 'rb') as f:
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            columns = [np.frombuffer(mm, dtype=dtype, count=count, offset=offset)
+                       for name, offset, dtype in _layout(count)]
+            self._maps[code] = mm, models.NavSeries(*columns)
+        return self._maps[code][1]
+
+    def _unmap(self, code: str):
+        item = self._maps.pop(code, None)
+        if item is not None:
+            mm, _ = item
+            try:
+                mm.close()
+            except BufferError:
+                # 外部仍持有切片视图，交给 gc 回收
+                pass
+
+    def _fund_file(self, code: str) -> str:
+        return os.path.join(self.root, f'{code}.nav')
+
+    def _load_index(self) -> dict:
+        path = os.path.join(self.root, _INDEX_FILE)
+        if not os.path.exists(path):
+            return {}
+        with open(path) as f:
+            return json.load(f)
+
+    @contextlib.contextmanager
+    def _index_lock(self):
+        """index.json 的进程间互斥锁"""
+        with open(os.path.join(self.root, f'{_INDEX_FILE}.lock'), 'w') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _layout(count: int) -> typing.List[typing.Tuple[str, int, type]]:
+    """(列名, 偏移, 类型)，各列 8 字节对齐"""
+    layout = []
+    offset = 0
+    for name, dtype in [('dates', np.int32), ('values', np.float64), ('increases', np.float64)]:
+        layout.append((name, offset, dtype))
+        offset += count * np.dtype(dtype).itemsize
+        offset = (offset + 7) // 8 * 8
+    return layout
@@ -0,0 +1,153 @@
+# coding: utf8
+import json
+import os
+import time
+import typing
+
+from fundstrategy.core import histograms
+from fundstrategy.core import models
+from fundstrategy.core import profits
+
+
+class StageStats:
+    """一个阶段的调用次数、耗时分布和触发的买卖次数"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.calls = 0
+        self.total_ns = 0
+        self.buys = 0
+        self.sells = 0
+        self.latency = histograms.LatencyHistogram()
+
+    def __repr__(self):
+        return f'<{self.__class__.__name__}: {self.name}, calls={self.calls}, total={self.total_ns / 1e6:.1f}ms>'
+
+    def add(self, ns: int, buys: int = 0, sells: int = 0):
+        self.calls += 1
+        self.total_ns += ns
+        self.buys += buys
+        self.sells += sells
+        self.latency.add(ns)
+
+    def merge(self, other: 'StageStats'):
+        self.calls += other.calls
+        self.total_ns += other.total_ns
+        self.buys += other.buys
+        self.sells += other.sells
+        self.latency.merge(other.latency)
+
+    def as_dict(self) -> dict:
+        """耗时单位为微秒"""
+        return dict(name=self.name,
+                    calls=self.calls,
+                    total_us=self.total_ns / 1e3,
+                    mean_us=self.total_ns / self.calls / 1e3 if self.calls else 0.0,
+                    p50_us=self.latency.percentile(50) / 1e3,
+                    p90_us=self.latency.percentile(90) / 1e3,
+                    p99_us=self.latency.percentile(99) / 1e3,
+                    max_us=self.latency.max_ns / 1e3,
+                    buys=self.buys,
+                    sells=self.sells,
+                    )
+
+
+class Profiler:
+    """
+    回测剖析：按阶段统计调用次数、耗时分位数和买卖触发次数；
+    阶段为 `do_regular`、`settle` 和每个策略 `strategy.<类名>`，同类策略合并统计。
+    传给 `regular.RegularInvest` 后生效，未传入时回测无额外开销
+    """
+
+    def __init__(self):
+        self.stages: typing.Dict[str, StageStats] = {}
+        # 剖析过的回测次数
+        self.runs = 0
+
+    def __repr__(self):
+        return f'<{self.__class__.__name__}: runs={self.runs}, stages={len(self.stages)}>'
+
+    def stage(self, name: str) -> StageStats:
+        stats = self.stages.get(name)
+        if stats is None:
+            stats = self.stages[name] = StageStats(name)
+        return stats
+
+    def instrument(self, invest, record: profits.ProfitRecord,
+                   masks: typing.List[typing.Optional[list]] = None) -> typing.Tuple[typing.Callable, ...]:
+        """
+        返回计时版本的 (do_strategies, do_regular, settle)，签名与 `RegularInvest` 的方法一致
+
+        :param invest: `regular.RegularInvest`
+        :param masks: `RegularInvest.precompute` 的结果，预计算的策略只统计触发日的调用
+        """
+        self.runs += 1
+        clock = time.perf_counter_ns
+        acc_buy, acc_sell = record.acc_buy, record.acc_sell
+        masks = masks or [None] * len(invest.strategies)
+        strategies = [(s.do_strategy if m is None else s.do_signal, m, self.stage(f'strategy.{s.__class__.__name__}'))
+                      for s, m in zip(invest.strategies, masks)]
+        regular_stage, settle_stage = self.stage('do_regular'), self.stage('settle')
+
+        def do_strategies(r: profits.ProfitRecord, days: int, nav: models.FundNav):
+            for do, mask, stats in strategies:
+                if mask is not None and not mask[days]:
+                    continue
+                buys, sells = acc_buy.count, acc_sell.count
+                beg = clock()
+                do(r, days, nav)
+                stats.add(clock() - beg, acc_buy.count - buys, acc_sell.count - sells)
+
+        def do_regular(r: profits.ProfitRecord, days: int, nav: models.FundNav):
+            buys, sells = acc_buy.count, acc_sell.count
+            beg = clock()
+            invest.do_regular(r, days, nav)
+            regular_stage.add(clock() - beg, acc_buy.count - buys, acc_sell.count - sells)
+
+        def settle(date: str, net_value: float) -> profits.PositionSnap:
+            beg = clock()
+            position = record.settle(date, net_value)
+            settle_stage.add(clock() - beg)
+            return position
+
+        return do_strategies, do_regular, settle
+
+    def merge(self, other: 'Profiler'):
+        """合并其他回测（如参数扫描子进程）的统计"""
+        self.runs += other.runs
+        for name, stats in other.stages.items():
+            self.stage(name).merge(stats)
+
+    def reset(self):
+        self.stages = {}
+        self.runs = 0
+
+    def report(self) -> dict:
+        """结构化报告，阶段按总耗时降序"""
+        stages = sorted(self.stages.values(), key=lambda s: s.total_ns, reverse=True)
+        total_ns = sum(s.total_ns for s in stages)
+        items = []
+        for s in stages:
+            item = s.as_dict()
+            item['share'] = s.total_ns / total_ns if total_ns else 0.0
+            items.append(item)
+        return dict(runs=self.runs, total_us=total_ns / 1e3, stages=items)
+
+    def write_report(self, out_json: str):
+        dirname = os.path.dirname(out_json)
+        if dirname:
+            os.makedirs(dirname, exist_ok=True)
+        with open(out_json, 'w') as outf:
+            json.dump(self.report(), outf, indent=2, ensure_ascii=False)
+
+    def print_report(self):
+        report = self.report()
+        print(f'* profile: {report["runs"]} runs, {report["total_us"] / 1e3:.1f}ms')
+        tformat = '{:<36} | {:>9} | {:>6} | {:>9} | {:>9} | {:>9} | {:>6} | {:>6}'
+        print('-' * 110)
+        print(tformat.format('stage', 'calls', 'share', 'mean us', 'p50 us', 'p99 us', 'buys', 'sells'))
+        print('+' * 110)
+        for s in report['stages']:
+            print(tformat.format(s['name'], s['calls'], f'{s["share"]:.1%}', f'{s["mean_us"]:.2f}',
+                                 f'{s["p50_us"]:.2f}', f'{s["p99_us"]:.2f}', s['buys'], s['sells']))
+        print('-' * 110)
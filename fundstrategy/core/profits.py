@@ -1,9 +1,13 @@
+import datetime
 import os
 import typing
 from decimal import Decimal
 
+import numpy as np
+
 from fundstrategy.core import accs
 from fundstrategy.core import decimals
+from fundstrategy.core import indicators
 
 
 class PositionSnap:
@@ -11,94 +15,281 @@ class PositionSnap:
     持仓快照: 持仓资产、收益及成本价说明：https://www.futuhk.com/hans/support/topic448?lang=zh-cn
     """
 
-    def __init__(self, date: str, net_value: Decimal, equity: Decimal, cost: Decimal):
+    def __init__(self, date: str, net_value, equity, cost, numeric: decimals.Numeric = decimals.DECIMAL):
         """
         :param date: 日期
         :param net_value: 当日净值
         :param equity: 持仓份额
         :param cost: 买入成本
+        :param numeric: 数值后端，净值、份额、成本按该后端表示，属性统一返回 Decimal
         """
         self.date = date
-        self.net_value = net_value
-        self.equity = equity
-        self.cost = cost
+        self.numeric = numeric
+        self._net_value = net_value
+        self._equity = equity
+        self._cost = cost
+
+    @property
+    def net_value(self) -> Decimal:
+        """当日净值"""
+        return self.numeric.to_value(self._net_value)
+
+    @property
+    def equity(self) -> Decimal:
+        """持仓份额"""
+        return self.numeric.to_equity(self._equity)
+
+    @property
+    def cost(self) -> Decimal:
+        """买入成本"""
+        return self.numeric.to_amount(self._cost)
 
     @property
     def amount(self) -> Decimal:
         """持仓金额"""
-        return decimals.amount(self.equity * self.net_value)
+        return self.numeric.to_amount(self.numeric.amount_of(self._equity, self._net_value))
 
     @property
     def avg_value(self):
         """平均买入净值"""
-        if self.equity == 0:
-            return decimals.value(0)
-        return decimals.value(self.cost / self.equity)
+        return self.numeric.to_value(self.numeric.value_of(self._cost, self._equity))
 
     @property
     def profit(self) -> Decimal:
         """持仓收益"""
-        return self.amount - self.cost
+        return self.numeric.to_amount(self._profit())
 
     @property
     def profit_rate(self) -> Decimal:
         """持仓收益率"""
-        if self.cost == 0:
-            return decimals.rate(0)
-        return decimals.rate(self.profit / self.cost)
+        return self.numeric.to_rate(self.numeric.rate_of(self._profit(), self._cost))
+
+    def _profit(self):
+        return self.numeric.amount_of(self._equity, self._net_value) - self._cost
+
+
+class PositionHistory:
+    """
+    列式持仓历史：日期序数、净值、份额、成本分别存为预分配、按需扩容的定点整数数组，
+    持仓金额、收益、收益率等派生列按需一次性向量化计算。按下标访问时返回 `PositionSnap` 视图
+    """
+
+    def __init__(self, capacity: int = 256):
+        self._size = 0
+        self._dates = np.zeros(capacity, dtype=np.int32)
+        self._values = np.zeros(capacity, dtype=np.int64)
+        self._equities = np.zeros(capacity, dtype=np.int64)
+        self._costs = np.zeros(capacity, dtype=np.int64)
+
+    def __len__(self):
+        return self._size
+
+    def __iter__(self) -> typing.Iterator[PositionSnap]:
+        for i in range(self._size):
+            yield self._snap(i)
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            return [self._snap(i) for i in range(*item.indices(self._size))]
+        if item < 0:
+            item += self._size
+        if not 0 <= item < self._size:
+            raise IndexError(item)
+        return self._snap(item)
+
+    def _snap(self, i: int) -> PositionSnap:
+        return PositionSnap(date=datetime.date.fromordinal(int(self._dates[i])).isoformat(),
+                            net_value=int(self._values[i]),
+                            equity=int(self._equities[i]),
+                            cost=int(self._costs[i]),
+                            numeric=decimals.FIXED,
+                            )
+
+    def append(self, date: str, net_value, equity, cost, numeric: decimals.Numeric = decimals.DECIMAL):
+        """
+        :param numeric: 净值、份额、成本的数值后端
+        """
+        if self._size == len(self._dates):
+            self._grow()
+        i = self._size
+        self._dates[i] = datetime.date.fromisoformat(date).toordinal()
+        self._values[i] = numeric.scaled(net_value, decimals.VALUE_SCALE)
+        self._equities[i] = numeric.scaled(equity, decimals.EQUITY_SCALE)
+        self._costs[i] = numeric.scaled(cost, decimals.AMOUNT_SCALE)
+        self._size += 1
+
+    def get_state(self) -> typing.Dict[str, np.ndarray]:
+        """检查点状态：日期序数及定点整数列"""
+        return dict(dates=self._dates[:self._size], values=self.net_values,
+                    equities=self.equities, costs=self.costs)
+
+    @staticmethod
+    def from_state(arrays: typing.Dict[str, np.ndarray]) -> 'PositionHistory':
+        size = len(arrays['dates'])
+        history = PositionHistory(capacity=max(size, 256))
+        for name, column in [('_dates', 'dates'), ('_values', 'values'),
+                             ('_equities', 'equities'), ('_costs', 'costs')]:
+            getattr(history, name)[:size] = arrays[column]
+        history._size = size
+        return history
+
+    def _grow(self):
+        capacity = max(len(self._dates) * 2, 16)
+        for name in ['_dates', '_values', '_equities', '_costs']:
+            column = getattr(self, name)
+            grown = np.zeros(capacity, dtype=column.dtype)
+            grown[:self._size] = column[:self._size]
+            setattr(self, name, grown)
+
+    @property
+    def dates(self) -> np.ndarray:
+        """日期，yyyy-MM-dd"""
+        days = self._dates[:self._size] - _EPOCH_ORDINAL
+        return np.datetime_as_string(days.astype('datetime64[D]'), unit='D')
+
+    @property
+    def net_values(self) -> np.ndarray:
+        """定点净值"""
+        return self._values[:self._size]
+
+    @property
+    def equities(self) -> np.ndarray:
+        """定点份额"""
+        return self._equities[:self._size]
+
+    @property
+    def costs(self) -> np.ndarray:
+        """定点成本"""
+        return self._costs[:self._size]
+
+    @property
+    def amounts(self) -> np.ndarray:
+        """定点持仓金额，取整规则同 `PositionSnap.amount`"""
+        equities, values = self.equities, self.net_values
+        unit = decimals.EQUITY_SCALE * decimals.VALUE_SCALE // decimals.AMOUNT_SCALE
+        q, r = np.divmod(equities * values, unit)
+        amounts = q + (r * 2 > unit)
+        for i in np.flatnonzero(r * 2 == unit):
+            amounts[i] = decimals.scaled_amount_of(int(equities[i]), int(values[i]))
+        return amounts
+
+    @property
+    def profits(self) -> np.ndarray:
+        """定点持仓收益"""
+        return self.amounts - self.costs
+
+    @property
+    def profit_rates(self) -> np.ndarray:
+        """持仓收益率，取整规则同 `PositionSnap.profit_rate`"""
+        profits, costs = self.profits, self.costs
+        rates = profits / np.where(costs == 0, 1, costs)
+        out = np.round(rates, 4)
+        # 接近五入边界的，按 float 精确值逐个处理
+        scaled = rates * decimals.RATE_SCALE
+        for i in np.flatnonzero(np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6):
+            out[i] = round(float(rates[i]), 4)
+        return np.where(costs == 0, 0.0, out)
+
+
+# 1970-01-01 的日期序数
+_EPOCH_ORDINAL = datetime.date(1970, 1, 1).toordinal()
+
+_POSITION_HEADER = 'date,nav,equity,amount,cost,profit,rate\n'
+_POSITION_FORMAT = '{:},{:.4f},{:.3f},{:.2f},{:.2f},{:.2f},{:.2%}\n'
+
+
+class PositionCsvSink:
+    """逐个写出结算的持仓快照，格式同 `ProfitRecord.write_positions`，用于不保留历史的流式回测"""
+
+    def __init__(self, out_csv: str, append: bool = False):
+        """
+        :param append: 追加到已有文件，用于从检查点继续的回测
+        """
+        os.makedirs(os.path.dirname(out_csv), exist_ok=True)
+        self.out_csv = out_csv
+        exists = append and os.path.exists(out_csv)
+        self._outf = open(out_csv, 'a' if exists else 'w')
+        if not exists:
+            self._outf.write(_POSITION_HEADER)
+
+    def __call__(self, position: PositionSnap):
+        self._outf.write(_POSITION_FORMAT.format(position.date, position.net_value, position.equity,
+                                                 position.amount, position.cost, position.profit,
+                                                 position.profit_rate))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        self._outf.close()
 
 
 class ProfitRecord:
     """收益记录"""
 
-    def __init__(self):
+    def __init__(self, numeric: decimals.Numeric = decimals.DECIMAL, keep_history: bool = True):
+        """
+        :param numeric: 数值后端，`decimals.FIXED` 以定点整数计算，结果与默认的 Decimal 后端一致
+        :param keep_history: 是否保留持仓历史和买卖流水；不保留时内存占用与回测天数无关，
+            持仓快照可在结算时交给 sink 输出
+        """
+        self.numeric = numeric
         # 累计买入
-        self.acc_buy = accs.Accumulation()
+        self.acc_buy = accs.Accumulation(numeric.amount(0), numeric.equity(0), numeric=numeric,
+                                         keep_history=keep_history)
         # 累计卖出
-        self.acc_sell = accs.Accumulation()
-        # 持仓历史
-        self.histories: typing.List[PositionSnap] = []
+        self.acc_sell = accs.Accumulation(numeric.amount(0), numeric.equity(0), numeric=numeric,
+                                          keep_history=keep_history)
+        # 持仓历史，不保留时为 None
+        self.histories = PositionHistory() if keep_history else None
+        # 首个、最近一个结算的持仓
+        self.first_position: typing.Optional[PositionSnap] = None
+        self.last_position: typing.Optional[PositionSnap] = None
+        # 已结算天数
+        self.settled_days = 0
         # 当前持仓份额
-        self._equity = decimals.equity(0)
+        self._equity = numeric.equity(0)
         # 当前净值
-        self._value = decimals.value(0)
+        self._value = numeric.value(0)
         # 当前成本
-        self._cost = decimals.amount(0)
+        self._cost = numeric.amount(0)
+        # 滚动窗口指标，结算时增量更新
+        self.indicators: typing.Dict[typing.Tuple[str, int], indicators.RollingIndicator] = {}
 
     @property
     def position_amount(self) -> Decimal:
         """当前持仓金额"""
-        return decimals.amount(self._equity * self._value)
+        return self.numeric.to_amount(self.numeric.amount_of(self._equity, self._value))
 
     @property
     def position_equity(self) -> Decimal:
-        return self._equity
+        return self.numeric.to_equity(self._equity)
 
     @property
     def position_cost(self) -> Decimal:
         """当前持仓成本"""
-        return self._cost
+        return self.numeric.to_amount(self._cost)
 
     @property
     def position_diluted_value(self) -> Decimal:
         """当前持仓摊薄净值"""
-        if self.position_equity == 0:
-            value = 0
-        else:
-            value = self.position_cost / self.position_equity
-        return decimals.value(value)
+        return self.numeric.to_value(self.numeric.value_of(self._cost, self._equity))
 
     @property
     def position_profit(self) -> Decimal:
         """当前持仓收益"""
-        return self.position_amount - self.position_cost
+        return self.numeric.to_amount(self._position_profit())
 
     @property
     def position_profit_rate(self) -> Decimal:
         """当前持仓收益率"""
-        if self.position_cost == 0:
-            return decimals.rate(0)
-        return decimals.rate(self.position_profit / self.position_cost)
+        return self.numeric.to_rate(self.numeric.rate_of(self._position_profit(), self._cost))
+
+    def _position_profit(self):
+        return self.numeric.amount_of(self._equity, self._value) - self._cost
 
     @property
     def total_amount(self) -> Decimal:
@@ -129,14 +320,18 @@ class ProfitRecord:
 
     def buy(self, date: str, net_value: float, amount: float) -> accs.Delta:
         """买入"""
+        numeric = self.numeric
+        delta_amount = numeric.amount(amount)
+        delta_equity = numeric.equity(amount / net_value)
         delta = accs.Delta(date=date,
-                           amount=decimals.amount(amount),
-                           equity=decimals.equity(amount / net_value),
-                           net_value=decimals.value(net_value),
+                           amount=delta_amount,
+                           equity=delta_equity,
+                           net_value=numeric.value(net_value),
+                           numeric=numeric,
                            )
         self.acc_buy.acc(delta)
-        self._equity = self._equity + delta.equity
-        self._cost = self._cost + delta.amount
+        self._equity = self._equity + delta_equity
+        self._cost = self._cost + delta_amount
         return delta
 
     def sell(self, date: str, net_value: float,
@@ -148,57 +343,127 @@ class ProfitRecord:
             equity = float(amount) / net_value
         else:
             amount = float(equity) * net_value
+        numeric = self.numeric
+        delta_amount = numeric.amount(amount)
+        delta_equity = numeric.equity(equity)
         delta = accs.Delta(date=date,
-                           amount=decimals.amount(amount),
-                           equity=decimals.equity(equity),
-                           net_value=decimals.value(net_value),
+                           amount=delta_amount,
+                           equity=delta_equity,
+                           net_value=numeric.value(net_value),
+                           numeric=numeric,
                            )
         self.acc_sell.acc(delta)
-        self._equity = self._equity - delta.equity
-        self._cost = self._cost - delta.amount
+        self._equity = self._equity - delta_equity
+        self._cost = self._cost - delta_amount
         if self._equity <= 0:  # 清仓
-            self._cost = decimals.amount(0)
+            self._cost = numeric.amount(0)
         return delta
 
     def settle(self, date: str, net_value: float) -> PositionSnap:
         """当天结算收益"""
+        numeric = self.numeric
+        value = numeric.value(net_value)
         position = PositionSnap(date,
-                                net_value=decimals.value(net_value),
-                                equity=self.position_equity,
-                                cost=self.position_cost,
+                                net_value=value,
+                                equity=self._equity,
+                                cost=self._cost,
+                                numeric=numeric,
                                 )
-        self.histories.append(position)
-        self._value = decimals.value(net_value)
+        if self.histories is not None:
+            self.histories.append(date, value, self._equity, self._cost, numeric=numeric)
+        if self.first_position is None:
+            self.first_position = position
+        self.last_position = position
+        self.settled_days += 1
+        self._value = value
+        if self.indicators:
+            value = numeric.to_value(value)
+            for indicator in self.indicators.values():
+                indicator.update(value)
         return position
 
+    def register_indicator(self, indicator: indicators.RollingIndicator) -> indicators.RollingIndicator:
+        """注册滚动指标，同类同窗口的返回已注册的实例；已有持仓历史时用历史补齐窗口"""
+        if indicator.key in self.indicators:
+            return self.indicators[indicator.key]
+        if self.histories is not None:
+            for position in self.histories[-indicator.days:]:
+                indicator.update(position.net_value)
+        elif self.last_position is not None:
+            raise ValueError(f'history not kept, register {indicator} before settle')
+        self.indicators[indicator.key] = indicator
+        return indicator
+
+    def get_state(self) -> typing.Tuple[dict, typing.Dict[str, np.ndarray]]:
+        """
+        检查点状态：(可 json 序列化的标量, 列数组)，金额、份额、净值均为定点整数，
+        数组按 positions./buy./sell. 前缀区分持仓历史和买卖流水
+        """
+        numeric = self.numeric
+        state = dict(numeric=numeric.name,
+                     keep_history=self.histories is not None,
+                     settled_days=self.settled_days,
+                     equity=numeric.scaled(self._equity, decimals.EQUITY_SCALE),
+                     value=numeric.scaled(self._value, decimals.VALUE_SCALE),
+                     cost=numeric.scaled(self._cost, decimals.AMOUNT_SCALE),
+                     first_position=_position_state(self.first_position),
+                     last_position=_position_state(self.last_position),
+                     indicators=[dict(name=i.__class__.__name__, days=i.days, state=i.get_state())
+                                 for i in self.indicators.values()],
+                     )
+        arrays = {}
+        if self.histories is not None:
+            arrays.update({f'positions.{k}': v for k, v in self.histories.get_state().items()})
+        for prefix, acc in [('buy', self.acc_buy), ('sell', self.acc_sell)]:
+            state[prefix], acc_arrays = acc.get_state()
+            arrays.update({f'{prefix}.{k}': v for k, v in acc_arrays.items()})
+        return state, arrays
+
+    @staticmethod
+    def from_state(state: dict, arrays: typing.Dict[str, np.ndarray]) -> 'ProfitRecord':
+        """从 `get_state` 的结果恢复，继续结算的结果与不中断时一致"""
+        numeric = decimals.get_numeric(state['numeric'])
+        record = ProfitRecord(numeric, keep_history=state['keep_history'])
+        record.settled_days = state['settled_days']
+        record._equity = numeric.from_scaled(state['equity'], decimals.EQUITY_SCALE)
+        record._value = numeric.from_scaled(state['value'], decimals.VALUE_SCALE)
+        record._cost = numeric.from_scaled(state['cost'], decimals.AMOUNT_SCALE)
+        record.first_position = _position_from_state(state['first_position'], numeric)
+        record.last_position = _position_from_state(state['last_position'], numeric)
+        for item in state['indicators']:
+            indicator = getattr(indicators, item['name'])(item['days'])
+            indicator.set_state(item['state'])
+            record.indicators[indicator.key] = indicator
+        if record.histories is not None:
+            record.histories = PositionHistory.from_state(_sub_arrays(arrays, 'positions'))
+        record.acc_buy = accs.Accumulation.from_state(state['buy'], _sub_arrays(arrays, 'buy'), numeric)
+        record.acc_sell = accs.Accumulation.from_state(state['sell'], _sub_arrays(arrays, 'sell'), numeric)
+        return record
+
     def max_value_in_days(self, days: int) -> Decimal:
         """最近N天内的最大净值"""
-        max_value = decimals.value(0)
-        for position in self.histories[-days:]:
-            max_value = max(max_value, position.net_value)
-        return max_value
+        return self.register_indicator(indicators.RollingMax(days)).value
 
     def value_drawback_rate(self, curr_value: float, days: int) -> Decimal:
         """指定净值相对于最近N天最大净值的变动比例"""
-        max_value = self.max_value_in_days(days)
-        if max_value == 0:
-            rate = 0
-        else:
-            rate = (max_value - decimals.value(curr_value)) / max_value
-        return decimals.rate(rate)
+        return indicators.drawback_rate(self.max_value_in_days(days), decimals.value(curr_value))
 
     def write_positions(self, out_csv):
+        if self.histories is None:
+            raise ValueError('history not kept, use PositionCsvSink instead')
         os.makedirs(os.path.dirname(out_csv), exist_ok=True)
         with open(out_csv, 'w') as outf:
-            outf.write('date,nav,equity,amount,cost,profit,rate\n')
-            for snap in self.histories:
-                outf.write(_csv_row(snap.date,
-                                    snap.net_value,
-                                    snap.equity,
-                                    snap.amount,
-                                    snap.cost,
-                                    snap.profit,
-                                    f'{snap.profit_rate:.2%}'))
+            outf.write(_POSITION_HEADER)
+            h = self.histories
+            columns = zip(h.dates,
+                          h.net_values / decimals.VALUE_SCALE,
+                          h.equities / decimals.EQUITY_SCALE,
+                          h.amounts / decimals.AMOUNT_SCALE,
+                          h.costs / decimals.AMOUNT_SCALE,
+                          h.profits / decimals.AMOUNT_SCALE,
+                          h.profit_rates)
+            for row in columns:
+                outf.write(_POSITION_FORMAT.format(*row))
 
     def print_total(self):
         acc_position = accs.Accumulation(self.position_amount, self.position_equity)
@@ -206,7 +471,7 @@ class ProfitRecord:
         acc_profit = accs.Accumulation(self.total_profit, self.total_equity)
 
         # value
-        beg, end = self.histories[0], self.histories[-1]
+        beg, end = self.first_position, self.last_position
         change_rate = decimals.rate(end.net_value / beg.net_value - 1)
         print(f'{beg.date} ~ {end.date}: {beg.net_value} ~ {end.net_value}, {change_rate:.2%}')
 
@@ -216,7 +481,7 @@ class ProfitRecord:
         print(tformat.format('收益对比', '收益', '收益率'))
         print('+' * 40)
         print(tformat.format('策略收益', f'{self.total_profit}', f'{self.total_profit_rate:.2%}'))
-        net_value = self.histories[-1].net_value
+        net_value = end.net_value
         profit = decimals.amount(net_value * self.acc_buy.equity - self.acc_buy.amount)
         profit_rate = decimals.rate(profit / self.acc_buy.amount)
         print(tformat.format('定投收益', f'{profit}', f'{profit_rate:.2%}'))
@@ -242,5 +507,27 @@ class ProfitRecord:
         print('-' * 70)
 
 
-def _csv_row(*args):
-    return ','.join([str(i) for i in args]) + '\n'
+def _position_state(position: typing.Optional[PositionSnap]) -> typing.Optional[list]:
+    if position is None:
+        return None
+    numeric = position.numeric
+    return [position.date,
+            numeric.scaled(position._net_value, decimals.VALUE_SCALE),
+            numeric.scaled(position._equity, decimals.EQUITY_SCALE),
+            numeric.scaled(position._cost, decimals.AMOUNT_SCALE)]
+
+
+def _position_from_state(state: typing.Optional[list], numeric: decimals.Numeric) -> typing.Optional[PositionSnap]:
+    if state is None:
+        return None
+    date, value, equity, cost = state
+    return PositionSnap(date,
+                        net_value=numeric.from_scaled(value, decimals.VALUE_SCALE),
+                        equity=numeric.from_scaled(equity, decimals.EQUITY_SCALE),
+                        cost=numeric.from_scaled(cost, decimals.AMOUNT_SCALE),
+                        numeric=numeric)
+
+
+def _sub_arrays(arrays: typing.Dict[str, np.ndarray], prefix: str) -> typing.Dict[str, np.ndarray]:
+    prefix = f'{prefix}.'
+    return {k[len(prefix):]: v for k, v in arrays.items() if k.startswith(prefix)}
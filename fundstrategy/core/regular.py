@@ -6,18 +6,53 @@ import typing
 
 import numpy as np
 
+from fundstrategy.core import decimals
 from fundstrategy.core import models
+from fundstrategy.core import profiling
 from fundstrategy.core import profits
+from fundstrategy.core import schedules
+from fundstrategy.core import signals
 
 
 class ProfitStrategy(abc.ABC):
     """收益率策略"""
 
+    def prepare(self, record: profits.ProfitRecord):
+        """回测开始或继续前的准备，如注册需要的滚动指标，须可重复调用"""
+        pass
+
+    def params(self) -> dict:
+        """策略参数，即公开属性"""
+        return {k: v for k, v in vars(self).items() if not k.startswith('_')}
+
+    def get_state(self) -> dict:
+        """回测中变化的状态，即下划线开头的属性，须可 json 序列化"""
+        return {k: v for k, v in vars(self).items() if k.startswith('_')}
+
+    def set_state(self, state: dict):
+        for k, v in state.items():
+            setattr(self, k, v)
+
     @abc.abstractmethod
     def do_strategy(self, record: profits.ProfitRecord, days: int, nav: models.FundNav):
         """策略操作"""
         raise NotImplemented
 
+    def precompute(self, nav_signals: signals.NavSignals) -> typing.Optional[np.ndarray]:
+        """
+        可选的向量化预计算：触发条件只依赖净值序列的策略，一次算出整个序列上的触发日掩码，
+        回测时只在触发日调用 `do_signal`；默认返回 None，即逐日调用 `do_strategy`
+        """
+        return None
+
+    def do_signal(self, record: profits.ProfitRecord, days: int, nav: models.FundNav):
+        """预计算的触发日上的操作，触发条件已判断过"""
+        raise NotImplementedError
+
+    @classmethod
+    def supports_precompute(cls) -> bool:
+        return cls.precompute is not ProfitStrategy.precompute
+
 
 class RegularInvest:
     """定投"""
@@ -27,61 +62,154 @@ class RegularInvest:
                  interval: str,
                  delta_amount: float,
                  decrease: str = None,
-                 strategies: typing.List[ProfitStrategy] = None
+                 strategies: typing.List[ProfitStrategy] = None,
+                 numeric: str = 'decimal',
+                 profiler: profiling.Profiler = None,
                  ):
         """
         :param init_amount: 初始建仓金额
-        :param interval: 定投间隔
+        :param interval: 定投间隔，同 `parse_interval`
         :param delta_amount: 定投金额
         :param decrease: 定投金额递减配置，<rate_grid>:<decrease_amount>
+        :param numeric: 收益记录的数值后端，decimal 或 fixed，两者结果一致
+        :param profiler: 统计各策略、定投和结算的耗时及触发次数，默认不统计
         """
         self.logger = logging.getLogger(self.__class__.__name__)
 
         self.init_amount = init_amount
         self.interval = parse_interval(interval)
+        self.schedule = schedules.compile_interval(self.interval)
         self.delta_amount = delta_amount
         self.decrease = parse_decrease(decrease)
         self.strategies = strategies or []
+        self.numeric = decimals.get_numeric(numeric)
+        self.profiler = profiler
 
-    def backtest(self, navs: typing.List[models.FundNav]) -> profits.ProfitRecord:
-        """历史回测"""
-        record = profits.ProfitRecord()
-        for i, nav in enumerate(navs):
-            if i == 0:
+    def backtest(self, navs: typing.Iterable[models.FundNav],
+                 sink: typing.Callable[[profits.PositionSnap], None] = None,
+                 keep_history: bool = True,
+                 nav_signals: signals.NavSignals = None) -> profits.ProfitRecord:
+        """
+        历史回测，净值按日期升序逐个处理，可以是流式读取的迭代器
+
+        :param sink: 每日结算后的持仓快照交给 sink 处理，如 `profits.PositionCsvSink`
+        :param keep_history: 收益记录是否保留持仓历史和买卖流水，配合 sink 可使内存占用与天数无关
+        :param nav_signals: navs 的预计算输入，同 `resume`；navs 为列表或 NavSeries 且有策略支持预计算时自动创建
+        """
+        record = profits.ProfitRecord(self.numeric, keep_history=keep_history)
+        if nav_signals is None and isinstance(navs, (list, tuple, models.NavSeries)) \
+                and any(s.supports_precompute() for s in self.strategies):
+            nav_signals = signals.NavSignals.from_navs(navs)
+        return self.resume(record, navs, sink=sink, nav_signals=nav_signals)
+
+    def resume(self, record: profits.ProfitRecord, navs: typing.Iterable[models.FundNav],
+               sink: typing.Callable[[profits.PositionSnap], None] = None,
+               nav_signals: signals.NavSignals = None) -> profits.ProfitRecord:
+        """
+        在已有收益记录上继续回测，不晚于最近结算日期的净值跳过；
+        记录和策略状态从检查点恢复时，结果与一次性回测全部净值一致
+
+        :param nav_signals: 从首个净值起的整个序列，含已结算的部分；支持预计算的策略只在触发日调用，结果不变
+        """
+        for s in self.strategies:
+            s.prepare(record)
+        if record.settled_days == 0:
+            self.schedule.reset()
+        masks = self.precompute(nav_signals) if nav_signals is not None else None
+        do_strategies, do_regular, settle = self.do_strategies, self.do_regular, record.settle
+        if masks is not None:
+            do_strategies = self._dispatch(masks)
+        if self.profiler is not None:
+            do_strategies, do_regular, settle = self.profiler.instrument(self, record, masks)
+        # 全部策略都已预计算时，只在任一策略触发的日期调用
+        triggered = None
+        if masks is not None and all(m is not None for m in masks):
+            triggered = np.logical_or.reduce([np.asarray(m, dtype=bool) for m in masks]).tolist()
+        advance = self.schedule.advance
+        last_date = record.last_position.date if record.last_position is not None else None
+        for nav in navs:
+            if last_date is not None and nav.date <= last_date:
+                continue
+            days = record.settled_days
+            # 日程须逐日推进，首日也不例外
+            due = advance(days, nav)
+            if days == 0:
                 # 初始建仓
                 record.buy(nav.date, nav.value, self.init_amount)
             else:
-                self.do_strategies(record, i, nav)
-                self.do_regular(record, i, nav)
-            record.settle(nav.date, nav.value)
+                if triggered is None or triggered[days]:
+                    do_strategies(record, days, nav)
+                if due:
+                    do_regular(record, days, nav)
+            position = settle(nav.date, nav.value)
+            if sink is not None:
+                sink(position)
         return record
 
+    def params(self) -> dict:
+        """定投及策略参数，不含数值后端"""
+        return dict(init_amount=self.init_amount,
+                    interval=list(self.interval),
+                    delta_amount=self.delta_amount,
+                    decrease=list(self.decrease) if self.decrease else None,
+                    strategies=[dict(name=s.__class__.__name__, params=s.params()) for s in self.strategies],
+                    )
+
     def do_regular(self, record: profits.ProfitRecord, days: int, nav: models.FundNav):
-        """定投操作"""
+        """定投操作，只在日程的定投日调用"""
         amount = self.delta_amount
         if self.decrease and record.position_profit_rate > 0:
             k = int(np.floor(float(record.position_profit_rate) / self.decrease[0]))
             amount -= self.decrease[1] * k
         if amount <= 0:
             return
-        if self.interval[0] == 'day' and days % self.interval[1] == 0:
-            record.buy(nav.date, nav.value, amount)
-        elif self.interval[0] == 'week' and nav.weekday == self.interval[1]:
-            record.buy(nav.date, nav.value, amount)
+        record.buy(nav.date, nav.value, amount)
 
     def do_strategies(self, record: profits.ProfitRecord, days: int, nav: models.FundNav):
         """策略操作"""
         for s in self.strategies:
             s.do_strategy(record, days, nav)
 
+    def precompute(self, nav_signals: signals.NavSignals) -> typing.Optional[typing.List[typing.Optional[list]]]:
+        """各策略的触发日掩码，转为 list 便于逐日读取；不支持预计算的为 None，全都不支持时返回 None"""
+        masks = [s.precompute(nav_signals) for s in self.strategies]
+        if all(m is None for m in masks):
+            return None
+        for s, m in zip(self.strategies, masks):
+            assert m is None or len(m) == len(nav_signals), f'{s.__class__.__name__}: mask size mismatch'
+        return [m.tolist() if m is not None else None for m in masks]
+
+    def _dispatch(self, masks: typing.List[typing.Optional[list]]) -> typing.Callable:
+        """按掩码调度的 do_strategies，策略顺序不变"""
+        plan = list(zip(self.strategies, masks))
+
+        def do_strategies(record: profits.ProfitRecord, days: int, nav: models.FundNav):
+            for s, mask in plan:
+                if mask is None:
+                    s.do_strategy(record, days, nav)
+                elif mask[days]:
+                    s.do_signal(record, days, nav)
+
+        return do_strategies
+
 
 def parse_interval(interval: str):
+    """
+    d<k>: 每 k 个交易日；w<1~5>: 每周几；m<1~31>: 每月几号，非交易日顺延；
+    t<n>: 每月第 n 个交易日，净值从月中开始（首日之前当月还有周一至周五）时跳过首月
+    """
     m = re.match('^d(\d+)$', interval)
     if m:
         return 'day', int(m.group(1))
     m = re.match('^w([1-5])$', interval)
     if m:
         return 'week', int(m.group(1))
+    m = re.match('^m([1-9]|[12]\d|3[01])$', interval)
+    if m:
+        return 'month', int(m.group(1))
+    m = re.match('^t([1-9]\d*)$', interval)
+    if m:
+        return 'trade', int(m.group(1))
     raise ValueError(interval)
 
 
@@ -0,0 +1,146 @@
+# coding: utf8
+import hashlib
+import json
+import logging
+import os
+import threading
+import typing
+import zipfile
+
+from fundstrategy.core import checkpoints
+from fundstrategy.core import profits
+from fundstrategy.core import regular
+
+# 缓存内容格式版本，回测逻辑或结果格式不兼容地修改时递增，使旧结果失效
+VERSION = 1
+
+
+def result_key(code: str, start: typing.Optional[str], end: typing.Optional[str],
+               nav_version: str, invest: regular.RegularInvest) -> str:
+    """
+    回测结果的内容地址：净值数据版本 + 解析后的定投参数和策略参数的哈希。
+    参数按解析结果归一化，如 `AddByValueDrawback:20` 与显式写出默认值的配置相同；数值后端不影响结果，不参与
+    """
+    content = dict(version=VERSION, code=code, start=start or None, end=end or None,
+                   nav_version=nav_version, params=invest.params())
+    data = json.dumps(content, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(data.encode('utf8')).hexdigest()
+
+
+class CachedResult:
+    def __init__(self, key: str, summary: dict, record: typing.Optional[profits.ProfitRecord]):
+        """
+        :param summary: 结果摘要，可 json 序列化
+        :param record: 完整的收益记录，只缓存摘要时为空
+        """
+        self.key = key
+        self.summary = summary
+        self.record = record
+
+    def __repr__(self):
+        return f'<{self.__class__.__name__}: {self.key[:12]}, record={self.record is not None}>'
+
+
+class CacheStats:
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+
+    def __repr__(self):
+        return f'<{self.__class__.__name__}: {self.as_dict()}>'
+
+    def as_dict(self) -> dict:
+        return dict(self.__dict__)
+
+
+class ResultCache:
+    """
+    按内容地址缓存回测结果，每个结果一个 <key>.result 文件，格式同检查点；
+    净值写入或更新后数据版本变化，旧结果不再命中并最终被淘汰。总大小超过 max_bytes 时按最近使用时间淘汰
+    """
+
+    def __init__(self, root: str, max_bytes: int = 256 * 1024 * 1024):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.stats = CacheStats()
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self._lock = threading.Lock()
+        # 缓存文件总大小，首次写入时统计
+        self._total_bytes: typing.Optional[int] = None
+        os.makedirs(root, exist_ok=True)
+
+    def __repr__(self):
+        return f'<{self.__class__.__name__}: {self.root}, {self.stats}>'
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, f'{key}.result')
+
+    def get(self, key: str) -> typing.Optional[CachedResult]:
+        path = self._path(key)
+        try:
+            meta, arrays = checkpoints.read_state(path)
+        except (FileNotFoundError, ValueError, KeyError, zipfile.BadZipFile) as e:
+            if not isinstance(e, FileNotFoundError):
+                self.logger.warning(f'{path}: broken cache, {e!r}')
+            self.stats.misses += 1
+            return None
+        if meta.get('key') != key:
+            self.stats.misses += 1
+            return None
+        # 记录最近使用时间，用于淘汰
+        os.utime(path)
+        self.stats.hits += 1
+        record = None
+        if meta['record'] is not None:
+            record = profits.ProfitRecord.from_state(meta['record'], arrays)
+        return CachedResult(key, meta['summary'], record)
+
+    def put(self, key: str, summary: dict, record: profits.ProfitRecord = None):
+        """
+        :param record: 同时缓存完整的收益记录，含持仓历史和买卖流水
+        """
+        record_state, arrays = record.get_state() if record is not None else (None, {})
+        meta = dict(key=key, summary=summary, record=record_state)
+        path = self._path(key)
+        with self._lock:
+            old_size = os.path.getsize(path) if os.path.exists(path) else 0
+        size = checkpoints.write_state(path, meta, arrays)
+        with self._lock:
+            self.stats.stores += 1
+            if self._total_bytes is not None:
+                self._total_bytes += size - old_size
+        if self._total_bytes is None or self._total_bytes > self.max_bytes:
+            self.evict()
+
+    def evict(self):
+        """按最近使用时间淘汰，直到总大小不超过上限"""
+        with self._lock:
+            files = []
+            for name in os.listdir(self.root):
+                if not name.endswith('.result'):
+                    continue
+                try:
+                    st = os.stat(os.path.join(self.root, name))
+                except FileNotFoundError:
+                    continue
+                files.append((st.st_mtime, st.st_size, name))
+            total = sum(i[1] for i in files)
+            for _, size, name in sorted(files):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(os.path.join(self.root, name))
+                except FileNotFoundError:
+                    pass
+                total -= size
+                self.stats.evictions += 1
+            self._total_bytes = total
+
+    def clear(self):
+        with self._lock:
+            for name in os.listdir(self.root):
+                if name.endswith('.result'):
+                    os.remove(os.path.join(self.root, name))
+            self._total_bytes = 0
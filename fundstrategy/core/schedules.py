@@ -0,0 +1,195 @@
+# coding: utf8
+import datetime
+import typing
+
+import numpy as np
+
+from fundstrategy.core import models
+
+
+class Schedule:
+    """
+    定投日程：`mask` 一次算出整个净值序列的定投日，`advance` 逐日判断，两者结果一致；
+    逐日判断须对每个净值（含首日）按日期顺序调用一次
+    """
+
+    def mask(self, dates: np.ndarray) -> np.ndarray:
+        """
+        :param dates: datetime64[D] 日期，升序
+        :return: 每个净值是否为定投日
+        """
+        raise NotImplementedError
+
+    def advance(self, days: int, nav: models.FundNav) -> bool:
+        """
+        :param days: nav 在序列中的序号，从 0 开始
+        """
+        raise NotImplementedError
+
+    def reset(self):
+        """从序列开头重新判断"""
+        pass
+
+    def get_state(self) -> typing.Optional[dict]:
+        """逐日判断的状态，须可 json 序列化，用于检查点"""
+        return None
+
+    def set_state(self, state: typing.Optional[dict]):
+        pass
+
+
+class EveryDays(Schedule):
+    """每 k 个交易日，从序列首日起算"""
+
+    def __init__(self, k: int):
+        assert k >= 1
+        self.k = k
+
+    def mask(self, dates: np.ndarray) -> np.ndarray:
+        return np.arange(len(dates)) % self.k == 0
+
+    def advance(self, days: int, nav: models.FundNav) -> bool:
+        return days % self.k == 0
+
+
+class Weekly(Schedule):
+    """每周的周几，1 为周一"""
+
+    def __init__(self, weekday: int):
+        assert 1 <= weekday <= 7
+        self.weekday = weekday
+
+    def mask(self, dates: np.ndarray) -> np.ndarray:
+        return weekdays(dates) == self.weekday
+
+    def advance(self, days: int, nav: models.FundNav) -> bool:
+        return nav.weekday == self.weekday
+
+
+class _MonthlySchedule(Schedule):
+    """按月的日程，逐日判断需要前一个净值的日期"""
+
+    def __init__(self):
+        # 前一个净值的年、月、日
+        self._prev: typing.Optional[typing.Tuple[int, int, int]] = None
+
+    def reset(self):
+        self._prev = None
+
+    def get_state(self) -> typing.Optional[dict]:
+        return dict(prev=list(self._prev) if self._prev is not None else None)
+
+    def set_state(self, state: typing.Optional[dict]):
+        self.reset()
+        if state is not None and state['prev'] is not None:
+            self._prev = tuple(state['prev'])
+
+
+class Monthly(_MonthlySchedule):
+    """每月 day 日，非交易日顺延到当月下一个交易日，当月之后没有交易日时跳过"""
+
+    def __init__(self, day: int):
+        assert 1 <= day <= 31
+        super().__init__()
+        self.day = day
+
+    def mask(self, dates: np.ndarray) -> np.ndarray:
+        months, dom = _month_days(dates)
+        prev_dom = np.empty_like(dom)
+        prev_dom[:1], prev_dom[1:] = 0, dom[:-1]
+        new_month = _new_month(months)
+        return (dom >= self.day) & (new_month | (prev_dom < self.day))
+
+    def advance(self, days: int, nav: models.FundNav) -> bool:
+        d = datetime.date.fromordinal(nav.ordinal)
+        prev, self._prev = self._prev, (d.year, d.month, d.day)
+        if d.day < self.day:
+            return False
+        return prev is None or prev[:2] != (d.year, d.month) or prev[2] < self.day
+
+
+class NthTradingDay(_MonthlySchedule):
+    """
+    每月第 n 个交易日，当月交易日不足 n 个时跳过；
+    序列从月中开始（首日之前当月还有周一至周五）时跳过首月，无法得知序列之前的交易日数
+    """
+
+    def __init__(self, n: int):
+        assert n >= 1
+        super().__init__()
+        self.n = n
+        # 当月已有的交易日数
+        self._count = 0
+
+    def mask(self, dates: np.ndarray) -> np.ndarray:
+        months, _ = _month_days(dates)
+        new_month = _new_month(months)
+        starts = np.flatnonzero(new_month)
+        positions = np.arange(len(dates)) - starts[np.cumsum(new_month) - 1] + 1
+        if len(dates) and _partial_month(dates[0]):
+            positions[:starts[1] if len(starts) > 1 else len(dates)] = 0
+        return positions == self.n
+
+    def advance(self, days: int, nav: models.FundNav) -> bool:
+        d = datetime.date.fromordinal(nav.ordinal)
+        prev, self._prev = self._prev, (d.year, d.month, d.day)
+        if prev is None:
+            # 首月不完整时计数直接越过 n
+            self._count = self.n if _partial_month(np.datetime64(d, 'D')) else 0
+        elif prev[:2] != (d.year, d.month):
+            self._count = 0
+        self._count += 1
+        return self._count == self.n
+
+    def reset(self):
+        super().reset()
+        self._count = 0
+
+    def get_state(self) -> typing.Optional[dict]:
+        return dict(super().get_state(), count=self._count)
+
+    def set_state(self, state: typing.Optional[dict]):
+        super().set_state(state)
+        if state is not None:
+            self._count = state['count']
+
+
+def compile_interval(interval: typing.Tuple[str, int]) -> Schedule:
+    """
+    :param interval: `regular.parse_interval` 的结果
+    """
+    kind, k = interval
+    if kind == 'day':
+        return EveryDays(k)
+    if kind == 'week':
+        return Weekly(k)
+    if kind == 'month':
+        return Monthly(k)
+    if kind == 'trade':
+        return NthTradingDay(k)
+    raise ValueError(interval)
+
+
+def weekdays(dates: np.ndarray) -> np.ndarray:
+    """周几，1~7；1970-01-01 为周四"""
+    return (dates.astype('datetime64[D]').astype(np.int64) + 3) % 7 + 1
+
+
+def _month_days(dates: np.ndarray) -> typing.Tuple[np.ndarray, np.ndarray]:
+    """(所在月份, 当月几号)"""
+    days = dates.astype('datetime64[D]')
+    months = days.astype('datetime64[M]')
+    return months, (days - months.astype('datetime64[D]')).astype(np.int64) + 1
+
+
+def _partial_month(date: np.datetime64) -> bool:
+    """当月在 date 之前还有周一至周五，不考虑节假日"""
+    date = np.datetime64(date, 'D')
+    return bool(np.busday_count(date.astype('datetime64[M]').astype('datetime64[D]'), date) > 0)
+
+
+def _new_month(months: np.ndarray) -> np.ndarray:
+    """是否为序列中当月的首个日期"""
+    new_month = np.ones(len(months), dtype=bool)
+    new_month[1:] = months[1:] != months[:-1]
+    return new_month
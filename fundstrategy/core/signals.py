@@ -0,0 +1,137 @@
+# coding: utf8
+import fractions
+import math
+import typing
+
+import numpy as np
+
+from fundstrategy.core import decimals
+from fundstrategy.core import indicators
+from fundstrategy.core import models
+
+
+class NavSignals:
+    """
+    策略向量化预计算的输入：整个净值序列的数组及按窗口缓存的中间结果，
+    同一净值序列上的多个策略、多组阈值（如参数扫描）共享同一次滚动计算。
+    下标 i 对应回测的第 i 个净值，即 `ProfitStrategy.do_strategy` 的 days
+    """
+
+    def __init__(self, values: np.ndarray, increases: np.ndarray):
+        """
+        :param values: 净值
+        :param increases: 日增长率的百分点，缺失为 nan
+        """
+        assert len(values) == len(increases)
+        self.values = np.asarray(values, dtype=np.float64)
+        self.increases = np.asarray(increases, dtype=np.float64)
+        self._cache: typing.Dict[typing.Tuple, np.ndarray] = {}
+
+    def __repr__(self):
+        return f'<{self.__class__.__name__}: {len(self)} navs, {len(self._cache)} cached>'
+
+    def __len__(self):
+        return len(self.values)
+
+    @staticmethod
+    def from_navs(navs: typing.Sequence[models.FundNav]) -> 'NavSignals':
+        if isinstance(navs, models.NavSeries):
+            return NavSignals(navs.values, navs.increases)
+        return NavSignals(np.array([i.value for i in navs], dtype=np.float64),
+                          np.array([i.increase for i in navs], dtype=np.float64))
+
+    @staticmethod
+    def from_arrays(arrays) -> 'NavSignals':
+        """
+        :param arrays: `vectorized.NavArrays`
+        """
+        return NavSignals(arrays.values, arrays.increases)
+
+    def _cached(self, key: typing.Tuple, compute: typing.Callable[[], np.ndarray]) -> np.ndarray:
+        value = self._cache.get(key)
+        if value is None:
+            value = self._cache[key] = compute()
+            value.flags.writeable = False
+        return value
+
+    @property
+    def scaled_values(self) -> np.ndarray:
+        """净值的定点整数，同 `decimals.value` 取整"""
+        return self._cached(('values',), self._scale_values)
+
+    @property
+    def rates(self) -> np.ndarray:
+        """日增长率，同 `FundNav.rate`"""
+        return self._cached(('rates',), lambda: self.increases / 100)
+
+    def prev_max(self, days: int) -> np.ndarray:
+        """
+        前 days 个净值（不含当日）的最大值，定点整数，同结算后 `indicators.RollingMax` 的值；首日为 0
+        """
+        days = int(days)
+        return self._cached(('prev_max', days), lambda: _shift(_rolling_max(self.scaled_values, days)))
+
+    def drawback_rates(self, days: int) -> np.ndarray:
+        """当日净值相对前 days 个净值最大值的变动比例，定点整数，同 `ProfitRecord.value_drawback_rate`"""
+        days = int(days)
+        return self._cached(('drawback', days), lambda: self._drawback_rates(days))
+
+    def rate_mask(self, threshold: float) -> np.ndarray:
+        """日增长率不高于 threshold 的日期，增长率缺失的不触发"""
+        return self.rates <= threshold
+
+    def drawback_mask(self, days: int, threshold: float) -> np.ndarray:
+        """回撤比例不高于 threshold 的日期"""
+        return self.drawback_rates(days) <= _scaled_floor(threshold, decimals.RATE_SCALE)
+
+    def _scale_values(self) -> np.ndarray:
+        scaled = self.values * decimals.VALUE_SCALE
+        out = np.rint(scaled).astype(np.int64)
+        # 接近五入边界的逐个按 Decimal 路径取整
+        for i in np.flatnonzero(np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6):
+            out[i] = decimals.to_scaled(decimals.value(self.values[i]), decimals.VALUE_SCALE)
+        return out
+
+    def _drawback_rates(self, days: int) -> np.ndarray:
+        max_values, values = self.prev_max(days), self.scaled_values
+        nonzero = max_values != 0
+        # 定点整数相除，商为精确值的最近 float
+        rates = np.where(nonzero, (max_values - values) / np.where(nonzero, max_values, 1), 0.0)
+        scaled = rates * decimals.RATE_SCALE
+        out = np.rint(scaled).astype(np.int64)
+        for i in np.flatnonzero(nonzero & (np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6)):
+            rate = indicators.drawback_rate(decimals.from_scaled(max_values[i], decimals.VALUE_SCALE),
+                                            decimals.from_scaled(values[i], decimals.VALUE_SCALE))
+            out[i] = decimals.to_scaled(rate, decimals.RATE_SCALE)
+        return out
+
+
+def _rolling_max(values: np.ndarray, days: int) -> np.ndarray:
+    """values[i-days+1..i] 的最大值，van Herk/Gil-Werman 分块前缀、后缀最大值，与窗口大小无关；days 为 0 时不限天数"""
+    assert days >= 0
+    if days == 0:
+        return np.maximum.accumulate(values) if len(values) else values.copy()
+    n = len(values)
+    if n == 0 or days == 1:
+        return values.copy()
+    padded = np.concatenate([values, np.full(-n % days, values.min(), dtype=values.dtype)])
+    blocks = padded.reshape(-1, days)
+    prefix = np.maximum.accumulate(blocks, axis=1).ravel()
+    suffix = np.maximum.accumulate(blocks[:, ::-1], axis=1)[:, ::-1].ravel()
+    # 窗口未满的开头即累计最大值
+    out = np.maximum.accumulate(values)
+    ends = np.arange(days - 1, n)
+    out[days - 1:] = np.maximum(suffix[ends - days + 1], prefix[ends])
+    return out
+
+
+def _shift(values: np.ndarray) -> np.ndarray:
+    """后移一位，首位补 0"""
+    out = np.zeros_like(values)
+    out[1:] = values[:-1]
+    return out
+
+
+def _scaled_floor(threshold: float, scale: int) -> int:
+    """满足 k / scale <= threshold 的最大整数 k，按 threshold 的精确值，同 Decimal 与 float 的比较"""
+    return math.floor(fractions.Fraction(threshold) * scale)
@@ -1,5 +1,7 @@
 # coding: utf8
+import contextlib
 import logging
+import random
 import re
 import threading
 import time
@@ -8,13 +10,24 @@ import typing
 import pymysql
 from pymysql import cursors
 
+from fundstrategy.core import dialects
+from fundstrategy.core import histograms
+from fundstrategy.core import logs
+from fundstrategy.core import sqlite_handler
+
 
 class ConnectionFactory:
+    dialect = dialects.MysqlDialect()
+
     @staticmethod
     def parse_url(url: str):
+        m = re.match('^sqlite:///(.+)$', url)
+        if m is not None:
+            return sqlite_handler.SqliteConnectionFactory(m.group(1))
         m = re.match('^mysql://(.+):(.+)@(.+)/(.+)$', url)
         if m is None:
-            raise ValueError(f"illegal sql url: {url}, format: mysql://<user>:<password>@<host>/db")
+            raise ValueError(f"illegal sql url: {url}, format: mysql://<user>:<password>@<host>/db"
+                             f" or sqlite:///<path>")
         user, password, host, db = m.group(1), m.group(2), m.group(3), m.group(4)
         return ConnectionFactory(host=host, user=user, password=password, database=db)
 
@@ -48,49 +61,396 @@ class ConnectionFactory:
         # return pymysql.connect(**self.options)
 
 
-class Transaction:
+class PoolStats:
+    """连接池统计"""
+
+    def __init__(self):
+        # 借出次数
+        self.checkouts = 0
+        # 借出时需要等待的次数
+        self.waits = 0
+        # 新建连接数
+        self.creates = 0
+        # 健康检查失败、空闲超时、超过最大存活时间而关闭的连接数
+        self.unhealthy = 0
+        self.idle_evictions = 0
+        self.expired = 0
+
+    def __repr__(self):
+        return f'<{self.__class__.__name__}: {self.as_dict()}>'
+
+    def as_dict(self) -> dict:
+        return dict(self.__dict__)
+
+
+class _PooledConnection:
     def __init__(self, conn: pymysql.Connection):
         self.conn = conn
+        self.created_at = time.monotonic()
+        self.released_at = self.created_at
+
+
+class ConnectionPool:
+    """有界、线程安全的连接池"""
+
+    def __init__(self, factory: ConnectionFactory,
+                 max_size: int = 8,
+                 max_idle_time: float = 300,
+                 max_lifetime: float = 3600,
+                 health_check_interval: float = 30,
+                 timeout: float = None):
+        """
+        :param max_size: 最大连接数（含借出和空闲）
+        :param max_idle_time: 空闲超过该秒数的连接被关闭
+        :param max_lifetime: 创建超过该秒数的连接在归还或借出时关闭
+        :param health_check_interval: 空闲超过该秒数的连接借出前先 ping 检查
+        :param timeout: 连接池满时等待的秒数，None 为一直等待
+        """
+        assert max_size >= 1
+        self.factory = factory
+        self.max_size = max_size
+        self.max_idle_time = max_idle_time
+        self.max_lifetime = max_lifetime
+        self.health_check_interval = health_check_interval
+        self.timeout = timeout
+        self.stats = PoolStats()
+        self.logger = logging.getLogger(self.__class__.__name__)
+
+        self._cond = threading.Condition()
+        self._idle: typing.List[_PooledConnection] = []
+        self._in_use: typing.Dict[int, _PooledConnection] = {}
+        self._closed = False
+
+    def __repr__(self):
+        return f'<{self.__class__.__name__}: url={self.factory.url()}, size={self.size}/{self.max_size}>'
+
+    @property
+    def size(self) -> int:
+        return len(self._idle) + len(self._in_use)
+
+    def acquire(self) -> pymysql.Connection:
+        """借出连接"""
+        deadline = None if self.timeout is None else time.monotonic() + self.timeout
+        with self._cond:
+            self.stats.checkouts += 1
+        waited = False
+        while True:
+            with self._cond:
+                while True:
+                    self._evict_idle()
+                    pooled = self._pop_idle()
+                    if pooled is not None or self.size < self.max_size:
+                        break
+                    if not waited:
+                        self.stats.waits += 1
+                        waited = True
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        raise TimeoutError(f'{self}: no connection available in {self.timeout}s')
+                    self._cond.wait(remaining)
+                if pooled is not None:
+                    self._in_use[id(pooled.conn)] = pooled
+                    if not self._needs_ping(pooled):
+                        return pooled.conn
+                else:
+                    # 先占位，建连接时不持有锁
+                    placeholder = _PooledConnection(None)
+                    self._in_use[id(placeholder)] = placeholder
+            if pooled is None:
+                return self._create(placeholder)
+            # 已借出，ping 时不持有锁，失败则关闭后重新借
+            if self._ping(pooled):
+                return pooled.conn
+            with self._cond:
+                del self._in_use[id(pooled.conn)]
+                self._cond.notify()
+            self._close(pooled)
+
+    def _create(self, placeholder: _PooledConnection) -> pymysql.Connection:
+        try:
+            conn = self.factory.do_connect()
+        except BaseException:
+            with self._cond:
+                del self._in_use[id(placeholder)]
+                self._cond.notify()
+            raise
+        with self._cond:
+            del self._in_use[id(placeholder)]
+            self.stats.creates += 1
+            self._in_use[id(conn)] = _PooledConnection(conn)
+        return conn
+
+    def release(self, conn: pymysql.Connection):
+        """归还连接，已断开或超过最大存活时间的直接关闭"""
+        with self._cond:
+            pooled = self._in_use.pop(id(conn), None)
+            if pooled is None:
+                conn.close()
+                return
+            if not conn.open:
+                self.stats.unhealthy += 1
+            elif self._closed:
+                self._close(pooled)
+            elif time.monotonic() - pooled.created_at > self.max_lifetime:
+                self.stats.expired += 1
+                self._close(pooled)
+            else:
+                pooled.released_at = time.monotonic()
+                self._idle.append(pooled)
+            self._cond.notify()
+
+    @contextlib.contextmanager
+    def connection(self) -> typing.Iterator[pymysql.Connection]:
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def close(self):
+        """关闭所有空闲连接，借出中的连接在归还时关闭"""
+        with self._cond:
+            for pooled in self._idle:
+                self._close(pooled)
+            self._idle = []
+            self._closed = True
+
+    def _pop_idle(self) -> typing.Optional[_PooledConnection]:
+        """取出最近归还的可用空闲连接，已断开或超过最大存活时间的关闭；须持有锁"""
+        while self._idle:
+            pooled = self._idle.pop()
+            if time.monotonic() - pooled.created_at > self.max_lifetime:
+                self.stats.expired += 1
+            elif not pooled.conn.open:
+                self.stats.unhealthy += 1
+            else:
+                return pooled
+            self._close(pooled)
+        return None
+
+    def _needs_ping(self, pooled: _PooledConnection) -> bool:
+        return time.monotonic() - pooled.released_at > self.health_check_interval
+
+    def _ping(self, pooled: _PooledConnection) -> bool:
+        """网络往返，不持有锁调用"""
+        try:
+            pooled.conn.ping(reconnect=False)
+        except Exception as e:
+            self.logger.warning(f'{self}: drop unhealthy connection, {e!r}')
+            with self._cond:
+                self.stats.unhealthy += 1
+            return False
+        return True
+
+    def _evict_idle(self):
+        now = time.monotonic()
+        keep = []
+        for pooled in self._idle:
+            if now - pooled.released_at > self.max_idle_time:
+                self.stats.idle_evictions += 1
+                self._close(pooled)
+            else:
+                keep.append(pooled)
+        self._idle = keep
+
+    @staticmethod
+    def _close(pooled: _PooledConnection):
+        try:
+            pooled.conn.close()
+        except Exception:
+            pass
+
+
+class QueryStats:
+    """一个语句模板的执行统计"""
+
+    def __init__(self, template: str):
+        self.template = template
+        self.count = 0
+        self.errors = 0
+        self.total_ns = 0
+        # 增删改影响的行数、查询取回的行数
+        self.rows_affected = 0
+        self.rows_fetched = 0
+        self.latency = histograms.LatencyHistogram()
+
+    def __repr__(self):
+        return f'<{self.__class__.__name__}: count={self.count}, total={self.total_ns / 1e9:.3f}s,' \
+               f' template={self.template[:60]}>'
+
+    def as_dict(self) -> dict:
+        """耗时单位为毫秒"""
+        return dict(template=self.template,
+                    count=self.count,
+                    errors=self.errors,
+                    total_ms=self.total_ns / 1e6,
+                    p50_ms=self.latency.percentile(50) / 1e6,
+                    p99_ms=self.latency.percentile(99) / 1e6,
+                    max_ms=self.latency.max_ns / 1e6,
+                    rows_affected=self.rows_affected,
+                    rows_fetched=self.rows_fetched,
+                    )
+
+
+class QueryMetrics:
+    """
+    按语句模板汇总的执行统计，线程安全；
+    多行插入重复的 `(%s,...),(%s,...)` 折叠为一组，不同批次大小归为同一模板
+    """
+
+    # 模板数上限，超过后归入 OTHER，避免拼接参数的语句撑爆内存
+    MAX_TEMPLATES = 1000
+    OTHER = '<other>'
+
+    # 连续重复的括号组，允许一层嵌套，如 `(%s,weekday(%s)+1)`
+    _ROWS_PATTERN = re.compile(r'(\((?:[^()]|\([^()]*\))*\))(?:\s*,\s*\1)+')
+    _SPACE_PATTERN = re.compile(r'\s+')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats: typing.Dict[str, QueryStats] = {}
+        # 原始语句 -> 模板
+        self._templates: typing.Dict[str, str] = {}
+
+    def __repr__(self):
+        return f'<{self.__class__.__name__}: templates={len(self._stats)}>'
+
+    def template(self, query: str) -> str:
+        template = self._templates.get(query)
+        if template is None:
+            template = self._SPACE_PATTERN.sub(' ', self._ROWS_PATTERN.sub(r'\1, ...', query)).strip()
+            if len(self._templates) < self.MAX_TEMPLATES:
+                self._templates[query] = template
+        return template
+
+    def _get(self, query: str) -> QueryStats:
+        template = self.template(query)
+        stats = self._stats.get(template)
+        if stats is None:
+            if len(self._stats) >= self.MAX_TEMPLATES:
+                template = self.OTHER
+                stats = self._stats.get(template)
+            if stats is None:
+                stats = self._stats[template] = QueryStats(template)
+        return stats
+
+    def record(self, query: str, ns: int, rows_affected: int = 0, error: bool = False):
+        with self._lock:
+            stats = self._get(query)
+            stats.count += 1
+            stats.total_ns += ns
+            stats.rows_affected += rows_affected
+            stats.errors += error
+            stats.latency.add(ns)
+
+    def record_fetched(self, query: str, rows: int):
+        with self._lock:
+            self._get(query).rows_fetched += rows
+
+    def dump(self) -> typing.List[dict]:
+        """各模板的统计，按总耗时降序"""
+        with self._lock:
+            items = [s.as_dict() for s in self._stats.values()]
+        items.sort(key=lambda i: i['total_ms'], reverse=True)
+        return items
+
+    def reset(self):
+        with self._lock:
+            self._stats = {}
+
+    def log_summary(self, logger: logging.Logger, top: int = 10):
+        """按总耗时输出前 top 个模板"""
+        for item in self.dump()[:top]:
+            logger.info('sql: count=%d, errors=%d, total=%.1fms, p50=%.2fms, p99=%.2fms, affected=%d, fetched=%d'
+                        ', template=%.200s',
+                        item['count'], item['errors'], item['total_ms'], item['p50_ms'], item['p99_ms'],
+                        item['rows_affected'], item['rows_fetched'], item['template'])
+
+
+class Transaction:
+    def __init__(self, conn: pymysql.Connection,
+                 on_exit: typing.Callable[[pymysql.Connection], None] = None):
+        """
+        :param on_exit: 事务结束后处理连接，默认关闭
+        """
+        self.conn = conn
+        self.on_exit = on_exit
 
     def __enter__(self):
         self.conn.begin()
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb):
-        if exc_val is None:
-            self.conn.commit()
-        else:
-            self.conn.rollback()
-        self.conn.close()
+        try:
+            if exc_val is None:
+                self.conn.commit()
+            else:
+                self.conn.rollback()
+        finally:
+            if self.on_exit is None:
+                self.conn.close()
+            else:
+                self.on_exit(self.conn)
 
 
 class SqlHandler:
-    def __init__(self, factory: ConnectionFactory):
+    def __init__(self, factory: ConnectionFactory, pool: ConnectionPool = None,
+                 slow_query_seconds: float = 1.0,
+                 slow_sample_rate: float = 1.0,
+                 log_args_limit: int = 500):
+        """
+        :param slow_query_seconds: 超过该耗时的语句以 WARNING 记录，None 为不记录
+        :param slow_sample_rate: 慢语句的记录比例，统计不受影响
+        :param log_args_limit: 日志中参数的最大长度
+        """
         self.factory = factory
+        self.pool = pool or ConnectionPool(factory)
         self.logger = logging.getLogger(self.__class__.__name__)
         self.sql_logger = logging.getLogger('sql')
         self.conn_locals = threading.local()
+        self.metrics = QueryMetrics()
+        self.slow_query_seconds = slow_query_seconds
+        self.slow_sample_rate = slow_sample_rate
+        self.log_args_limit = log_args_limit
 
     def __repr__(self):
         return f"<{self.__class__.__name__}: url={self.factory.url()}>"
 
     @property
     def current_connection(self) -> typing.Optional[pymysql.Connection]:
-        if hasattr(self.conn_locals, 'conn') and self.conn_locals.conn.open:
-            return self.conn_locals.conn
+        conn = getattr(self.conn_locals, 'conn', None)
+        if conn is not None and conn.open:
+            return conn
         return None
 
     @current_connection.setter
     def current_connection(self, conn: pymysql.Connection):
         self.conn_locals.conn = conn
 
+    @property
+    def dialect(self) -> dialects.Dialect:
+        return self.factory.dialect
+
     def do_execute(self, cursor, query, args):
-        beg = time.time()
+        """执行语句并计入统计；逐条日志为 DEBUG，慢语句按比例抽样以 WARNING 记录，只在输出时格式化"""
+        beg = time.perf_counter_ns()
+        error = True
         try:
-            cursor.execute(query, args)
+            cursor.execute(self.dialect.translate(query), args)
+            error = False
         finally:
-            cost = time.time() - beg
-            self.sql_logger.info(f'{self.__class__.__name__}: cost={cost:.3f}s, query={query}, args={args}')
+            ns = time.perf_counter_ns() - beg
+            rows = 0
+            if not error and cursor.description is None and cursor.rowcount > 0:
+                rows = cursor.rowcount
+            self.metrics.record(query, ns, rows_affected=rows, error=error)
+            if self.slow_query_seconds is not None and ns >= self.slow_query_seconds * 1e9 \
+                    and (self.slow_sample_rate >= 1 or random.random() < self.slow_sample_rate):
+                self.sql_logger.warning('%s: slow query, cost=%.3fs, query=%s, args=%s', self.__class__.__name__,
+                                        ns / 1e9, query, logs.Truncated(args, self.log_args_limit))
+            elif self.sql_logger.isEnabledFor(logging.DEBUG):
+                self.sql_logger.debug('%s: cost=%.3fs, query=%s, args=%s', self.__class__.__name__,
+                                      ns / 1e9, query, logs.Truncated(args, self.log_args_limit))
 
     def do_insert(self, query, args, return_id=False):
         def do_execute():
@@ -104,7 +464,7 @@ class SqlHandler:
 
         conn = self.current_connection
         if conn is None:
-            with self.factory.do_connect() as conn:
+            with self.pool.connection() as conn:
                 return do_execute()
         else:
             return do_execute()
@@ -123,21 +483,51 @@ class SqlHandler:
                 self.do_execute(cursor, query, args)
                 if size is None:
                     # 单独获取一个
-                    return cursor.fetchone()
+                    row = cursor.fetchone()
+                    self.metrics.record_fetched(query, 0 if row is None else 1)
+                    return row
                 elif size == 0:
                     # 获取全部
-                    return cursor.fetchall()
+                    rows = cursor.fetchall()
                 else:
                     assert size >= 1
-                    return cursor.fetchmany(size)
+                    rows = cursor.fetchmany(size)
+                self.metrics.record_fetched(query, len(rows))
+                return rows
 
         conn = self.current_connection
         if conn is None:
-            with self.factory.do_connect() as conn:
+            with self.pool.connection() as conn:
                 return do_execute()
         else:
             return do_execute()
 
+    def iter_select(self, query, args=None, chunk_size: int = 1000) -> typing.Iterator[typing.List[dict]]:
+        """
+        流式查询：MySQL 用不缓存结果集的服务端游标，每次取 chunk_size 行，内存占用与结果总行数无关。
+        迭代结束或关闭前连接一直被占用，同一连接上不能执行其他语句
+
+        :return: 每次一批行
+        """
+        assert chunk_size >= 1
+
+        def do_execute():
+            with conn.cursor(cursor=cursors.SSDictCursor) as cursor:
+                self.do_execute(cursor, query, args)
+                while True:
+                    rows = cursor.fetchmany(chunk_size)
+                    if not rows:
+                        break
+                    self.metrics.record_fetched(query, len(rows))
+                    yield rows
+
+        conn = self.current_connection
+        if conn is None:
+            with self.pool.connection() as conn:
+                yield from do_execute()
+        else:
+            yield from do_execute()
+
     def do_update(self, query, args=None):
         def do_execute():
             with conn.cursor() as cursor:
@@ -145,7 +535,7 @@ class SqlHandler:
 
         conn = self.current_connection
         if conn is None:
-            with self.factory.do_connect() as conn:
+            with self.pool.connection() as conn:
                 return do_execute()
         else:
             return do_execute()
@@ -157,13 +547,22 @@ class SqlHandler:
 
         conn = self.current_connection
         if conn is None:
-            with self.factory.do_connect() as conn:
+            with self.pool.connection() as conn:
                 return do_execute()
         else:
             return do_execute()
 
     def transaction(self, conn: pymysql.Connection = None) -> Transaction:
+        """开启事务，未指定连接时从连接池借出，事务结束后归还"""
         if conn is None or not conn.open:
-            conn = self.factory.do_connect(autocommit=False)
+            conn = self.pool.acquire()
+            release = self.pool.release
+        else:
+            release = pymysql.Connection.close
         self.current_connection = conn
-        return Transaction(conn)
+
+        def on_exit(c: pymysql.Connection):
+            self.conn_locals.conn = None
+            release(c)
+
+        return Transaction(conn, on_exit=on_exit)
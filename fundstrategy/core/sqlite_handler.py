@@ -0,0 +1,154 @@
+# coding: utf8
+import datetime
+import math
+import sqlite3
+import typing
+
+from fundstrategy.core import dialects
+
+
+class SqliteCursor:
+    """sqlite3 游标适配，行返回 dict，支持 with 语句"""
+
+    def __init__(self, conn: 'SqliteConnection'):
+        self._conn = conn
+        self._cursor = conn.raw.cursor()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __iter__(self):
+        return iter(self.fetchone, None)
+
+    @property
+    def rowcount(self) -> int:
+        return self._cursor.rowcount
+
+    @property
+    def description(self):
+        """无结果集的语句为 None"""
+        return self._cursor.description
+
+    def execute(self, query, args=None):
+        self._cursor.execute(query, args or ())
+        self._conn.last_insert_id = self._cursor.lastrowid
+        return self._cursor.rowcount
+
+    def fetchone(self) -> typing.Optional[dict]:
+        return self._cursor.fetchone()
+
+    def fetchall(self) -> typing.List[dict]:
+        return self._cursor.fetchall()
+
+    def fetchmany(self, size: int) -> typing.List[dict]:
+        return self._cursor.fetchmany(size)
+
+    def close(self):
+        self._cursor.close()
+
+
+class SqliteConnection:
+    """sqlite3 连接适配，提供 SqlHandler/连接池用到的 pymysql 连接接口"""
+
+    def __init__(self, path: str):
+        # autocommit 模式，事务由 begin/commit 显式控制；连接池保证同一时刻只有一个线程使用
+        self.raw = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self.raw.row_factory = _dict_row
+        self.raw.create_function('weekday', 1, _weekday, deterministic=True)
+        self.raw.create_function('yearweek', 1, _yearweek, deterministic=True)
+        # 未编译数学函数的 sqlite 没有 floor
+        self.raw.create_function('floor', 1, _floor, deterministic=True)
+        self.last_insert_id = None
+        self._open = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    @property
+    def open(self) -> bool:
+        return self._open
+
+    def cursor(self, cursor=None) -> SqliteCursor:
+        # cursor 为 pymysql 的游标类型，sqlite 下统一返回 dict 行
+        return SqliteCursor(self)
+
+    def insert_id(self):
+        return self.last_insert_id
+
+    def begin(self):
+        self.raw.execute('begin')
+
+    def commit(self):
+        if self.raw.in_transaction:
+            self.raw.execute('commit')
+
+    def rollback(self):
+        if self.raw.in_transaction:
+            self.raw.execute('rollback')
+
+    def ping(self, reconnect=False):
+        self.raw.execute('select 1').fetchone()
+
+    def close(self):
+        if self._open:
+            self._open = False
+            self.raw.close()
+
+
+class SqliteConnectionFactory:
+    """sqlite:///path/to/file.db，:memory: 仅适用于单连接"""
+
+    dialect = dialects.SqliteDialect()
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def __repr__(self):
+        return f"<{self.__class__.__name__}: url={self.url()}>"
+
+    def url(self):
+        return f'sqlite:///{self.path}'
+
+    def do_connect(self, **override_options) -> SqliteConnection:
+        return SqliteConnection(self.path)
+
+
+def _dict_row(cursor: sqlite3.Cursor, row: tuple) -> dict:
+    return {col[0]: value for col, value in zip(cursor.description, row)}
+
+
+def _weekday(date: str) -> typing.Optional[int]:
+    """同 MySQL weekday()：周一为 0"""
+    if date is None:
+        return None
+    return datetime.date.fromisoformat(date[:10]).weekday()
+
+
+def _yearweek(date: str) -> typing.Optional[int]:
+    """同 MySQL yearweek(date) 即 mode 0：周日为一周开始，第一周为当年第一个周日所在周"""
+    if date is None:
+        return None
+    d = datetime.date.fromisoformat(date[:10])
+    year = d.year
+    first_sunday = _first_sunday(year)
+    if d < first_sunday:
+        year -= 1
+        first_sunday = _first_sunday(year)
+    return year * 100 + (d - first_sunday).days // 7 + 1
+
+
+def _floor(value) -> typing.Optional[int]:
+    if value is None:
+        return None
+    return math.floor(value)
+
+
+def _first_sunday(year: int) -> datetime.date:
+    jan1 = datetime.date(year, 1, 1)
+    return jan1 + datetime.timedelta(days=(6 - jan1.weekday()) % 7)
@@ -0,0 +1,228 @@
+# coding: utf8
+import itertools
+import logging
+import multiprocessing
+import time
+import typing
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from fundstrategy import strategies
+from fundstrategy.core import models
+from fundstrategy.core import profiling
+from fundstrategy.core import regular
+from fundstrategy.core import result_cache
+from fundstrategy.core import signals
+from fundstrategy.core import vectorized
+
+
+class SweepConfig:
+    """一组定投回测参数"""
+
+    def __init__(self, init_amount: float, interval: str, delta_amount: float,
+                 decrease: str = None, strategies: typing.Sequence[str] = ()):
+        """
+        :param strategies: 策略配置，同 `strategies.parse_strategy`
+        """
+        self.init_amount = init_amount
+        self.interval = interval
+        self.delta_amount = delta_amount
+        self.decrease = decrease
+        self.strategies = tuple(strategies)
+
+    def __repr__(self):
+        return f'<{self.__class__.__name__}: {self.describe()}>'
+
+    def describe(self):
+        return f'init={self.init_amount}, interval={self.interval}, delta={self.delta_amount}' \
+               f', decrease={self.decrease or "-"}, strategy={"+".join(self.strategies) or "-"}'
+
+    def create_invest(self, profiler: profiling.Profiler = None) -> regular.RegularInvest:
+        return regular.RegularInvest(init_amount=self.init_amount,
+                                     interval=self.interval,
+                                     delta_amount=self.delta_amount,
+                                     decrease=self.decrease,
+                                     strategies=[strategies.parse_strategy(s) for s in self.strategies],
+                                     profiler=profiler,
+                                     )
+
+
+def expand_grid(init_amounts: typing.Sequence[float],
+                intervals: typing.Sequence[str],
+                delta_amounts: typing.Sequence[float],
+                decreases: typing.Sequence[typing.Optional[str]],
+                strategy_groups: typing.Sequence[typing.Sequence[str]]) -> typing.List[SweepConfig]:
+    """参数网格的笛卡尔积"""
+    for i in intervals:
+        regular.parse_interval(i)
+    for d in decreases:
+        regular.parse_decrease(d)
+    return [SweepConfig(*args) for args in itertools.product(init_amounts, intervals, delta_amounts,
+                                                              decreases, strategy_groups)]
+
+
+def summarize(record) -> dict:
+    """回测结果摘要，支持 `profits.ProfitRecord` 和 `vectorized.ArrayRecord`"""
+    return dict(position_amount=float(record.position_amount),
+                position_cost=float(record.position_cost),
+                position_profit=float(record.position_profit),
+                position_profit_rate=float(record.position_profit_rate),
+                total_amount=float(record.total_amount),
+                total_cost=float(record.total_cost),
+                total_profit=float(record.total_profit),
+                total_profit_rate=float(record.total_profit_rate),
+                )
+
+
+class SharedNavArrays:
+    """放在共享内存里的净值数组，子进程按名字挂载，无需序列化"""
+
+    _FIELDS = [('dates', np.int64), ('values', np.float64), ('increases', np.float64)]
+
+    def __init__(self, size: int, blocks: typing.Dict[str, shared_memory.SharedMemory], owner: bool):
+        self.size = size
+        self.blocks = blocks
+        self.owner = owner
+
+    @staticmethod
+    def create(arrays: vectorized.NavArrays) -> 'SharedNavArrays':
+        size = len(arrays)
+        sources = dict(dates=arrays.dates.astype(np.int64), values=arrays.values, increases=arrays.increases)
+        blocks = {}
+        for name, dtype in SharedNavArrays._FIELDS:
+            nbytes = max(size * np.dtype(dtype).itemsize, 1)
+            blocks[name] = shared_memory.SharedMemory(create=True, size=nbytes)
+            np.ndarray(size, dtype=dtype, buffer=blocks[name].buf)[:] = sources[name]
+        return SharedNavArrays(size, blocks, owner=True)
+
+    @staticmethod
+    def attach(spec: typing.Tuple[int, typing.Dict[str, str]]) -> 'SharedNavArrays':
+        size, names = spec
+        blocks = {}
+        for name, _ in SharedNavArrays._FIELDS:
+            blocks[name] = shared_memory.SharedMemory(name=names[name])
+        return SharedNavArrays(size, blocks, owner=False)
+
+    @property
+    def spec(self) -> typing.Tuple[int, typing.Dict[str, str]]:
+        """传给子进程的挂载信息"""
+        return self.size, {name: block.name for name, block in self.blocks.items()}
+
+    def arrays(self) -> vectorized.NavArrays:
+        columns = {name: np.ndarray(self.size, dtype=dtype, buffer=self.blocks[name].buf)
+                   for name, dtype in self._FIELDS}
+        return vectorized.NavArrays(columns['dates'].view('datetime64[D]'),
+                                    columns['values'],
+                                    columns['increases'])
+
+    def close(self):
+        for block in self.blocks.values():
+            block.close()
+            if self.owner:
+                block.unlink()
+        self.blocks = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+# 子进程内挂载的净值数据
+_worker_navs: typing.Dict[str, typing.Any] = {}
+
+
+def _init_worker(spec, profile: bool):
+    shared = SharedNavArrays.attach(spec)
+    arrays = shared.arrays()
+    _worker_navs['shared'] = shared
+    _worker_navs['arrays'] = arrays
+    # FundNav 列表在首个带策略的参数时才创建，无策略的参数只用数组引擎
+    _worker_navs['navs'] = None
+    # 同一子进程内的各组参数共享滚动计算
+    _worker_navs['signals'] = signals.NavSignals.from_arrays(arrays)
+    _worker_navs['profile'] = profile
+
+
+def _run_config(config: SweepConfig) -> typing.Tuple[SweepConfig, dict, typing.Optional[profiling.Profiler]]:
+    profiler = profiling.Profiler() if _worker_navs['profile'] else None
+    if config.strategies and _worker_navs['navs'] is None:
+        _worker_navs['navs'] = _worker_navs['arrays'].to_navs()
+    summary = run_config(config, _worker_navs['arrays'], _worker_navs['navs'], profiler=profiler,
+                         nav_signals=_worker_navs['signals'])
+    return config, summary, profiler
+
+
+def run_config(config: SweepConfig, arrays: vectorized.NavArrays,
+               navs: typing.Sequence[models.FundNav] = None,
+               profiler: profiling.Profiler = None,
+               nav_signals: signals.NavSignals = None) -> dict:
+    """
+    回测单组参数，无策略时使用数组引擎
+
+    :param profiler: 统计回测耗时，数组引擎只统计整体耗时，记为 `vectorized` 阶段
+    :param nav_signals: 策略预计算的输入，多组参数传入同一个以复用滚动计算
+    """
+    invest = config.create_invest(profiler)
+    if invest.strategies:
+        record = invest.backtest(navs if navs is not None else arrays.to_navs(), nav_signals=nav_signals)
+    elif profiler is not None:
+        beg = time.perf_counter_ns()
+        record = vectorized.backtest(invest, arrays)
+        profiler.stage('vectorized').add(time.perf_counter_ns() - beg)
+        profiler.runs += 1
+    else:
+        record = vectorized.backtest(invest, arrays)
+    return summarize(record)
+
+
+def sweep(navs: typing.Sequence[models.FundNav],
+          configs: typing.Sequence[SweepConfig],
+          processes: int = None,
+          sort_key: str = 'total_profit_rate',
+          cache: result_cache.ResultCache = None,
+          nav_id: typing.Tuple[str, typing.Optional[str], typing.Optional[str], str] = None,
+          profiler: profiling.Profiler = None,
+          ) -> typing.List[typing.Tuple[SweepConfig, dict]]:
+    """
+    多进程并行回测参数网格，净值只加载一次并通过共享内存传给子进程
+
+    :param processes: 进程数，默认 cpu 核数
+    :param sort_key: 排序字段，降序
+    :param cache: 结果缓存，命中的参数不再回测，只缓存摘要
+    :param nav_id: 使用缓存时必填，(code, start, end, 净值数据版本)，同 `result_cache.result_key`
+    :param profiler: 合并各子进程的回测剖析统计，命中缓存的参数不统计
+    :return: [(config, summary)]
+    """
+    logger = logging.getLogger('sweep')
+    results = []
+    # 子进程返回的 config 是副本，按 describe 对应缓存键
+    keys = {}
+    pending = list(configs)
+    if cache is not None:
+        assert nav_id is not None, 'nav_id is required with cache'
+        pending = []
+        for config in configs:
+            key = result_cache.result_key(*nav_id, config.create_invest())
+            cached = cache.get(key)
+            if cached is None:
+                keys[config.describe()] = key
+                pending.append(config)
+            else:
+                results.append((config, cached.summary))
+        logger.info(f'cached: {len(results)}, pending: {len(pending)}')
+    if pending:
+        with SharedNavArrays.create(vectorized.NavArrays.from_navs(navs)) as shared:
+            with multiprocessing.Pool(processes, initializer=_init_worker,
+                                      initargs=(shared.spec, profiler is not None)) as pool:
+                for config, summary, config_profiler in pool.imap_unordered(_run_config, pending):
+                    results.append((config, summary))
+                    if profiler is not None:
+                        profiler.merge(config_profiler)
+                    if cache is not None:
+                        cache.put(keys[config.describe()], summary)
+                    logger.debug(f'{config.describe()}: {summary[sort_key]:.2%}')
+    results.sort(key=lambda x: x[1][sort_key], reverse=True)
+    return results
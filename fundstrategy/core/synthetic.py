@@ -0,0 +1,40 @@
+# coding: utf8
+import typing
+
+import numpy as np
+
+from fundstrategy.core import models
+from fundstrategy.core import vectorized
+
+
+def random_walk(days: int,
+                volatility: float = 0.015,
+                drift: float = 0.0002,
+                init_value: float = 1.0,
+                start: str = '2000-01-03',
+                seed: int = 0) -> vectorized.NavArrays:
+    """
+    确定性的合成净值序列：工作日上的几何随机游走，同一组参数总是生成相同的序列，用于基准测试和离线验证
+
+    :param days: 净值个数
+    :param volatility: 日收益率标准差
+    :param drift: 日收益率均值
+    :param init_value: 首日净值
+    :param start: 首个日期，非工作日时顺延
+    :param seed: 随机种子
+    """
+    assert days >= 1 and volatility >= 0
+    rng = np.random.Generator(np.random.PCG64(seed))
+    returns = rng.normal(drift, volatility, days)
+    returns[0] = 0
+    # 净值保留 4 位小数，且不低于 0.0001
+    values = np.maximum(np.round(init_value * np.cumprod(1 + returns), 4), 0.0001)
+    increases = np.zeros(days)
+    increases[1:] = np.round((values[1:] / values[:-1] - 1) * 100, 2)
+    dates = np.busday_offset(np.datetime64(start, 'D'), np.arange(days), roll='forward')
+    return vectorized.NavArrays(dates, values, increases)
+
+
+def random_navs(days: int, **kwargs) -> typing.List[models.FundNav]:
+    """同 `random_walk`，返回 FundNav 列表"""
+    return random_walk(days, **kwargs).to_navs()
@@ -0,0 +1,311 @@
+# coding: utf8
+import os
+import typing
+
+import numpy as np
+
+from fundstrategy.core import models
+from fundstrategy.core import profits
+from fundstrategy.core import regular
+from fundstrategy.core import schedules
+
+
+class NavArrays:
+    """净值序列的数组形式"""
+
+    def __init__(self, dates: np.ndarray, values: np.ndarray, increases: np.ndarray):
+        """
+        :param dates: datetime64[D] 日期
+        :param values: 净值
+        :param increases: 日增长率的百分点
+        """
+        assert len(dates) == len(values) == len(increases)
+        self.dates = dates
+        self.values = values
+        self.increases = increases
+
+    def __len__(self):
+        return len(self.dates)
+
+    @staticmethod
+    def from_navs(navs: typing.Sequence[models.FundNav]) -> 'NavArrays':
+        if isinstance(navs, models.NavSeries):
+            return NavArrays.from_series(navs)
+        dates = np.array([i.date for i in navs], dtype='datetime64[D]')
+        values = np.array([i.value for i in navs], dtype=np.float64)
+        increases = np.array([i.increase for i in navs], dtype=np.float64)
+        return NavArrays(dates, values, increases)
+
+    def to_navs(self) -> typing.List[models.FundNav]:
+        dates = np.datetime_as_string(self.dates, unit='D')
+        return [models.FundNav(str(d), float(v), float(i))
+                for d, v, i in zip(dates, self.values, self.increases)]
+
+    @staticmethod
+    def from_series(series: models.NavSeries) -> 'NavArrays':
+        """净值、增长率列不复制"""
+        return NavArrays(series.dates, series.values, series.increases)
+
+    def to_series(self) -> models.NavSeries:
+        return models.NavSeries.from_dates(self.dates, self.values, self.increases)
+
+    @property
+    def weekdays(self) -> np.ndarray:
+        """周几，1~7"""
+        return schedules.weekdays(self.dates)
+
+
+class Ledger:
+    """买入/卖出流水"""
+
+    def __init__(self, indexes: np.ndarray, amounts: np.ndarray, equities: np.ndarray, values: np.ndarray):
+        self.indexes = indexes
+        self.amounts = amounts
+        self.equities = equities
+        self.values = values
+
+    def __len__(self):
+        return len(self.indexes)
+
+    @property
+    def amount(self) -> float:
+        return _round(float(np.sum(self.amounts)), 2)
+
+    @property
+    def equity(self) -> float:
+        return _round(float(np.sum(self.equities)), 3)
+
+    @staticmethod
+    def empty() -> 'Ledger':
+        return Ledger(np.zeros(0, dtype=np.int64), np.zeros(0), np.zeros(0), np.zeros(0))
+
+
+class ArrayRecord:
+    """数组形式的收益记录，字段含义同 `profits.ProfitRecord`"""
+
+    def __init__(self, dates: np.ndarray, values: np.ndarray,
+                 equities: np.ndarray, costs: np.ndarray,
+                 buys: Ledger, sells: Ledger):
+        """
+        :param dates: 日期
+        :param values: 当日净值
+        :param equities: 当日结算后持仓份额
+        :param costs: 当日结算后持仓成本
+        :param buys: 买入流水
+        :param sells: 卖出流水
+        """
+        self.dates = dates
+        self.values = values
+        self.equities = equities
+        self.costs = costs
+        self.buys = buys
+        self.sells = sells
+
+    @property
+    def amounts(self) -> np.ndarray:
+        """每日持仓金额"""
+        return _round_amounts(self.equities, self.values)
+
+    @property
+    def profits(self) -> np.ndarray:
+        """每日持仓收益"""
+        return np.round(self.amounts - self.costs, 2)
+
+    @property
+    def profit_rates(self) -> np.ndarray:
+        """每日持仓收益率"""
+        return _round_rates(self.profits, self.costs)
+
+    @property
+    def position_amount(self) -> float:
+        return _amount_of(self.equities[-1], self.values[-1])
+
+    @property
+    def position_equity(self) -> float:
+        return float(self.equities[-1])
+
+    @property
+    def position_cost(self) -> float:
+        return float(self.costs[-1])
+
+    @property
+    def position_profit(self) -> float:
+        return _round(self.position_amount - self.position_cost, 2)
+
+    @property
+    def position_profit_rate(self) -> float:
+        return _rate(self.position_profit, self.position_cost)
+
+    @property
+    def total_amount(self) -> float:
+        return _round(self.position_amount + self.sells.amount, 2)
+
+    @property
+    def total_equity(self) -> float:
+        return _round(self.position_equity + self.sells.equity, 3)
+
+    @property
+    def total_cost(self) -> float:
+        return self.buys.amount
+
+    @property
+    def total_profit(self) -> float:
+        return _round(self.total_amount - self.total_cost, 2)
+
+    @property
+    def total_profit_rate(self) -> float:
+        return _rate(self.total_profit, self.total_cost)
+
+    def write_positions(self, out_csv):
+        os.makedirs(os.path.dirname(out_csv), exist_ok=True)
+        with open(out_csv, 'w') as outf:
+            outf.write('date,nav,equity,amount,cost,profit,rate\n')
+            for row in zip(self.dates.astype(str), self.values, self.equities,
+                           self.amounts, self.costs, self.profits, self.profit_rates):
+                outf.write('{:},{:.4f},{:.3f},{:.2f},{:.2f},{:.2f},{:.2%}\n'.format(*row))
+
+
+def backtest(invest: regular.RegularInvest, arrays: NavArrays) -> ArrayRecord:
+    """
+    float64 数组引擎回测，语义同 `RegularInvest.backtest`，结果按分对齐；暂不支持附加策略。
+    只在定投日上循环，每日持仓份额、成本通过 cumsum 展开
+    """
+    if invest.strategies:
+        raise ValueError('strategies are not supported by vectorized backtest')
+    n = len(arrays)
+    values = np.round(arrays.values, 4)
+    raw_values = arrays.values
+
+    # 每日份额、成本变动，首日为初始建仓
+    eq_steps = np.zeros(n)
+    cost_steps = np.zeros(n)
+    buy_indexes, buy_amounts, buy_equities = [0], [], []
+    amount = _round(invest.init_amount, 2)
+    equity = _round(invest.init_amount / raw_values[0], 3)
+    buy_amounts.append(amount)
+    buy_equities.append(equity)
+    eq_steps[0], cost_steps[0] = equity, amount
+
+    pos_equity, pos_cost = equity, amount
+    for i in np.flatnonzero(_regular_mask(invest, arrays)):
+        amount = invest.delta_amount
+        if invest.decrease:
+            # 定投发生在当日结算前，持仓金额按前一日净值计算
+            pos_amount = _amount_of(pos_equity, values[i - 1])
+            rate = _rate(_round(pos_amount - pos_cost, 2), pos_cost)
+            if rate > 0:
+                k = int(np.floor(rate / invest.decrease[0]))
+                amount -= invest.decrease[1] * k
+        if amount <= 0:
+            continue
+        amount = _round(amount, 2)
+        equity = _round(amount / raw_values[i], 3)
+        pos_equity = _round(pos_equity + equity, 3)
+        pos_cost = _round(pos_cost + amount, 2)
+        buy_indexes.append(i)
+        buy_amounts.append(amount)
+        buy_equities.append(equity)
+        eq_steps[i] += equity
+        cost_steps[i] += amount
+
+    buy_indexes = np.asarray(buy_indexes, dtype=np.int64)
+    buys = Ledger(buy_indexes, np.asarray(buy_amounts), np.asarray(buy_equities), values[buy_indexes])
+    return ArrayRecord(dates=arrays.dates,
+                       values=values,
+                       equities=np.round(np.cumsum(eq_steps), 3),
+                       costs=np.round(np.cumsum(cost_steps), 2),
+                       buys=buys,
+                       sells=Ledger.empty(),
+                       )
+
+
+def compare(record: profits.ProfitRecord, arr_record: ArrayRecord) -> typing.List[str]:
+    """对比两种引擎的结果，返回按分计的差异说明，为空表示一致"""
+    diffs = []
+
+    def check(name, expect, actual, digits):
+        if abs(float(expect) - float(actual)) >= 0.5 * 10 ** -digits:
+            diffs.append(f'{name}: decimal={expect}, numpy={actual}')
+
+    if len(record.histories) != len(arr_record.equities):
+        diffs.append(f'positions: decimal={len(record.histories)}, numpy={len(arr_record.equities)}')
+        return diffs
+    amounts, profit_rates = arr_record.amounts, arr_record.profit_rates
+    for i, snap in enumerate(record.histories):
+        check(f'{snap.date} equity', snap.equity, arr_record.equities[i], 3)
+        check(f'{snap.date} cost', snap.cost, arr_record.costs[i], 2)
+        check(f'{snap.date} amount', snap.amount, amounts[i], 2)
+        check(f'{snap.date} rate', snap.profit_rate, profit_rates[i], 4)
+
+    for name, acc, ledger in [('buy', record.acc_buy, arr_record.buys),
+                              ('sell', record.acc_sell, arr_record.sells)]:
+        if len(acc.histories) != len(ledger):
+            diffs.append(f'{name} count: decimal={len(acc.histories)}, numpy={len(ledger)}')
+            continue
+        for i, delta in enumerate(acc.histories):
+            check(f'{name} {delta.date} amount', delta.amount, ledger.amounts[i], 2)
+            check(f'{name} {delta.date} equity', delta.equity, ledger.equities[i], 3)
+
+    for name, digits in [('position_amount', 2), ('position_cost', 2), ('position_profit_rate', 4),
+                         ('total_amount', 2), ('total_cost', 2), ('total_profit_rate', 4)]:
+        check(name, getattr(record, name), getattr(arr_record, name), digits)
+    return diffs
+
+
+def check_equivalence(invest: regular.RegularInvest,
+                      navs: typing.Sequence[models.FundNav]) -> typing.List[str]:
+    """同时运行 Decimal 引擎与数组引擎，返回差异"""
+    record = invest.backtest(navs)
+    arr_record = backtest(invest, NavArrays.from_navs(navs))
+    return compare(record, arr_record)
+
+
+def _regular_mask(invest: regular.RegularInvest, arrays: NavArrays) -> np.ndarray:
+    """定投日，首日为建仓不参与定投"""
+    mask = invest.schedule.mask(arrays.dates)
+    mask[:1] = False
+    return mask
+
+
+# 份额、净值、金额的定点缩放倍数
+_EQUITY_SCALE, _VALUE_SCALE, _AMOUNT_SCALE = 1_000, 10_000, 100
+_PRODUCT_SCALE = _EQUITY_SCALE * _VALUE_SCALE
+
+
+def _round(v: float, digits: int) -> float:
+    # 内置 round 对 float 的精确值做四舍六入五成双，同 Decimal.from_float().quantize()
+    return round(float(v), digits)
+
+
+def _amount_of(equity: float, value: float) -> float:
+    """持仓金额：按定点整数精确相乘后再取整，同 decimals.amount(equity * value)"""
+    p = int(round(equity * _EQUITY_SCALE)) * int(round(value * _VALUE_SCALE))
+    return _round(p / _PRODUCT_SCALE, 2)
+
+
+def _rate(profit: float, cost: float) -> float:
+    if cost == 0:
+        return 0.0
+    profit, cost = int(round(profit * _AMOUNT_SCALE)), int(round(cost * _AMOUNT_SCALE))
+    return _round(profit / cost, 4)
+
+
+def _round_amounts(equities: np.ndarray, values: np.ndarray) -> np.ndarray:
+    p = np.rint(equities * _EQUITY_SCALE).astype(np.int64) * np.rint(values * _VALUE_SCALE).astype(np.int64)
+    amounts = np.round(p / _PRODUCT_SCALE, 2)
+    # 恰好为半分的乘积，np.round 的缩放误差可能导致进位方向不同，逐个按精确值处理
+    for i in np.flatnonzero(p % (_PRODUCT_SCALE // _AMOUNT_SCALE) == _PRODUCT_SCALE // _AMOUNT_SCALE // 2):
+        amounts[i] = _round(int(p[i]) / _PRODUCT_SCALE, 2)
+    return amounts
+
+
+def _round_rates(profits: np.ndarray, costs: np.ndarray) -> np.ndarray:
+    profits = np.rint(profits * _AMOUNT_SCALE)
+    costs = np.rint(costs * _AMOUNT_SCALE)
+    rates = profits / np.where(costs == 0, 1, costs)
+    scaled = rates * 10_000
+    out = np.round(rates, 4)
+    # 接近五入边界的逐个按 float 精确值处理
+    for i in np.flatnonzero(np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6):
+        out[i] = _round(rates[i], 4)
+    return np.where(costs == 0, 0.0, out)
@@ -1,3 +1,4 @@
 # coding: utf8
 from .fund_dao import FundDao
 from .nav_dao import NavDao
+from .sync_dao import SyncDao
@@ -1,4 +1,6 @@
 # coding: utf8
+import typing
+
 from fundstrategy.core import models
 from fundstrategy.core import sql_handler
 
@@ -19,3 +21,13 @@ class FundDao:
         args = [code]
         row = self.sql.do_select(query, args, size=None)
         return self._row_to_fund(row)
+
+    def list_funds(self, codes: typing.Sequence[str] = None) -> typing.List[models.FundInfo]:
+        query = 'select code, max(name) as name from fund_nav'
+        args = []
+        if codes:
+            query += ' where code in (' + ','.join(['%s'] * len(codes)) + ')'
+            args.extend(codes)
+        query += ' group by code order by code asc'
+        rows = self.sql.do_select(query, args, size=0)
+        return [self._row_to_fund(r) for r in rows]
@@ -1,6 +1,9 @@
 # coding: utf8
-from fundstrategy.core import sql_handler
+import typing
+
 from fundstrategy.core import models
+from fundstrategy.core import nav_store
+from fundstrategy.core import sql_handler
 
 
 class NavDao:
@@ -10,31 +13,188 @@ class NavDao:
     def _row_to_nav(self, row: dict):
         return models.FundNav(date=row['value_date'],
                               value=row['unit_value'],
-                              increase=row['increase_rate'])
+                              increase=row['increase_rate'],
+                              weekday=row.get('day_of_week'))
+
+    _INSERT_IGNORE = 'insert ignore into fund_nav' \
+                     '(code,name,value_date,unit_value,increase_rate,day_of_week,year_week)' \
+                     ' values'
+    _INSERT_ROW = '(%s,%s,%s,%s,%s,weekday(%s)+1,yearweek(%s))'
+
+    @staticmethod
+    def _nav_args(info: models.FundInfo, nav: models.FundNav):
+        return info.code, info.name, nav.date, nav.value, nav.increase, nav.date, nav.date
 
     def insert_ignore(self, info: models.FundInfo, nav: models.FundNav):
-        query = 'insert ignore into fund_nav' \
-                '(code,name,value_date,unit_value,increase_rate,day_of_week,year_week)' \
-                ' values(%s,%s,%s,%s,%s,weekday(%s)+1,yearweek(%s))'
-        args = (info.code, info.name, nav.date, nav.value, nav.increase, nav.date, nav.date)
+        query = self._INSERT_IGNORE + self._INSERT_ROW
+        args = self._nav_args(info, nav)
         self.sql.do_insert(query, args)
 
+    def insert_ignore_many(self, info: models.FundInfo, navs: typing.Sequence[models.FundNav],
+                           batch_size: int = 500):
+        """在一个事务内按批次多行插入，已存在的忽略"""
+        assert batch_size >= 1
+        batch_size = min(batch_size, self.sql.dialect.max_params // self._INSERT_ROW.count('%s'))
+        with self.sql.transaction():
+            for i in range(0, len(navs), batch_size):
+                batch = navs[i:i + batch_size]
+                query = self._INSERT_IGNORE + ','.join([self._INSERT_ROW] * len(batch))
+                args = []
+                for nav in batch:
+                    args.extend(self._nav_args(info, nav))
+                self.sql.do_insert(query, args)
+
     def get_nav(self, code: str, date: str) -> models.FundNav:
         query = 'select * from fund_nav where code=%s and value_date=%s'
         args = [code, date]
         row = self.sql.do_select(query, args, size=None)
         return self._row_to_nav(row)
 
-    def list_navs(self, code: str, start: str = None, end: str = None):
-        query = 'select * from fund_nav where code=%s'
+    def get_latest_date(self, code: str) -> typing.Optional[str]:
+        """已存储的最新净值日期"""
+        query = 'select max(value_date) as value_date from fund_nav where code=%s'
         args = [code]
+        row = self.sql.do_select(query, args, size=None)
+        return row['value_date'] if row else None
+
+    def get_version(self, code: str, start: str = None, end: str = None) -> str:
+        """
+        日期范围内净值数据的版本：条数、最新日期、最近更新时间，写入或更新净值后随之变化
+        """
+        where, args = self._range_where(code, start, end)
+        query = 'select count(*) as count, max(value_date) as max_date, max(update_ts) as max_ts' \
+                ' from fund_nav' + where
+        row = self.sql.do_select(query, args, size=None)
+        return f'{row["count"]}:{row["max_date"]}:{row["max_ts"]}'
+
+    @staticmethod
+    def _navs_query(code: str, start: str = None, end: str = None):
+        where, args = NavDao._range_where(code, start, end)
+        query = 'select * from fund_nav' + where + ' order by value_date asc'
+        return query, args
+
+    def list_navs(self, code: str, start: str = None, end: str = None):
+        query, args = self._navs_query(code, start, end)
+        rows = self.sql.do_select(query, args, size=0)
+        navs = [self._row_to_nav(r) for r in rows]
+        return navs
+
+    def list_series(self, code: str, start: str = None, end: str = None) -> models.NavSeries:
+        """同 `list_navs`，只查询需要的列并按列构造 NavSeries，不为每行创建 FundNav"""
+        where, args = self._range_where(code, start, end)
+        query = 'select value_date,unit_value,increase_rate from fund_nav' + where + ' order by value_date asc'
+        rows = self.sql.do_select(query, args, size=0)
+        return models.NavSeries.from_columns([r['value_date'] for r in rows],
+                                             [r['unit_value'] for r in rows],
+                                             [r['increase_rate'] for r in rows])
+
+    def iter_navs(self, code: str, start: str = None, end: str = None,
+                  chunk_size: int = 1000) -> typing.Iterator[models.FundNav]:
+        """按日期升序流式读取净值，每次从服务端游标取 chunk_size 行"""
+        query, args = self._navs_query(code, start, end)
+        for rows in self.sql.iter_select(query, args, chunk_size=chunk_size):
+            for r in rows:
+                yield self._row_to_nav(r)
+
+    def iter_navs_by_codes(self, codes: typing.Sequence[str], start: str = None, end: str = None,
+                           chunk_size: int = 100) -> typing.Iterator[typing.Tuple[str, typing.List[models.FundNav]]]:
+        """
+        批量查询多个基金的净值，每 chunk_size 个基金一次查询
+
+        :return: (code, navs)，按 codes 顺序，没有净值的基金跳过
+        """
+        for i in range(0, len(codes), chunk_size):
+            chunk = codes[i:i + chunk_size]
+            dates, date_args = self._date_range(start, end)
+            query = 'select * from fund_nav where code in (' + ','.join(['%s'] * len(chunk)) + ')' + dates \
+                    + ' order by code asc, value_date asc'
+            args = list(chunk) + date_args
+            rows = self.sql.do_select(query, args, size=0)
+            navs_by_code = {}
+            for r in rows:
+                navs_by_code.setdefault(r['code'], []).append(self._row_to_nav(r))
+            for code in chunk:
+                if code in navs_by_code:
+                    yield code, navs_by_code[code]
+
+    @staticmethod
+    def _date_range(start: str = None, end: str = None) -> typing.Tuple[str, list]:
+        """日期范围条件，以 ` and ` 开头，没有范围时为空"""
+        cond, args = '', []
         if start:
-            query += ' and value_date>=%s'
+            cond += ' and value_date>=%s'
             args.append(start)
         if end:
-            query += ' and value_date<=%s'
+            cond += ' and value_date<=%s'
             args.append(end)
-        query += ' order by value_date asc'
-        rows = self.sql.do_select(query, args, size=0)
-        navs = [self._row_to_nav(r) for r in rows]
-        return navs
+        return cond, args
+
+    @staticmethod
+    def _range_where(code: str, start: str = None, end: str = None) -> typing.Tuple[str, list]:
+        cond, args = NavDao._date_range(start, end)
+        return ' where code=%s' + cond, [code] + args
+
+    def weekday_stats(self, code: str, start: str = None, end: str = None) -> typing.List[dict]:
+        """
+        按周几聚合：count, avg_value, min_value, max_value, avg_increase，在数据库内 group by day_of_week
+
+        :return: 按 weekday 升序，1 为周一
+        """
+        where, args = self._range_where(code, start, end)
+        query = 'select day_of_week as weekday, count(*) as count, avg(unit_value) as avg_value' \
+                ', min(unit_value) as min_value, max(unit_value) as max_value, avg(increase_rate) as avg_increase' \
+                ' from fund_nav' + where + ' group by day_of_week order by day_of_week asc'
+        return self.sql.do_select(query, args, size=0)
+
+    def increase_histogram(self, code: str, start: str = None, end: str = None,
+                           bin_width: float = 0.5) -> typing.List[typing.Tuple[float, int]]:
+        """
+        日增长率直方图，区间左闭右开，在数据库内按 floor(increase_rate / bin_width) 分桶计数
+
+        :param bin_width: 区间宽度，百分点
+        :return: [(区间下界, 个数)]，按下界升序，没有净值的区间不返回
+        """
+        assert bin_width > 0
+        where, args = self._range_where(code, start, end)
+        query = 'select floor(increase_rate / %s) as bucket, count(*) as count from fund_nav' + where + \
+                ' and increase_rate is not null group by bucket order by bucket asc'
+        rows = self.sql.do_select(query, [bin_width] + args, size=0)
+        return [(int(r['bucket']) * bin_width, r['count']) for r in rows]
+
+    # 周期统计的分组表达式，year_week 同 MySQL yearweek(date)，跨年的周归入周日所在年份
+    _PERIODS = dict(year='substr(value_date, 1, 4)', week='year_week')
+
+    def period_stats(self, code: str, start: str = None, end: str = None, period: str = 'year') -> typing.List[dict]:
+        """
+        按年或周聚合：count, first_date, last_date, first_value, last_value, min_value, max_value,
+        avg_increase, min_increase, max_increase；期初、期末净值由分组后的首末日期关联得到
+
+        :param period: year 或 week，week 按存储的 year_week 分组
+        :return: 按 period 升序
+        """
+        expr = self._PERIODS[period]
+        where, args = self._range_where(code, start, end)
+        query = 'select s.*, f.unit_value as first_value, l.unit_value as last_value from (' \
+                f'select {expr} as `period`, count(*) as count' \
+                ', min(value_date) as first_date, max(value_date) as last_date' \
+                ', min(unit_value) as min_value, max(unit_value) as max_value' \
+                ', avg(increase_rate) as avg_increase, min(increase_rate) as min_increase' \
+                ', max(increase_rate) as max_increase' \
+                ' from fund_nav' + where + ' group by `period`) s' \
+                ' join fund_nav f on f.code=%s and f.value_date=s.first_date' \
+                ' join fund_nav l on l.code=%s and l.value_date=s.last_date' \
+                ' order by s.`period` asc'
+        return self.sql.do_select(query, args + [code, code], size=0)
+
+    def sync_store(self, store: nav_store.NavStore, funds: typing.Sequence[models.FundInfo],
+                   chunk_size: int = 100) -> int:
+        """把 fund_nav 中指定基金的全部净值写入本地净值存储，结束后写入一次索引，返回写入的基金数"""
+        fund_map = {f.code: f for f in funds}
+        count = 0
+        try:
+            for code, navs in self.iter_navs_by_codes(list(fund_map), chunk_size=chunk_size):
+                store.write(fund_map[code], navs)
+                count += 1
+        finally:
+            store.flush()
+        return count
@@ -0,0 +1,42 @@
+# coding: utf8
+import typing
+
+from fundstrategy.core import sql_handler
+
+
+class SyncWatermark:
+    def __init__(self, code: str, last_date: str, last_count: int):
+        """
+        :param last_date: 已同步的最新净值日期
+        :param last_count: 最近一次同步写入的净值条数
+        """
+        self.code = code
+        self.last_date = last_date
+        self.last_count = last_count
+
+    def __repr__(self):
+        return f'<{self.__class__.__name__}: {self.code}, {self.last_date}, {self.last_count}>'
+
+
+class SyncDao:
+    def __init__(self, sql: sql_handler.SqlHandler):
+        self.sql = sql
+
+    def _row_to_watermark(self, row: dict):
+        if row is None:
+            return None
+        return SyncWatermark(code=row['code'],
+                             last_date=row['last_date'],
+                             last_count=row['last_count'],
+                             )
+
+    def get_watermark(self, code: str) -> typing.Optional[SyncWatermark]:
+        query = 'select * from fund_sync where code=%s'
+        args = [code]
+        row = self.sql.do_select(query, args, size=None)
+        return self._row_to_watermark(row)
+
+    def save_watermark(self, code: str, last_date: str, last_count: int):
+        query = 'replace into fund_sync(code,last_date,last_count) values(%s,%s,%s)'
+        args = (code, last_date, last_count)
+        self.sql.do_insert(query, args)
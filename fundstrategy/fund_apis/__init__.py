@@ -1,3 +1,6 @@
 # coding: utf8
 from .doctorxiong import DoctorXiong
 from .easymoney import EastMoney
+from .fund_api import ConcurrentFetcher
+from .http_client import HttpClient
+from .http_cache import HttpCache
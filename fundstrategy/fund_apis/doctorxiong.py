@@ -2,11 +2,11 @@
 import enum
 import logging
 
-import requests as requests
-
 from fundstrategy.core import dynamics
-from fundstrategy.fund_apis import fund_api
+from fundstrategy.core import logs
 from fundstrategy.core import models
+from fundstrategy.fund_apis import fund_api
+from fundstrategy.fund_apis import http_client
 
 
 class ErrCode(enum.Enum):
@@ -18,25 +18,32 @@ class DoctorXiong(fund_api.FundApi):
     https://www.doctorxiong.club/api/#api-Fund-getFundDetail
     """
 
-    def __init__(self):
+    def __init__(self, client: http_client.HttpClient = None, base_url: str = 'https://api.doctorxiong.club',
+                 log_limit: int = 500):
+        """
+        :param log_limit: 日志中响应内容的最大长度
+        """
+        super().__init__(client)
+        self.base_url = base_url
+        self.log_limit = log_limit
         self.logger = logging.getLogger(self.__class__.__name__)
 
     def do_get(self, url):
-        resp = requests.get(url)
-        resp = dynamics.DynamicObject.parse_json(resp.text)
-        self.logger.info(f'{url} --> {resp}')
-        return resp
+        resp = self.client.get(url)
+        content = resp.content
+        # 记录原始响应的开头部分，日志输出时才解码
+        self.logger.info('%s --> %s', url, logs.Truncated(content, self.log_limit))
+        return dynamics.DynamicObject.parse_json(content)
 
     def get_fund_detail(self, code: str, start_date: str = '', end_date: str = ''):
-        url = f'https://api.doctorxiong.club/v1/fund/detail?code={code}&startDate={start_date}&endDate={end_date}'
+        url = f'{self.base_url}/v1/fund/detail?code={code}&startDate={start_date}&endDate={end_date}'
         return self.do_get(url)
 
     def get_nav_list(self, code: str, start_date: str = '', end_date: str = '') -> models.FundNavList:
         detail = self.get_fund_detail(code, start_date, end_date).data
         fund_info = models.FundInfo(detail.code, detail.name)
-        nav_list = models.FundNavList(fund_info)
-        for item in detail.netWorthData:
-            nav_list.append(date=item[0],
-                            value=item[1],
-                            increase=item[2])
-        return nav_list
+        items = detail.netWorthData
+        series = models.NavSeries.from_columns([i[0] for i in items],
+                                               [i[1] for i in items],
+                                               [i[2] for i in items])
+        return models.FundNavList(fund_info, series)
@@ -1,10 +1,8 @@
 # coding: utf8
-from fundstrategy.fund_apis import fund_api
 from fundstrategy.core import models
-
-import requests
-import json
-import re
+from fundstrategy.fund_apis import fund_api
+from fundstrategy.fund_apis import http_client
+from fundstrategy.fund_apis import pingzhong
 
 
 class EastMoney(fund_api.FundApi):
@@ -12,19 +10,19 @@ class EastMoney(fund_api.FundApi):
     https://cloud.tencent.com/developer/article/1695640
     """
 
+    def __init__(self, client: http_client.HttpClient = None, base_url: str = 'http://fund.eastmoney.com'):
+        super().__init__(client)
+        self.base_url = base_url
+
     def get_nav_list(self, code: str, start_date: str = '', end_date: str = '') -> models.FundNavList:
-        url = "http://fund.eastmoney.com/pingzhongdata/%s.js" % code
+        url = f'{self.base_url}/pingzhongdata/{code}.js'
         headers = {'content-type': 'application/json',
                    'User-Agent': 'Mozilla/5.0 (X11; Ubuntu; Linux x86_64; rv:22.0) Gecko/20100101 Firefox/22.0'}
-        r = requests.get(url, headers=headers)
-        content = r.text
-        name = re.findall(r'var fS_name = "([^"]+)";', content)[0]
-        info = models.FundInfo(code, name)
-        nav_list = models.FundNavList(info)
-        data = re.findall(r'Data_netWorthTrend = ([^;]+);', content)[0]
-        data = json.loads(data)
-        for item in data:
-            nav_list.append(date=models.fund_date(item['x'] / 1000),
-                            value=item['y'],
-                            increase=item['equityReturn'])
-        return nav_list
+        r = self.client.get(url, headers=headers, stream=True)
+        with r:
+            chunks = r.iter_content(chunk_size=64 * 1024)
+            data = pingzhong.parse(chunks)
+            # 解析提前结束后仍读完剩余内容，未读完就关闭的连接不会放回连接池复用
+            for _ in chunks:
+                pass
+        return data.to_nav_list(code, start_date, end_date)
@@ -1,10 +1,52 @@
 # coding: utf8
 import abc
+import concurrent.futures
+import typing
 
 from fundstrategy.core import models
+from fundstrategy.fund_apis import http_client
 
 
 class FundApi(abc.ABC):
+    def __init__(self, client: http_client.HttpClient = None):
+        """
+        :param client: http 客户端，默认使用进程内共享的客户端
+        """
+        self.client = client or http_client.default_client()
+
     @abc.abstractmethod
     def get_nav_list(self, code: str, start_date: str = '', end_date: str = '') -> models.FundNavList:
         raise NotImplementedError
+
+
+class ConcurrentFetcher:
+    """线程池并发拉取多个基金的净值"""
+
+    def __init__(self, api: FundApi, max_workers: int = 8):
+        self.api = api
+        self.max_workers = max_workers
+
+    def fetch_many(self, codes: typing.Iterable[str], start_date: str = '', end_date: str = '',
+                   get_start: typing.Callable[[str], typing.Optional[str]] = None
+                   ) -> typing.Iterator[typing.Tuple[str, typing.Optional[str],
+                                                     typing.Union[models.FundNavList, Exception]]]:
+        """
+        :param get_start: 按基金确定开始日期，如增量同步时取水位次日，在工作线程中调用
+        :return: 按完成顺序返回 (code, 拉取使用的开始日期, 净值列表或异常)，get_start 失败时开始日期为 None
+        """
+        starts = {}
+
+        def fetch(code):
+            start = starts[code] = get_start(code) if get_start else start_date
+            return self.api.get_nav_list(code, start or '', end_date or '')
+
+        with concurrent.futures.ThreadPoolExecutor(self.max_workers) as executor:
+            futures = {executor.submit(fetch, code): code for code in codes}
+            for future in concurrent.futures.as_completed(futures):
+                code = futures[future]
+                try:
+                    nav_list = future.result()
+                except Exception as e:
+                    yield code, starts.get(code), e
+                else:
+                    yield code, starts[code], nav_list
@@ -0,0 +1,174 @@
+# coding: utf8
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import typing
+import zlib
+
+
+class CacheEntry:
+    def __init__(self, url: str, content: bytes, encoding: typing.Optional[str],
+                 etag: str = None, last_modified: str = None, fetched_at: float = None):
+        """
+        :param fetched_at: 最近一次从上游获取或确认未变更的时间
+        """
+        self.url = url
+        self.content = content
+        self.encoding = encoding
+        self.etag = etag
+        self.last_modified = last_modified
+        self.fetched_at = fetched_at or time.time()
+
+    def __repr__(self):
+        return f'<{self.__class__.__name__}: {self.url}, {len(self.content)} bytes, etag={self.etag}>'
+
+    @property
+    def revalidatable(self) -> bool:
+        return bool(self.etag or self.last_modified)
+
+    def conditional_headers(self) -> dict:
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+
+class CacheStats:
+    def __init__(self):
+        # 未过期直接命中
+        self.hits = 0
+        # 过期后上游返回 304
+        self.revalidated = 0
+        # 未缓存或过期后重新下载
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+
+    def __repr__(self):
+        return f'<{self.__class__.__name__}: {self.as_dict()}>'
+
+    def as_dict(self) -> dict:
+        return dict(self.__dict__)
+
+
+class HttpCache:
+    """
+    按 url 缓存响应内容，zlib 压缩存盘；超过 ttl 后优先按 ETag/Last-Modified 条件请求重新验证；
+    总大小超过 max_bytes 时按最近使用时间淘汰
+    """
+
+    def __init__(self, root: str, ttl: float = 3600, max_bytes: int = 512 * 1024 * 1024, level: int = 6):
+        """
+        :param ttl: 缓存有效秒数
+        :param max_bytes: 压缩后的总大小上限
+        :param level: zlib 压缩级别
+        """
+        self.root = root
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.level = level
+        self.stats = CacheStats()
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self._lock = threading.Lock()
+        # 缓存文件总大小，首次写入时统计
+        self._total_bytes: typing.Optional[int] = None
+        os.makedirs(root, exist_ok=True)
+
+    def __repr__(self):
+        return f'<{self.__class__.__name__}: {self.root}, ttl={self.ttl}, {self.stats}>'
+
+    def _path(self, url: str) -> str:
+        key = hashlib.sha1(url.encode('utf8')).hexdigest()
+        return os.path.join(self.root, f'{key}.cache')
+
+    def get(self, url: str) -> typing.Optional[CacheEntry]:
+        """读取缓存，不判断是否过期"""
+        path = self._path(url)
+        try:
+            with open(path, 'rb') as f:
+                header = json.loads(f.readline())
+                content = zlib.decompress(f.read())
+        except (FileNotFoundError, ValueError, zlib.error):
+            return None
+        if header['url'] != url:
+            return None
+        # 记录最近使用时间，用于淘汰
+        os.utime(path)
+        return CacheEntry(url, content, header['encoding'], header['etag'], header['last_modified'],
+                          header['fetched_at'])
+
+    def is_fresh(self, entry: CacheEntry) -> bool:
+        return time.time() - entry.fetched_at < self.ttl
+
+    def put(self, entry: CacheEntry):
+        header = dict(url=entry.url, encoding=entry.encoding, etag=entry.etag,
+                      last_modified=entry.last_modified, fetched_at=entry.fetched_at)
+        path = self._path(entry.url)
+        tmp = f'{path}.{threading.get_ident()}.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(json.dumps(header).encode('utf8') + b'\n')
+            f.write(zlib.compress(entry.content, self.level))
+            size = f.tell()
+        with self._lock:
+            old_size = os.path.getsize(path) if os.path.exists(path) else 0
+            os.replace(tmp, path)
+            self.stats.stores += 1
+            if self._total_bytes is not None:
+                self._total_bytes += size - old_size
+        if self._total_bytes is None or self._total_bytes > self.max_bytes:
+            self.evict()
+
+    def record_hit(self):
+        """命中未过期的缓存，计数线程安全，下同"""
+        with self._lock:
+            self.stats.hits += 1
+
+    def record_revalidated(self):
+        """上游返回 304，使用缓存"""
+        with self._lock:
+            self.stats.revalidated += 1
+
+    def record_miss(self):
+        with self._lock:
+            self.stats.misses += 1
+
+    def touch(self, entry: CacheEntry):
+        """上游确认未变更，刷新获取时间"""
+        entry.fetched_at = time.time()
+        self.put(entry)
+
+    def evict(self):
+        """按最近使用时间淘汰，直到总大小不超过上限"""
+        with self._lock:
+            files = []
+            for name in os.listdir(self.root):
+                if not name.endswith('.cache'):
+                    continue
+                try:
+                    st = os.stat(os.path.join(self.root, name))
+                except FileNotFoundError:
+                    continue
+                files.append((st.st_mtime, st.st_size, name))
+            total = sum(i[1] for i in files)
+            for _, size, name in sorted(files):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(os.path.join(self.root, name))
+                except FileNotFoundError:
+                    pass
+                total -= size
+                self.stats.evictions += 1
+            self._total_bytes = total
+
+    def clear(self):
+        with self._lock:
+            for name in os.listdir(self.root):
+                if name.endswith('.cache'):
+                    os.remove(os.path.join(self.root, name))
+            self._total_bytes = 0
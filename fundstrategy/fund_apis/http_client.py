@@ -0,0 +1,159 @@
+# coding: utf8
+import logging
+import threading
+import time
+import typing
+import urllib.parse
+
+import requests
+from requests import adapters
+
+from fundstrategy.fund_apis import http_cache
+
+
+class RateLimiter:
+    """令牌桶限流，线程安全"""
+
+    def __init__(self, rate: float, burst: int = 1):
+        """
+        :param rate: 每秒请求数
+        :param burst: 允许的突发请求数
+        """
+        assert rate > 0 and burst >= 1
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class HttpClient:
+    """复用 keep-alive 连接的 http 客户端，按 host 限流，失败按指数退避重试"""
+
+    RETRY_STATUS = {429, 500, 502, 503, 504}
+
+    def __init__(self,
+                 pool_size: int = 16,
+                 rate_per_host: float = 10,
+                 burst_per_host: int = 5,
+                 retries: int = 3,
+                 backoff: float = 0.5,
+                 timeout: float = 30,
+                 cache: http_cache.HttpCache = None):
+        """
+        :param pool_size: 每个 host 的 keep-alive 连接数
+        :param rate_per_host: 每个 host 每秒请求数
+        :param burst_per_host: 每个 host 允许的突发请求数
+        :param retries: 连接失败、超时或 RETRY_STATUS 时的重试次数
+        :param backoff: 第 n 次重试前等待 backoff * 2^(n-1) 秒
+        :param timeout: 单次请求超时秒数
+        :param cache: 响应缓存，为空时不缓存
+        """
+        self.rate_per_host = rate_per_host
+        self.burst_per_host = burst_per_host
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.cache = cache
+        self.logger = logging.getLogger(self.__class__.__name__)
+
+        self.session = requests.Session()
+        adapter = adapters.HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self._limiters: typing.Dict[str, RateLimiter] = {}
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        self.session.close()
+
+    def limiter(self, url: str) -> RateLimiter:
+        host = urllib.parse.urlsplit(url).netloc
+        with self._lock:
+            if host not in self._limiters:
+                self._limiters[host] = RateLimiter(self.rate_per_host, self.burst_per_host)
+            return self._limiters[host]
+
+    def get(self, url: str, headers: dict = None, **kwargs) -> requests.Response:
+        """
+        :param kwargs: 同 requests.get；有缓存时只支持 stream，响应内容总是完整读入
+        """
+        if self.cache is None or set(kwargs) - {'stream'}:
+            return self.do_get(url, headers, **kwargs)
+        entry = self.cache.get(url)
+        if entry is not None and self.cache.is_fresh(entry):
+            self.cache.record_hit()
+            return _cached_response(entry)
+        if entry is not None and entry.revalidatable:
+            resp = self.do_get(url, dict(headers or {}, **entry.conditional_headers()))
+            if resp.status_code == 304:
+                self.cache.record_revalidated()
+                self.cache.touch(entry)
+                return _cached_response(entry)
+        else:
+            resp = self.do_get(url, headers)
+        self.cache.record_miss()
+        self.cache.put(http_cache.CacheEntry(url, resp.content, resp.encoding,
+                                             etag=resp.headers.get('ETag'),
+                                             last_modified=resp.headers.get('Last-Modified')))
+        return resp
+
+    def do_get(self, url: str, headers: dict = None, **kwargs) -> requests.Response:
+        limiter = self.limiter(url)
+        for attempt in range(self.retries + 1):
+            if attempt > 0:
+                time.sleep(self.backoff * 2 ** (attempt - 1))
+            limiter.acquire()
+            try:
+                resp = self.session.get(url, headers=headers, timeout=self.timeout, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if attempt >= self.retries:
+                    raise
+                self.logger.warning(f'{url}: retry {attempt + 1}/{self.retries}, {e!r}')
+                continue
+            if resp.status_code in self.RETRY_STATUS and attempt < self.retries:
+                self.logger.warning(f'{url}: retry {attempt + 1}/{self.retries}, status={resp.status_code}')
+                continue
+            resp.raise_for_status()
+            return resp
+
+
+def _cached_response(entry: http_cache.CacheEntry) -> requests.Response:
+    resp = requests.Response()
+    resp.status_code = 200
+    resp.url = entry.url
+    resp.encoding = entry.encoding
+    resp._content = entry.content
+    resp._content_consumed = True
+    return resp
+
+
+_default_client: typing.Optional[HttpClient] = None
+_default_lock = threading.Lock()
+
+
+def default_client() -> HttpClient:
+    """进程内共享的客户端"""
+    global _default_client
+    with _default_lock:
+        if _default_client is None:
+            _default_client = HttpClient()
+        return _default_client
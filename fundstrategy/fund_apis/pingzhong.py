@@ -0,0 +1,154 @@
+# coding: utf8
+import json
+import re
+import typing
+
+import numpy as np
+
+from fundstrategy.core import models
+
+# pingzhongdata 的时间戳为北京时间零点
+_TZ_OFFSET_MS = 8 * 3600 * 1000
+_DAY_MS = 86400 * 1000
+
+_VAR = re.compile(rb'var\s+(\w+)\s*=')
+_X = re.compile(rb'"x"\s*:\s*(-?\d+)')
+_Y = re.compile(rb'"y"\s*:\s*(-?[\d.eE+-]+|null)')
+_RETURN = re.compile(rb'"equityReturn"\s*:\s*(-?[\d.eE+-]+|null)')
+
+_SEARCH, _SKIP, _VALUE, _TREND = range(4)
+
+
+class PingzhongData:
+    """pingzhongdata 中用到的字段"""
+
+    def __init__(self, name: str, dates: np.ndarray, values: np.ndarray, increases: np.ndarray):
+        """
+        :param dates: datetime64[D] 净值日期
+        :param values: 单位净值
+        :param increases: 日增长率的百分点，缺失为 nan
+        """
+        self.name = name
+        self.dates = dates
+        self.values = values
+        self.increases = increases
+
+    def __repr__(self):
+        return f'<{self.__class__.__name__}: {self.name}, {len(self.dates)} navs>'
+
+    def to_nav_list(self, code: str, start_date: str = '', end_date: str = '') -> models.FundNavList:
+        """按日期范围截取后转为净值列表，日期按二分查找定位"""
+        beg = np.searchsorted(self.dates, np.datetime64(start_date, 'D'), side='left') if start_date else 0
+        end = np.searchsorted(self.dates, np.datetime64(end_date, 'D'), side='right') \
+            if end_date else len(self.dates)
+        series = models.NavSeries.from_dates(self.dates[beg:end], self.values[beg:end], self.increases[beg:end])
+        return models.FundNavList(models.FundInfo(code, self.name), series)
+
+
+class PingzhongParser:
+    """
+    流式解析 pingzhongdata/<code>.js：按块喂入字节，只保留未处理完的尾部；
+    不需要的变量直接跳过，净值走势逐段提取数值，不整体 json 解码。
+    fS_name 与 Data_netWorthTrend 都解析完成后 done 为 True，可以提前结束读取
+    """
+
+    def __init__(self):
+        self.name: typing.Optional[str] = None
+        self._trend_done = False
+        self._xs: typing.List[bytes] = []
+        self._ys: typing.List[bytes] = []
+        self._returns: typing.List[bytes] = []
+        # 净值走势中的对象个数，用于发现格式变化导致的提取失败
+        self._trend_objects = 0
+        self._state = _SEARCH
+        self._var = None
+        self._buf = b''
+
+    @property
+    def done(self) -> bool:
+        return self.name is not None and self._trend_done
+
+    def feed(self, chunk: bytes):
+        self._buf = self._buf + chunk if self._buf else chunk
+        while not self.done and self._step():
+            pass
+
+    def _step(self) -> bool:
+        """处理缓冲区，返回是否还能继续处理"""
+        buf = self._buf
+        if self._state == _SEARCH:
+            m = _VAR.search(buf)
+            if m is None:
+                # var 声明可能被块边界截断，保留尾部
+                self._buf = buf[-64:]
+                return False
+            self._var = m.group(1).decode()
+            self._buf = buf[m.end():]
+            if self._var == 'fS_name':
+                self._state = _VALUE
+            elif self._var == 'Data_netWorthTrend':
+                self._state = _TREND
+            else:
+                self._state = _SKIP
+            return True
+
+        end = buf.find(b';')
+        if self._state == _SKIP:
+            if end < 0:
+                self._buf = b''
+                return False
+        elif self._state == _VALUE:
+            if end < 0:
+                return False
+            self.name = json.loads(buf[:end])
+        elif self._state == _TREND:
+            stop = end if end >= 0 else buf.rfind(b'}') + 1
+            if stop > 0:
+                segment = buf[:stop]
+                self._trend_objects += segment.count(b'{')
+                self._xs.extend(_X.findall(segment))
+                self._ys.extend(_Y.findall(segment))
+                self._returns.extend(_RETURN.findall(segment))
+            if end < 0:
+                self._buf = buf[stop:]
+                return False
+            self._trend_done = True
+        self._buf = buf[end + 1:]
+        self._state = _SEARCH
+        return True
+
+    def result(self) -> PingzhongData:
+        if self.name is None:
+            raise ValueError('fS_name not found')
+        if not self._trend_done:
+            raise ValueError('Data_netWorthTrend not found')
+        if self._trend_objects > 0 and len(self._xs) == 0:
+            raise ValueError(f'Data_netWorthTrend has {self._trend_objects} items but no point parsed'
+                             f', format may have changed')
+        if not len(self._xs) == len(self._ys) == len(self._returns):
+            raise ValueError(f'Data_netWorthTrend fields mismatch: x={len(self._xs)}, y={len(self._ys)}'
+                             f', equityReturn={len(self._returns)}')
+        xs = np.array(self._xs).astype(np.int64) if self._xs else np.zeros(0, dtype=np.int64)
+        days = (xs + _TZ_OFFSET_MS) // _DAY_MS
+        return PingzhongData(self.name,
+                             dates=days.astype('datetime64[D]'),
+                             values=_to_floats(self._ys),
+                             increases=_to_floats(self._returns),
+                             )
+
+
+def parse(chunks: typing.Iterable[bytes]) -> PingzhongData:
+    parser = PingzhongParser()
+    for chunk in chunks:
+        parser.feed(chunk)
+        if parser.done:
+            break
+    return parser.result()
+
+
+def _to_floats(items: typing.List[bytes]) -> np.ndarray:
+    if not items:
+        return np.zeros(0)
+    raw = np.array(items)
+    raw[raw == b'null'] = b'nan'
+    return raw.astype(np.float64)
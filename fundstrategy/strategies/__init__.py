@@ -1,16 +1,33 @@
 # coding: utf8
+import typing
+
+from fundstrategy.core.regular import ProfitStrategy
 from ._add_by_value_drawback import AddByValueDrawback
 from ._add_by_value_increase import AddByValueIncrease
 from ._stop_by_profit_rate import StopByProfitRate
 from ._stop_by_value_drawback import StopByValueDrawback
 from ._take_delta_profit import TakeDeltaProfit
 
+# 可通过配置使用的策略，类名 -> 类
+STRATEGIES: typing.Dict[str, typing.Type[ProfitStrategy]] = {cls.__name__: cls for cls in [
+    AddByValueDrawback,
+    AddByValueIncrease,
+    StopByProfitRate,
+    StopByValueDrawback,
+    TakeDeltaProfit,
+]}
+
 
-def parse_strategy(conf: str):
+def parse_strategy(conf: str) -> ProfitStrategy:
+    """
+    :param conf: <类名>[:<参数>,...]，如 `AddByValueDrawback:20,-0.05,5000`
+    """
     if ':' in conf:
         name, args = conf.split(':', maxsplit=1)
     else:
         name, args = conf, ''
+    cls = STRATEGIES.get(name)
+    if cls is None:
+        raise ValueError(f'unknown strategy: {name}, available: {", ".join(STRATEGIES)}')
     args = [float(i) for i in args.split(',') if i]
-    cls = eval(f'{name}')
     return cls(*args)
@@ -1,6 +1,8 @@
 # coding: utf8
+from fundstrategy.core import indicators
 from fundstrategy.core import models
 from fundstrategy.core import profits
+from fundstrategy.core import signals
 from fundstrategy.core.regular import ProfitStrategy
 
 
@@ -12,7 +14,7 @@ class AddByValueDrawback(ProfitStrategy):
                  drawback_rate: float = -10 / 100,
                  add_amount: float = 10_000):
         """
-        :param drawback_days: 回撤计算天数
+        :param drawback_days: 回撤计算天数，0 为全部历史
         :param drawback_rate: 回撤比例阈值
         :param add_amount: 加仓金额
         """
@@ -21,9 +23,18 @@ class AddByValueDrawback(ProfitStrategy):
         self.drawback_rate = drawback_rate
         self.add_amount = add_amount
 
+    def prepare(self, record: profits.ProfitRecord):
+        record.register_indicator(indicators.RollingMax(self.drawback_days))
+
     def do_strategy(self, record: profits.ProfitRecord, days: int, nav: models.FundNav):
         rate = record.value_drawback_rate(nav.value, days=self.drawback_days)
         if rate <= self.drawback_rate:
-            record.buy(nav.date,
-                       net_value=nav.value,
-                       amount=self.add_amount)
+            self.do_signal(record, days, nav)
+
+    def precompute(self, nav_signals: signals.NavSignals):
+        return nav_signals.drawback_mask(self.drawback_days, self.drawback_rate)
+
+    def do_signal(self, record: profits.ProfitRecord, days: int, nav: models.FundNav):
+        record.buy(nav.date,
+                   net_value=nav.value,
+                   amount=self.add_amount)
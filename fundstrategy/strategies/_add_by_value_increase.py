@@ -1,6 +1,7 @@
 # coding: utf8
 from fundstrategy.core import models
 from fundstrategy.core import profits
+from fundstrategy.core import signals
 from fundstrategy.core.regular import ProfitStrategy
 
 
@@ -19,6 +20,12 @@ class AddByValueIncrease(ProfitStrategy):
 
     def do_strategy(self, record: profits.ProfitRecord, days: int, nav: models.FundNav):
         if nav.rate <= self.increase_rate:
-            record.buy(nav.date,
-                       net_value=nav.value,
-                       amount=self.add_amount)
+            self.do_signal(record, days, nav)
+
+    def precompute(self, nav_signals: signals.NavSignals):
+        return nav_signals.rate_mask(self.increase_rate)
+
+    def do_signal(self, record: profits.ProfitRecord, days: int, nav: models.FundNav):
+        record.buy(nav.date,
+                   net_value=nav.value,
+                   amount=self.add_amount)
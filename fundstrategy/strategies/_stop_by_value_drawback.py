@@ -1,6 +1,8 @@
 # coding: utf8
+from fundstrategy.core import indicators
 from fundstrategy.core import models
 from fundstrategy.core import profits
+from fundstrategy.core import signals
 from fundstrategy.core.regular import ProfitStrategy
 
 
@@ -11,16 +13,25 @@ class StopByValueDrawback(ProfitStrategy):
                  drawback_days: int = 5,
                  drawback_rate: float = -5 / 100):
         """
-        :param drawback_days: 回撤计算天数
+        :param drawback_days: 回撤计算天数，0 为全部历史
         :param drawback_rate: 回撤比例阈值
         """
         assert drawback_rate < 0
         self.drawback_days = int(drawback_days)
         self.drawback_rate = drawback_rate
 
+    def prepare(self, record: profits.ProfitRecord):
+        record.register_indicator(indicators.RollingMax(self.drawback_days))
+
     def do_strategy(self, record: profits.ProfitRecord, days: int, nav: models.FundNav):
         rate = record.value_drawback_rate(nav.value, days=self.drawback_days)
         if rate <= self.drawback_rate:
-            record.sell(nav.date,
-                        net_value=nav.value,
-                        equity=record.position_equity)
+            self.do_signal(record, days, nav)
+
+    def precompute(self, nav_signals: signals.NavSignals):
+        return nav_signals.drawback_mask(self.drawback_days, self.drawback_rate)
+
+    def do_signal(self, record: profits.ProfitRecord, days: int, nav: models.FundNav):
+        record.sell(nav.date,
+                    net_value=nav.value,
+                    equity=record.position_equity)
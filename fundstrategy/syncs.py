@@ -0,0 +1,96 @@
+# coding: utf8
+import datetime
+import logging
+import typing
+
+from fundstrategy import daos
+from fundstrategy.core import models
+from fundstrategy.fund_apis import fund_api
+
+
+class NavSyncer:
+    """从基金接口同步净值到 fund_nav，增量模式只拉取、写入水位之后的日期"""
+
+    def __init__(self, api: fund_api.FundApi, nav_dao: daos.NavDao, sync_dao: daos.SyncDao,
+                 batch_size: int = 500):
+        self.api = api
+        self.nav_dao = nav_dao
+        self.sync_dao = sync_dao
+        self.batch_size = batch_size
+        self.logger = logging.getLogger(self.__class__.__name__)
+
+    def get_last_date(self, code: str) -> typing.Optional[str]:
+        """已同步的最新日期：优先取同步水位，没有时取 fund_nav 中的最新日期"""
+        watermark = self.sync_dao.get_watermark(code)
+        if watermark is not None:
+            return watermark.last_date
+        return self.nav_dao.get_latest_date(code)
+
+    def sync(self, code: str, start: str = None, end: str = None, incremental: bool = True) -> models.FundNavList:
+        """
+        :param start: 开始日期，增量模式下取其与水位次日中较晚的
+        :param incremental: 是否只拉取、写入水位之后的日期
+        :return: 本次写入的净值
+        """
+        last_date = self.get_last_date(code)
+        if incremental:
+            start = self._start_after(last_date, start)
+        nav_list = self.api.get_nav_list(code, start or '', end or '')
+        return self.save(nav_list, last_date, start if incremental else None)
+
+    def sync_many(self, codes: typing.Sequence[str], start: str = None, end: str = None,
+                  incremental: bool = True, max_workers: int = 8
+                  ) -> typing.Iterator[typing.Tuple[str, typing.Union[models.FundNavList, Exception]]]:
+        """
+        多个基金流水线同步：工作线程并发拉取、解析，当前线程按完成顺序批量写入
+
+        :return: 按完成顺序返回 (code, 本次写入的净值或异常)
+        """
+        fetcher = fund_api.ConcurrentFetcher(self.api, max_workers=max_workers)
+        # 工作线程中查询的已同步日期，写入时推进水位用，每个基金只查询一次
+        last_dates = {}
+
+        def get_start(code: str) -> typing.Optional[str]:
+            last_dates[code] = self.get_last_date(code)
+            return self._start_after(last_dates[code], start)
+
+        for code, code_start, nav_list in fetcher.fetch_many(codes, start or '', end or '',
+                                                             get_start=get_start if incremental else None):
+            if isinstance(nav_list, Exception):
+                self.logger.warning(f'{code}: fetch failed, {nav_list!r}')
+                last_dates.pop(code, None)
+                yield code, nav_list
+                continue
+            try:
+                last_date = last_dates.pop(code) if incremental else self.get_last_date(code)
+                yield code, self.save(nav_list, last_date, code_start if incremental else None)
+            except Exception as e:
+                self.logger.warning(f'{code}: save failed, {e!r}')
+                yield code, e
+
+    @staticmethod
+    def _start_after(last_date: typing.Optional[str], start: str = None) -> typing.Optional[str]:
+        """已同步日期的次日与 start 中较晚的"""
+        if not last_date:
+            return start
+        next_date = (datetime.date.fromisoformat(last_date) + datetime.timedelta(days=1)).isoformat()
+        return max(start or '', next_date)
+
+    def save(self, nav_list: models.FundNavList, last_date: typing.Optional[str],
+             start: str = None) -> models.FundNavList:
+        """
+        写入净值并推进水位
+
+        :param last_date: 写入前已同步的最新日期，同 `get_last_date`，水位取其与本次最新日期中较晚的
+        :param start: 只写入该日期及之后的净值，接口不支持日期过滤时在这里截断
+        :return: 本次写入的净值
+        """
+        info = nav_list.info
+        if start:
+            nav_list = models.FundNavList(info, nav_list.nav_list.slice(start))
+        if len(nav_list) == 0:
+            return nav_list
+        self.nav_dao.insert_ignore_many(info, nav_list.nav_list, batch_size=self.batch_size)
+        last_date = max(last_date or '', nav_list.nav_list[-1].date)
+        self.sync_dao.save_watermark(info.code, last_date, len(nav_list))
+        return nav_list
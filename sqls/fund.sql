@@ -6,6 +6,8 @@ CREATE TABLE IF NOT EXISTS `fund_nav`
     `value_date`    VARCHAR(16)  NOT NULL COMMENT '净值日期',
     `unit_value`    DOUBLE(10, 5) DEFAULT 0 COMMENT '单位净值',
     `increase_rate` DOUBLE(10, 5) DEFAULT 0 COMMENT '涨幅',
+    `day_of_week`   TINYINT       DEFAULT 0 COMMENT '周几，1~7',
+    `year_week`     INT           DEFAULT 0 COMMENT '年周，yearweek(value_date)',
 
     `create_ts`     TIMESTAMP     DEFAULT NOW(),
     `update_ts`     TIMESTAMP     DEFAULT NOW() ON UPDATE NOW(),
@@ -15,3 +17,17 @@ CREATE TABLE IF NOT EXISTS `fund_nav`
 ) ENGINE = InnoDB
   DEFAULT CHARSET = UTF8MB4
   COLLATE = utf8mb4_general_ci COMMENT '基金净值';
+
+-- 基金净值同步水位
+CREATE TABLE IF NOT EXISTS `fund_sync`
+(
+    `code`       VARCHAR(10) NOT NULL COMMENT 'code',
+    `last_date`  VARCHAR(16) NOT NULL COMMENT '已同步的最新净值日期',
+    `last_count` INT         DEFAULT 0 COMMENT '最近一次同步写入的净值条数',
+    `synced_ts`  TIMESTAMP   DEFAULT NOW() ON UPDATE NOW(),
+
+    PRIMARY KEY (`code`)
+
+) ENGINE = InnoDB
+  DEFAULT CHARSET = UTF8MB4
+  COLLATE = utf8mb4_general_ci COMMENT '基金净值同步水位';
@@ -0,0 +1,36 @@
+-- 基金净值，sqls/fund.sql 的 SQLite 版本
+CREATE TABLE IF NOT EXISTS `fund_nav`
+(
+    `code`          VARCHAR(10)  NOT NULL,
+    `name`          VARCHAR(100) DEFAULT '',
+    `value_date`    VARCHAR(16)  NOT NULL,
+    `unit_value`    DOUBLE       DEFAULT 0,
+    `increase_rate` DOUBLE       DEFAULT 0,
+    `day_of_week`   TINYINT      DEFAULT 0,
+    `year_week`     INT          DEFAULT 0,
+
+    `create_ts`     TIMESTAMP    DEFAULT CURRENT_TIMESTAMP,
+    `update_ts`     TIMESTAMP    DEFAULT CURRENT_TIMESTAMP,
+
+    PRIMARY KEY (`code`, `value_date`)
+);
+
+CREATE TRIGGER IF NOT EXISTS `fund_nav_update_ts`
+    AFTER UPDATE
+    ON `fund_nav`
+    FOR EACH ROW
+    WHEN OLD.`update_ts` = NEW.`update_ts`
+BEGIN
+    UPDATE `fund_nav` SET `update_ts` = CURRENT_TIMESTAMP WHERE `code` = NEW.`code` AND `value_date` = NEW.`value_date`;
+END;
+
+-- 基金净值同步水位
+CREATE TABLE IF NOT EXISTS `fund_sync`
+(
+    `code`       VARCHAR(10) NOT NULL,
+    `last_date`  VARCHAR(16) NOT NULL,
+    `last_count` INT       DEFAULT 0,
+    `synced_ts`  TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+
+    PRIMARY KEY (`code`)
+);